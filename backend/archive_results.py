@@ -0,0 +1,46 @@
+"""
+Move old test_results to compressed Parquet files (hot/cold archival).
+
+Results submitted before the archive cutoff are written to ARCHIVE_DIR as zstd Parquet,
+partitioned school=/class=/term=, and their Mongo documents are slimmed to a summary with
+`archived.path`. The API reads archived answers back from those files on demand. The default
+cutoff is the start of the ARCHIVE_KEEP_TERMS-th most recent academic term
+(ACADEMIC_TERM_STARTS); --before overrides it. Run it from cron after a term ends.
+
+Usage:
+    python archive_results.py --dry-run
+    python archive_results.py --keep-terms 2
+    python archive_results.py --before 2025-04-01
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import server
+
+async def run(args) -> dict:
+    await server.connect_to_mongo()
+    if args.before:
+        cutoff = server.parse_schedule(args.before)
+    else:
+        cutoff = server.archive_cutoff(datetime.now(timezone.utc), args.keep_terms)
+    pending = sum(await server.across_schools(lambda: server.db.test_results.count_documents(
+        {"archived": None, "submitted_at": {"$lt": cutoff.isoformat()}})))
+    report = {"cutoff": cutoff.isoformat(), "archive_dir": str(server.ARCHIVE_DIR), "pending": pending}
+    if not args.dry_run and pending:
+        report.update(await server.archive_results(cutoff, args.batch_size))
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keep-terms', type=int, default=server.ARCHIVE_KEEP_TERMS,
+                        help='academic terms to keep hot in Mongo, including the current one')
+    parser.add_argument('--before', default=None, help='explicit cutoff date (ISO 8601), overrides --keep-terms')
+    parser.add_argument('--batch-size', type=int, default=server.ARCHIVE_BATCH_SIZE)
+    parser.add_argument('--dry-run', action='store_true', help='only report the cutoff and how many results it covers')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == '__main__':
+    main()
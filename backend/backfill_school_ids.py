@@ -0,0 +1,112 @@
+"""
+Stamp school_id on documents written before school scoping (see server.school_key).
+
+Users get the key of their `school` name; tests inherit the school of the teacher who created
+them and test_results the school of the student who submitted them. Documents whose owner has
+no school stay unscoped (visible to every school), as does everything in subjects and the
+master question bank. Safe to re-run: only documents without a school_id are touched.
+
+With SCHOOL_LAYOUT=database, --split then moves each school's tests, test_results and subjects
+out of the platform database into that school's database.
+
+Usage:
+    python backfill_school_ids.py --dry-run
+    python backfill_school_ids.py --batch-size 1000
+    SCHOOL_LAYOUT=database python backfill_school_ids.py --split
+"""
+import argparse
+import asyncio
+import json
+
+from pymongo import UpdateOne
+
+import server
+
+UNSCOPED = {"school_id": None}
+
+async def backfill_users(batch_size: int, dry_run: bool) -> int:
+    updated = 0
+    last_id = None
+    while True:
+        query = {**UNSCOPED, "school": {"$nin": [None, ""]}, **({"id": {"$gt": last_id}} if last_id else {})}
+        batch = await server.db.users.find(query, {"_id": 0, "id": 1, "school": 1}).sort("id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return updated
+        if not dry_run:
+            await server.db.users.bulk_write([
+                UpdateOne({"id": user['id'], **UNSCOPED}, {"$set": {"school_id": server.school_key(user['school'])}})
+                for user in batch
+            ], ordered=False)
+        updated += len(batch)
+        last_id = batch[-1]['id']
+
+async def backfill_owned(collection: str, owner_field: str, batch_size: int, dry_run: bool) -> int:
+    """school_id from the owning user's school_id"""
+    school_of = {}
+    updated = 0
+    last_id = None
+    while True:
+        query = {**UNSCOPED, **({"id": {"$gt": last_id}} if last_id else {})}
+        batch = await server.db[collection].find(query, {"_id": 0, "id": 1, owner_field: 1}).sort("id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return updated
+        owners = {doc.get(owner_field) for doc in batch} - school_of.keys()
+        async for user in server.db.users.find({"id": {"$in": list(owners)}}, {"_id": 0, "id": 1, "school_id": 1}):
+            school_of[user['id']] = user.get('school_id')
+        updates = [
+            UpdateOne({"id": doc['id'], **UNSCOPED}, {"$set": {"school_id": school_of[doc[owner_field]]}})
+            for doc in batch if school_of.get(doc.get(owner_field))
+        ]
+        if updates and not dry_run:
+            await server.db[collection].bulk_write(updates, ordered=False)
+        updated += len(updates)
+        last_id = batch[-1]['id']
+
+async def split(batch_size: int, dry_run: bool) -> dict:
+    """Move school-stamped documents from the platform database into each school's database"""
+    moved = {}
+    for school_id in await server.known_school_ids():
+        await server.ensure_school_database(school_id)
+        target = server.db.database_for(school_id)
+        for collection in sorted(server.SCHOOL_OWNED_COLLECTIONS):
+            source = server.db.platform[collection]
+            while True:
+                batch = await source.find({"school_id": school_id}, {"_id": 0}).limit(batch_size).to_list(batch_size)
+                if not batch:
+                    break
+                moved[collection] = moved.get(collection, 0) + len(batch)
+                if dry_run:
+                    break
+                # upsert by id so an interrupted run can be resumed without duplicates
+                await target[collection].bulk_write([
+                    UpdateOne({"id": doc['id']}, {"$setOnInsert": doc}, upsert=True) for doc in batch
+                ], ordered=False)
+                await source.delete_many({"id": {"$in": [doc['id'] for doc in batch]}, "school_id": school_id})
+        print(f"split {school_id}")
+    return moved
+
+async def backfill(batch_size: int, dry_run: bool, split_databases: bool) -> dict:
+    await server.connect_to_mongo()
+    if split_databases and server.SCHOOL_LAYOUT != 'database':
+        raise SystemExit("--split needs SCHOOL_LAYOUT=database")
+    # under SCHOOL_LAYOUT=database, unsplit data still lives in the platform database
+    stats = {"users": await backfill_users(batch_size, dry_run)}
+    if dry_run:
+        stats['note'] = "users are not written in a dry run, so tests and results of newly keyed users are not counted"
+    stats['tests'] = await backfill_owned("tests", "created_by", batch_size, dry_run)
+    stats['test_results'] = await backfill_owned("test_results", "student_id", batch_size, dry_run)
+    if split_databases:
+        stats['moved'] = await split(batch_size, dry_run)
+    stats['dry_run'] = dry_run
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='count documents without writing')
+    parser.add_argument('--split', action='store_true', help='SCHOOL_LAYOUT=database: move school data into school databases')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(backfill(args.batch_size, args.dry_run, args.split)), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,537 @@
+"""
+Reproducible load-test / benchmark suite for the examination API.
+
+Boots the FastAPI app in-process against a local mongod (--mongo-url) or an
+in-memory Mongo stand-in, with a fake LlmChat and a deterministic OCR stub whose
+latencies are configurable. Drives realistic exam-day scenarios and writes
+throughput and p50/p95/p99 latency per scenario to a JSON file.
+
+Usage:
+    python benchmark.py --students 200 --out bench.json
+    python benchmark.py --mongo-url mongodb://localhost:27017 --llm-latency-ms 800
+    python benchmark.py --compare baseline.json --out bench.json
+    python benchmark.py --mongo-url mongodb://localhost:27017 --workers 1,2,4,8
+    python benchmark.py --prewarm --students 200 --out bench_prewarm.json
+"""
+import argparse
+import asyncio
+import base64
+import functools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from types import SimpleNamespace
+
+# server.py refuses to start without these; the benchmark never talks to a real deployment
+os.environ.setdefault('JWT_SECRET', 'benchmark-only-secret-' + 'x' * 32)
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+# The benchmark measures capacity, not the rate limiter: every simulated student shares one
+# client IP and bursts far past a real user's rate. Export RATE_LIMIT_* to measure with limits.
+for rate_limit_class in ('AUTH', 'AUTH_IP', 'OCR', 'SUBMIT', 'BULK'):
+    os.environ.setdefault(f'RATE_LIMIT_{rate_limit_class}', 'off')
+
+import bcrypt
+import httpx
+from PIL import Image
+from pymongo import IndexModel
+
+import server
+
+BENCH_PASSWORD = 'Bench@12345'
+OCR_STUB_TEXT = 'Photosynthesis converts light energy into chemical energy in plants'
+
+# ============= STAND-INS =============
+
+class FakeUserMessage:
+    def __init__(self, text=None, **kwargs):
+        self.text = text
+
+class FakeLlmChat:
+    """Drop-in for emergentintegrations LlmChat with fixed latency and a deterministic score"""
+    latency_ms = 0.0
+    calls = 0
+
+    def __init__(self, api_key=None, session_id=None, system_message=None):
+        self.system_message = system_message
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        FakeLlmChat.calls += 1
+        await asyncio.sleep(FakeLlmChat.latency_ms / 1000)
+        return "1"
+
+class FakeTesseract:
+    """Deterministic OCR stub; sleeps synchronously like the real (blocking) Tesseract call"""
+    latency_ms = 0.0
+    calls = 0
+
+    @staticmethod
+    def image_to_string(image, *args, **kwargs):
+        FakeTesseract.calls += 1
+        time.sleep(FakeTesseract.latency_ms / 1000)
+        return OCR_STUB_TEXT
+
+def install_ocr_stand_in(ocr_latency_ms):
+    """Also the CPU pool initializer: spawned pool processes don't inherit sys.modules"""
+    FakeTesseract.latency_ms = ocr_latency_ms
+    sys.modules['pytesseract'] = SimpleNamespace(image_to_string=FakeTesseract.image_to_string)
+
+def mongomock_index_models() -> dict:
+    """INDEX_MODELS for the in-memory stand-in, which applies partial indexes to every document:
+    the unique student_code index becomes sparse, which skips users without a code just the same"""
+    def stand_in(model: IndexModel) -> IndexModel:
+        spec = dict(model.document)
+        if 'partialFilterExpression' not in spec:
+            return model
+        del spec['partialFilterExpression']
+        return IndexModel(list(spec.pop('key').items()), sparse=True, **spec)
+    return {name: [stand_in(model) for model in models] for name, models in server.INDEX_MODELS.items()}
+
+def find_and_modify_by_id(find_and_modify):
+    """Wraps mongomock's Collection._find_and_modify, which fetches a ReturnDocument.AFTER document
+    by re-running the caller's filter unless the projection keeps _id. A claim whose update no longer
+    matches its own filter (claim_regrade_job) then returns None; MongoDB returns the updated document."""
+    @functools.wraps(find_and_modify)
+    def by_id(self, query, projection=None, *args, **kwargs):
+        if not isinstance(projection, dict) or projection.get('_id', 1):
+            return find_and_modify(self, query, projection, *args, **kwargs)
+        document = find_and_modify(self, query, {k: v for k, v in projection.items() if k != '_id'} or None,
+                                   *args, **kwargs)
+        if document:
+            document.pop('_id', None)
+        return document
+    return by_id
+
+def install_stand_ins(mongo_url, db_name, llm_latency_ms, ocr_latency_ms):
+    """Point server.py at the benchmark database and replace LLM/OCR with stand-ins"""
+    FakeLlmChat.latency_ms = llm_latency_ms
+    # server.py imports these lazily, so registering stand-in modules is enough
+    sys.modules['emergentintegrations.llm.chat'] = SimpleNamespace(
+        LlmChat=FakeLlmChat, UserMessage=FakeUserMessage, ImageContent=FakeUserMessage)
+    install_ocr_stand_in(ocr_latency_ms)
+    # OCR runs in server.py's process pool; give it one whose processes load the stub
+    server._process_pool = ProcessPoolExecutor(
+        max_workers=server.CPU_POOL_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+        initializer=install_ocr_stand_in, initargs=(ocr_latency_ms,))
+
+    if mongo_url:
+        # Let server.py build its own per-worker client from its pool settings
+        server.mongo_url = mongo_url
+        server.DB_NAME = db_name
+    else:
+        from mongomock.collection import Collection
+        from mongomock_motor import AsyncMongoMockClient
+        Collection._find_and_modify = find_and_modify_by_id(Collection._find_and_modify)
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[db_name]
+        server.INDEX_MODELS = mongomock_index_models()
+
+def create_bench_app():
+    """uvicorn --factory entry point for multi-worker runs; configured through BENCH_* env vars"""
+    install_stand_ins(os.environ['BENCH_MONGO_URL'], os.environ['BENCH_DB_NAME'],
+                      float(os.environ.get('BENCH_LLM_LATENCY_MS', 0)),
+                      float(os.environ.get('BENCH_OCR_LATENCY_MS', 0)))
+    # The benchmark driver is the designated migrator; workers skip index creation
+    server.CREATE_INDEXES_ON_STARTUP = False
+    logging.getLogger('server').setLevel(logging.WARNING)
+    return server.app
+
+# ============= FIXTURES =============
+
+def sample_image_base64(variant: int = 0) -> str:
+    """Blank answer photo; distinct variants have distinct bytes, so they miss the OCR cache"""
+    image = Image.new('RGB', (320, 120), 'white')
+    image.putpixel((variant % 320, (variant // 320) % 120), (0, 0, 0))
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG")
+    return base64.b64encode(buffered.getvalue()).decode('utf-8')
+
+def sample_questions():
+    return [
+        {"question_text": "2 + 2 = ?", "question_type": "mcq", "options": ["3", "4", "5", "6"],
+         "correct_answer": "4", "marks": 1},
+        {"question_text": "The capital of France is ____", "question_type": "fill_blank",
+         "correct_answer": "Paris", "marks": 1},
+        {"question_text": "Define photosynthesis", "question_type": "short",
+         "correct_answer": "Plants convert light energy into chemical energy", "marks": 3},
+        {"question_text": "Explain the water cycle", "question_type": "long",
+         "correct_answer": "Evaporation, condensation, precipitation and collection", "marks": 5},
+    ]
+
+def sample_answers(image_base64: str):
+    return [
+        {"question_index": 0, "selected_option": "4"},
+        {"question_index": 1, "answer_text": "paris"},
+        {"question_index": 2, "answer_text": "Plants make food from light"},
+        {"question_index": 3, "handwritten_image": image_base64},
+    ]
+
+def sample_questions_csv(rows: int) -> bytes:
+    lines = ["question_text,question_type,correct_answer,marks,difficulty,options"]
+    for i in range(rows):
+        lines.append(f'"What is {i} + 1?",mcq,{i + 1},1,easy,"{i},{i + 1},{i + 2},{i + 3}"')
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+async def seed(students: int, class_name: str = "10th", scheduled_at: str = None):
+    """Insert users, a subject and one exam directly (bcrypt once, not per user)"""
+    hashed = bcrypt.hashpw(BENCH_PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    now = datetime.now(timezone.utc).isoformat()
+
+    def user(role, i):
+        return {
+            'id': str(uuid.uuid4()), 'name': f'{role} {i}', 'nickname': f'{role}{i}',
+            'email': f'{role}{i}@bench.example.com', 'mobile': '9999999999', 'role': role,
+            'dob': '2010-01-01', 'class_name': class_name, 'section': 'A', 'school': 'Bench School',
+            'student_code': server.generate_student_code() if role == server.UserRole.STUDENT else None,
+            'password': hashed, 'is_active': True, 'created_at': now,
+        }
+
+    student_docs = [user(server.UserRole.STUDENT, i) for i in range(students)]
+    teacher = user(server.UserRole.TEACHER, 0)
+    admin = user(server.UserRole.SUPER_ADMIN, 0)
+    await server.db.users.insert_many(student_docs + [teacher, admin])
+
+    subject = {'id': str(uuid.uuid4()), 'name': 'Science', 'class_name': class_name,
+               'description': None, 'created_at': now}
+    await server.db.subjects.insert_one(dict(subject))
+
+    questions = sample_questions()
+    test = {
+        'id': str(uuid.uuid4()), 'title': 'Benchmark Exam', 'subject_id': subject['id'],
+        'class_name': class_name, 'test_type': server.TestType.WEEKLY, 'duration_minutes': 60,
+        'total_marks': sum(q['marks'] for q in questions), 'questions': questions,
+        'created_by': teacher['id'], 'created_at': now, 'scheduled_at': scheduled_at,
+    }
+    await server.db.tests.insert_one(dict(test))
+    return SimpleNamespace(students=student_docs, teacher=teacher, admin=admin,
+                           subject=subject, test=test)
+
+# ============= RUNNER =============
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest rank: the ceil(pct% of n)-th smallest value
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def summarize(latencies_ms, errors: int, wall_seconds: float) -> dict:
+    values = sorted(latencies_ms)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "wall_seconds": round(wall_seconds, 3),
+        "throughput_rps": round(len(values) / wall_seconds, 2) if wall_seconds > 0 else 0.0,
+        "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(values[-1], 2) if values else 0.0,
+    }
+
+async def run_scenario(name: str, calls, concurrency: int) -> dict:
+    """Run zero-arg coroutine factories with bounded concurrency and summarize latencies"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    rate_limited = 0
+
+    async def one(call):
+        nonlocal errors, rate_limited
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                response = await call()
+                if response.status_code >= 400:
+                    errors += 1
+                rate_limited += response.status_code == 429
+            except Exception as e:
+                errors += 1
+                print(f"  {name}: {e!r}", file=sys.stderr)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(call) for call in calls))
+    result = summarize(latencies, errors, time.perf_counter() - started)
+    result['rate_limited'] = rate_limited
+    print(f"{name:>14}: {result['requests']:>5} req  {result['throughput_rps']:>8} rps  "
+          f"p50 {result['p50_ms']:>8}ms  p95 {result['p95_ms']:>8}ms  "
+          f"p99 {result['p99_ms']:>8}ms  errors {result['errors']}")
+    return result
+
+async def login(http: httpx.AsyncClient, email: str) -> str:
+    response = await http.post('/api/auth/login', json={'email': email, 'password': BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()['token']
+
+def auth(token: str) -> dict:
+    return {'Authorization': f'Bearer {token}'}
+
+async def run_scenarios(http: httpx.AsyncClient, data, args) -> dict:
+    scenarios = {}
+    tokens = {}
+
+    async def student_login(student):
+        response = await http.post('/api/auth/login', json={
+            'email': student['email'], 'password': BENCH_PASSWORD})
+        if response.status_code == 200:
+            tokens[student['id']] = response.json()['token']
+        return response
+
+    scenarios['login_rush'] = await run_scenario(
+        'login_rush', [lambda s=s: student_login(s) for s in data.students], args.concurrency)
+    # A classroom logging in at exam start must never be throttled
+    assert scenarios['login_rush']['rate_limited'] == 0, \
+        f"login_rush: {scenarios['login_rush']['rate_limited']} logins rate limited (429)"
+    # Students whose login failed can't take part in the later scenarios
+    students = [s for s in data.students if s['id'] in tokens]
+    if len(students) < len(data.students):
+        print(f"  login_rush: {len(data.students) - len(students)} logins failed, "
+              f"continuing with {len(students)} students", file=sys.stderr)
+
+    test_id = data.test['id']
+    scenarios['exam_start'] = await run_scenario('exam_start', [
+        lambda t=tokens[s['id']]: http.get(f'/api/tests/{test_id}', headers=auth(t))
+        for s in students
+    ], args.concurrency)
+
+    answers = sample_answers(sample_image_base64())
+    scenarios['submit_burst'] = await run_scenario('submit_burst', [
+        lambda t=tokens[s['id']]: http.post(f'/api/tests/{test_id}/submit', headers=auth(t),
+                                            json={'test_id': test_id, 'answers': answers})
+        for s in students
+    ], args.concurrency)
+
+    teacher_token = await login(http, data.teacher['email'])
+    dashboard_calls = []
+    for s in students:
+        token = tokens[s['id']]
+        dashboard_calls.append(lambda t=token, sid=s['id']: http.get(
+            f'/api/results/student/{sid}', headers=auth(t)))
+        dashboard_calls.append(lambda t=token, sid=s['id']: http.get(
+            f'/api/analytics/student/{sid}', headers=auth(t)))
+    for _ in range(max(1, args.students // 10)):
+        dashboard_calls.append(lambda: http.get('/api/tests', headers=auth(teacher_token)))
+        dashboard_calls.append(lambda: http.get('/api/subjects', headers=auth(teacher_token)))
+    scenarios['dashboard'] = await run_scenario('dashboard', dashboard_calls, args.concurrency)
+
+    admin_token = await login(http, data.admin['email'])
+    csv_bytes = sample_questions_csv(args.bulk_rows)
+    scenarios['bulk_upload'] = await run_scenario('bulk_upload', [
+        lambda: http.post('/api/admin/questions/bulk-upload', headers=auth(admin_token),
+                          files={'file': ('questions.csv', csv_bytes, 'text/csv')},
+                          data={'subject': 'Science', 'class_name': '10th'})
+        for _ in range(args.bulk_uploads)
+    ], min(args.concurrency, 4))
+    return scenarios
+
+def report_meta(args) -> dict:
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "mongo": "mongod" if args.mongo_url else "in-memory",
+        "students": args.students,
+        "concurrency": args.concurrency,
+        "llm_latency_ms": args.llm_latency_ms,
+        "ocr_latency_ms": args.ocr_latency_ms,
+        "bulk_rows": args.bulk_rows,
+    }
+
+async def run_benchmark(args) -> dict:
+    """Single in-process worker driven through ASGI (no sockets)"""
+    db_name = f"bench_{uuid.uuid4().hex[:8]}"
+    install_stand_ins(args.mongo_url, db_name, args.llm_latency_ms, args.ocr_latency_ms)
+    await server.app.router.startup()
+    try:
+        data = await seed(args.students)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as http:
+            scenarios = await run_scenarios(http, data, args)
+    finally:
+        if args.mongo_url:
+            await server.client.drop_database(db_name)
+        await server.app.router.shutdown()
+
+    meta = report_meta(args)
+    # OCR itself runs in pool processes; cache misses are the OCR runs
+    meta.update({"llm_calls": FakeLlmChat.calls, "ocr_calls": server.METRICS["ocr_cache.miss"]})
+    return {"meta": meta, "scenarios": scenarios}
+
+async def run_first_minute(http: httpx.AsyncClient, data, args) -> dict:
+    """Exam start: every student opens the test and submits, each with a never-seen photo"""
+    tokens = {}
+    for student in data.students:
+        tokens[student['id']] = await login(http, student['email'])
+    test_id = data.test['id']
+
+    async def take_exam(student, i):
+        headers = auth(tokens[student['id']])
+        response = await http.get(f'/api/tests/{test_id}', headers=headers)
+        if response.status_code >= 400:
+            return response
+        return await http.post(f'/api/tests/{test_id}/submit', headers=headers,
+                               json={'test_id': test_id, 'answers': sample_answers(sample_image_base64(i + 1))})
+
+    return await run_scenario('first_minute', [
+        lambda s=s, i=i: take_exam(s, i) for i, s in enumerate(data.students)
+    ], args.concurrency)
+
+async def run_prewarm_comparison(args) -> dict:
+    """First-minute latency of a scheduled exam, cold vs. pre-warmed, each on a fresh app state.
+    Cold runs first, so process-wide one-time imports are charged to it, as in production."""
+    # The comparison drives pre-warming itself; the background scheduler stays off
+    server.PREWARM_LEAD_MINUTES = 0
+    results = {}
+    for mode in ('cold', 'prewarmed'):
+        db_name = f"bench_{uuid.uuid4().hex[:8]}"
+        install_stand_ins(args.mongo_url, db_name, args.llm_latency_ms, args.ocr_latency_ms)
+        server.prewarmed_tests.clear()
+        server.ocr_memory_cache = server.LRUCache(server.OCR_CACHE_SIZE)
+        await server.app.router.startup()
+        try:
+            data = await seed(args.students, scheduled_at=datetime.now(timezone.utc).isoformat())
+            print(f"\n--- {mode} ---")
+            prewarm = await server.prewarm_test(data.test) if mode == 'prewarmed' else None
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as http:
+                results[mode] = {"prewarm": prewarm, **await run_first_minute(http, data, args)}
+        finally:
+            if args.mongo_url:
+                await server.client.drop_database(db_name)
+            await server.app.router.shutdown()
+            server.client = None
+
+    for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'):
+        cold, warm = results['cold'][key], results['prewarmed'][key]
+        print(f"{key:>8}: cold {cold}ms -> prewarmed {warm}ms ({(warm - cold) / cold * 100 if cold else 0:+.1f}%)")
+    meta = report_meta(args)
+    meta.update({"cpu_pool_workers": server.CPU_POOL_WORKERS})
+    return {"meta": meta, "first_minute": results}
+
+def start_server(workers: int, db_name: str, args) -> subprocess.Popen:
+    env = dict(os.environ,
+               BENCH_MONGO_URL=args.mongo_url, BENCH_DB_NAME=db_name,
+               BENCH_LLM_LATENCY_MS=str(args.llm_latency_ms),
+               BENCH_OCR_LATENCY_MS=str(args.ocr_latency_ms))
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', '--factory', 'benchmark:create_bench_app',
+         '--host', '127.0.0.1', '--port', str(args.port), '--workers', str(workers),
+         '--log-level', 'warning'],
+        cwd=Path(__file__).parent, env=env)
+
+async def wait_until_ready(http: httpx.AsyncClient, proc: subprocess.Popen, workers: int, timeout: float = 60):
+    """Poll the readiness probe until every worker has answered it at least once"""
+    deadline = time.monotonic() + timeout
+    ready_pids = set()
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+        try:
+            response = await http.get('/api/health/ready')
+            if response.status_code == 200:
+                ready_pids.add(response.json()['pid'])
+                if len(ready_pids) >= workers:
+                    return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"only {len(ready_pids)}/{workers} workers became ready in {timeout}s")
+
+async def run_scaling(args) -> dict:
+    """Same scenarios against real uvicorn processes with 1..N workers sharing one mongod"""
+    if not args.mongo_url:
+        raise SystemExit("--workers needs --mongo-url: worker processes cannot share an in-memory stand-in")
+    db_name = f"bench_{uuid.uuid4().hex[:8]}"
+    install_stand_ins(args.mongo_url, db_name, args.llm_latency_ms, args.ocr_latency_ms)
+    await server.connect_to_mongo()
+    await server.create_indexes()
+    results = {}
+    try:
+        data = await seed(args.students)
+        for workers in args.workers:
+            proc = start_server(workers, db_name, args)
+            try:
+                limits = httpx.Limits(max_connections=args.concurrency)
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}",
+                                             timeout=None, limits=limits) as http:
+                    await wait_until_ready(http, proc, workers)
+                    print(f"\n--- {workers} worker(s), {os.cpu_count()} cores ---")
+                    results[str(workers)] = await run_scenarios(http, data, args)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+    finally:
+        await server.client.drop_database(db_name)
+        server.client.close()
+
+    meta = report_meta(args)
+    meta.update({"workers": args.workers, "cpu_count": os.cpu_count()})
+    return {"meta": meta, "scaling": results}
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def compare(baseline: dict, current: dict):
+    print(f"\nvs {baseline['meta'].get('commit', '?')} -> {current['meta'].get('commit', '?')}")
+    for name, now in current['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before:
+            continue
+        cells = []
+        for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+            change = ((now[key] - before[key]) / before[key] * 100) if before[key] else 0.0
+            cells.append(f"{key} {before[key]} -> {now[key]} ({change:+.1f}%)")
+        print(f"{name:>14}: " + "  ".join(cells))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-url', default=None, help='local mongod URL (default: in-memory stand-in)')
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--llm-latency-ms', type=float, default=200.0)
+    parser.add_argument('--ocr-latency-ms', type=float, default=50.0)
+    parser.add_argument('--bulk-rows', type=int, default=500)
+    parser.add_argument('--bulk-uploads', type=int, default=5)
+    parser.add_argument('--workers', default=None,
+                        help='comma-separated uvicorn worker counts for a scaling run, e.g. 1,2,4 (needs --mongo-url)')
+    parser.add_argument('--prewarm', action='store_true',
+                        help='compare first-minute exam latency with and without pre-warming')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--out', default='bench_output.json')
+    parser.add_argument('--compare', default=None, help='previous JSON report to diff against')
+    args = parser.parse_args()
+    # Per-request INFO logs would dominate the output and the timings
+    logging.getLogger('server').setLevel(logging.WARNING)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    if args.workers:
+        args.workers = [int(w) for w in args.workers.split(',')]
+        report = asyncio.run(run_scaling(args))
+    elif args.prewarm:
+        report = asyncio.run(run_prewarm_comparison(args))
+    else:
+        report = asyncio.run(run_benchmark(args))
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(f"\nWrote {args.out}")
+    if args.compare and 'scenarios' in report:
+        compare(json.loads(Path(args.compare).read_text()), report)
+
+if __name__ == '__main__':
+    main()
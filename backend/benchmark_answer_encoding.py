@@ -0,0 +1,132 @@
+"""
+Stored answer layout benchmark: bytes per result and get_student_results read latency,
+legacy (model_dump with every field) vs. compact (server.encode_answers).
+
+Writes the same synthetic results in both layouts to two collections of a scratch database
+(in-memory stand-in, or a local mongod with --mongo-url) and runs the get_student_results
+query + decode for every student against each.
+
+Usage:
+    python benchmark_answer_encoding.py --students 200 --results-per-student 20
+    python benchmark_answer_encoding.py --mongo-url mongodb://localhost:27017
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+os.environ.setdefault('JWT_SECRET', 'benchmark-only-secret-' + 'x' * 32)
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+import bson
+
+import server
+from benchmark import percentile
+
+QUESTION_TYPES = ['mcq'] * 12 + ['fill_blank'] * 4 + ['short'] * 3 + ['long']
+
+def synthetic_answer(q: int, question_type: str, rng: random.Random, photo: str) -> dict:
+    answer = server.AnswerSubmission(question_index=q)
+    if question_type == 'mcq':
+        answer.selected_option = rng.choice(['A', 'B', 'C', 'D'])
+    elif question_type == 'fill_blank':
+        answer.answer_text = rng.choice(['Paris', 'photosynthesis', 'mitochondria'])
+    elif rng.random() < 0.3:
+        answer.handwritten_image = photo
+        answer.ocr_text = 'Plants use light energy to make glucose from carbon dioxide and water'
+    else:
+        answer.answer_text = 'Plants use light energy to make glucose from carbon dioxide and water'
+    return answer.model_dump()
+
+def synthetic_results(students: int, per_student: int, photo_bytes: int, seed: int):
+    rng = random.Random(seed)
+    photo = base64.b64encode(rng.randbytes(photo_bytes)).decode('ascii')
+    started = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    for s in range(students):
+        student_id = str(uuid.uuid4())
+        for r in range(per_student):
+            answers = [synthetic_answer(q, t, rng, photo) for q, t in enumerate(QUESTION_TYPES)]
+            yield {
+                'id': str(uuid.uuid4()), 'test_id': str(uuid.uuid4()), 'student_id': student_id,
+                'answers': answers, 'total_score': float(rng.randint(0, 40)), 'max_score': 40,
+                'submitted_at': (started + timedelta(days=r)).isoformat(), 'evaluated': True,
+            }
+
+async def student_results(collection, student_id):
+    """The get_student_results query and decode"""
+    started = time.perf_counter()
+    docs = await collection.find({"student_id": student_id}, {"_id": 0}).sort(
+        "submitted_at", -1).limit(100).to_list(100)
+    [server.TestResult(**server.decode_result(d)) for d in docs]
+    return (time.perf_counter() - started) * 1000
+
+async def read_latencies(layouts, student_ids, rounds: int):
+    """Per-student read latency; layouts alternate order so neither one always runs warm"""
+    latencies = {name: [] for name in layouts}
+    for r in range(rounds):
+        for i, student_id in enumerate(student_ids):
+            order = list(layouts.items()) if (i + r) % 2 == 0 else list(reversed(layouts.items()))
+            for name, collection in order:
+                latencies[name].append(await student_results(collection, student_id))
+    report = {}
+    for name, values in latencies.items():
+        values.sort()
+        report[name] = {"p50_ms": round(percentile(values, 50), 3), "p95_ms": round(percentile(values, 95), 3),
+                        "mean_ms": round(sum(values) / len(values), 3)}
+    return report
+
+async def run(args) -> dict:
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    db = client[f"bench_{uuid.uuid4().hex[:8]}"]
+    layouts = {"legacy": db.results_legacy, "compact": db.results_compact}
+    try:
+        results = list(synthetic_results(args.students, args.results_per_student, args.photo_bytes, args.seed))
+        report = {}
+        for name, collection in layouts.items():
+            docs = [r if name == 'legacy' else {**r, 'answers': server.encode_answers(r['answers'])} for r in results]
+            await collection.insert_many([dict(d) for d in docs])
+            await collection.create_index([("student_id", 1), ("submitted_at", -1)])
+            report[name] = {"avg_bytes_per_result": round(sum(len(bson.encode(d)) for d in docs) / len(docs))}
+        student_ids = list(dict.fromkeys(r['student_id'] for r in results))
+        await read_latencies(layouts, student_ids[:5], 1)  # warm-up
+        for name, latency in (await read_latencies(layouts, student_ids, args.rounds)).items():
+            report[name].update(latency)
+    finally:
+        if args.mongo_url:
+            await client.drop_database(db.name)
+    legacy, compact = report['legacy'], report['compact']
+    report['bytes_reduction_pct'] = round((1 - compact['avg_bytes_per_result'] / legacy['avg_bytes_per_result']) * 100, 1)
+    report['p50_change_pct'] = round((compact['p50_ms'] / legacy['p50_ms'] - 1) * 100, 1)
+    report['config'] = {"students": args.students, "results_per_student": args.results_per_student,
+                        "questions": len(QUESTION_TYPES), "photo_bytes": args.photo_bytes,
+                        "rounds": args.rounds, "mongo": "mongod" if args.mongo_url else "in-memory"}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-url', default=None)
+    parser.add_argument('--students', type=int, default=200)
+    parser.add_argument('--results-per-student', type=int, default=20)
+    parser.add_argument('--photo-bytes', type=int, default=0,
+                        help='size of each handwritten photo (0 = answers without photos)')
+    parser.add_argument('--rounds', type=int, default=3, help='reads per student per layout')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out', default='answer_encoding_bench.json')
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
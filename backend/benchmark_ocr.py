@@ -0,0 +1,140 @@
+"""
+OCR benchmark: time per image and character accuracy, raw vs. preprocessed.
+
+Runs Tesseract on every sample twice, once on the raw image and once after
+preprocess_for_ocr(), and reports per-image OCR time and character accuracy
+(1 - edit distance / reference length). Samples come either from a directory
+of images with same-named .txt ground truth (answer1.jpg + answer1.txt), or
+are generated as synthetic "phone photos": text on a large noisy, tinted,
+rotated page over a dark background.
+
+Usage:
+    python benchmark_ocr.py --samples ./ocr_samples --out ocr_bench.json
+    python benchmark_ocr.py --synthetic 10 --out ocr_bench.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+os.environ.setdefault('JWT_SECRET', 'benchmark-only-secret-' + 'x' * 32)
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+import server
+
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp')
+
+SYNTHETIC_LINES = [
+    "Photosynthesis is the process by which green plants",
+    "use sunlight, water and carbon dioxide to make glucose",
+    "and release oxygen. It takes place in the chloroplasts.",
+    "The water cycle has evaporation, condensation,",
+    "precipitation and collection as its main stages.",
+]
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def char_accuracy(reference: str, text: str) -> float:
+    reference = " ".join(reference.split())
+    text = " ".join(text.split())
+    if not reference:
+        return 1.0 if not text else 0.0
+    return max(0.0, 1 - edit_distance(reference, text) / len(reference))
+
+def synthetic_sample(seed: int):
+    rng = random.Random(seed)
+    lines = rng.sample(SYNTHETIC_LINES, 3)
+    page = Image.new('RGB', (2400, 1400), (245, 238, 220))
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=64)
+    for i, line in enumerate(lines):
+        draw.text((120, 160 + i * 140), line, fill=(30, 30, 90), font=font)
+    # Phone-photo artifacts: uneven lighting, blur, tilt, dark desk around the page
+    gradient = np.linspace(0.75, 1.0, page.width)[None, :, None]
+    page = Image.fromarray((np.asarray(page) * gradient).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1.2))
+    page = page.rotate(rng.uniform(-6, 6), expand=True, fillcolor=(40, 35, 30), resample=Image.Resampling.BICUBIC)
+    photo = Image.new('RGB', (page.width + 600, page.height + 500), (40, 35, 30))
+    photo.paste(page, (300, 250))
+    noise = np.random.default_rng(seed).normal(0, 12, (photo.height, photo.width, 1))
+    photo = Image.fromarray(np.clip(np.asarray(photo) + noise, 0, 255).astype(np.uint8))
+    buffered = BytesIO()
+    photo.save(buffered, format="JPEG", quality=85)
+    return f"synthetic_{seed}.jpg", buffered.getvalue(), "\n".join(lines)
+
+def load_samples(directory: Path):
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        truth = path.with_suffix('.txt')
+        if not truth.exists():
+            print(f"skipping {path.name}: no {truth.name}", file=sys.stderr)
+            continue
+        yield path.name, path.read_bytes(), truth.read_text()
+
+def measure(image_data: bytes, reference: str, preprocess: bool) -> dict:
+    started = time.perf_counter()
+    text = server.run_ocr(image_data, preprocess=preprocess)
+    return {
+        "seconds": round(time.perf_counter() - started, 4),
+        "char_accuracy": round(char_accuracy(reference, text), 4),
+    }
+
+def summarize(rows, key: str) -> dict:
+    seconds = [r[key]['seconds'] for r in rows]
+    accuracy = [r[key]['char_accuracy'] for r in rows]
+    return {
+        "mean_seconds": round(sum(seconds) / len(seconds), 4),
+        "mean_char_accuracy": round(sum(accuracy) / len(accuracy), 4),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=Path, default=None, help='directory of images + .txt ground truth')
+    parser.add_argument('--synthetic', type=int, default=10, help='synthetic samples when --samples is not given')
+    parser.add_argument('--out', default='ocr_bench.json')
+    args = parser.parse_args()
+
+    samples = load_samples(args.samples) if args.samples else (synthetic_sample(i) for i in range(args.synthetic))
+    rows = []
+    for name, image_data, reference in samples:
+        row = {
+            "image": name,
+            "raw": measure(image_data, reference, preprocess=False),
+            "preprocessed": measure(image_data, reference, preprocess=True),
+        }
+        rows.append(row)
+        print(f"{name:>24}: raw {row['raw']['seconds']:.2f}s acc {row['raw']['char_accuracy']:.3f}  |  "
+              f"preprocessed {row['preprocessed']['seconds']:.2f}s acc {row['preprocessed']['char_accuracy']:.3f}")
+    if not rows:
+        raise SystemExit("no samples")
+
+    report = {
+        "config": {
+            "target_dpi": server.OCR_TARGET_DPI,
+            "psm": server.OCR_PSM,
+            "oem": server.OCR_OEM,
+            "binarize_offset": server.OCR_BINARIZE_OFFSET,
+            "max_skew_degrees": server.OCR_MAX_SKEW_DEGREES,
+        },
+        "summary": {"raw": summarize(rows, 'raw'), "preprocessed": summarize(rows, 'preprocessed')},
+        "images": rows,
+    }
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(json.dumps(report['summary'], indent=2))
+
+if __name__ == '__main__':
+    main()
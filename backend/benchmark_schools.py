@@ -0,0 +1,173 @@
+"""
+School scoping benchmark: latency of one school's admin and listing queries as the number of
+schools on the platform grows.
+
+Seeds the same amount of data per school (students, teachers, tests, results) for each school
+count, then times the school-scoped handlers for one school: admin stats, an admin user page,
+the admin test listing and a teacher's test listing. With a real mongod (--mongo-url) the
+school-led indexes keep these flat in the shared layout and the report includes the documents
+each query examined; the in-memory stand-in has no indexes, so there only
+--layout database stays flat.
+
+Usage:
+    python benchmark_schools.py --schools 1,4,16 --layout shared --mongo-url mongodb://localhost:27017
+    python benchmark_schools.py --schools 1,4,16 --layout database
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+os.environ.setdefault('JWT_SECRET', 'benchmark-only-secret-' + 'x' * 32)
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+import server
+from benchmark import mongomock_index_models, percentile
+
+CLASSES = ['8', '9', '10']
+
+def school_documents(school_index: int, args, rng: random.Random):
+    school = f"Bench School {school_index}"
+    school_id = server.school_key(school)
+    created = datetime(2025, 4, 1, tzinfo=timezone.utc)
+    user = lambda role, i, class_name=None: {
+        'id': str(uuid.uuid4()), 'name': f'{role} {i}', 'nickname': f'{role}{i}',
+        'email': f'{role}{i}@{school_id}.example', 'mobile': '0', 'role': role, 'dob': '2010-01-01',
+        'class_name': class_name, 'school': school, 'school_id': school_id, 'is_active': True,
+        'password': 'not-used', 'created_at': created.isoformat(),
+    }
+    students = [{**user(server.UserRole.STUDENT, i, CLASSES[i % len(CLASSES)]), 'student_code': server.generate_student_code()}
+                for i in range(args.students_per_school)]
+    teachers = [user(server.UserRole.TEACHER, i) for i in range(args.teachers_per_school)]
+    tests = [{
+        'id': str(uuid.uuid4()), 'title': f'Test {i}', 'subject_id': 'bench', 'class_name': CLASSES[i % len(CLASSES)],
+        'test_type': 'weekly', 'duration_minutes': 30, 'total_marks': 10, 'questions': [],
+        'created_by': teachers[i % len(teachers)]['id'], 'school_id': school_id,
+        'created_at': (created + timedelta(days=i)).isoformat(),
+    } for i in range(args.tests_per_school)]
+    results = [{
+        'id': str(uuid.uuid4()), 'test_id': rng.choice(tests)['id'], 'student_id': student['id'],
+        'school_id': school_id, 'answers': [], 'total_score': float(rng.randint(0, 10)), 'max_score': 10,
+        'submitted_at': (created + timedelta(hours=rng.randint(0, 2000))).isoformat(), 'evaluated': True,
+    } for student in students for _ in range(args.results_per_student)]
+    return school_id, students + teachers, tests, results
+
+async def seed(school_count: int, args):
+    rng = random.Random(args.seed)
+    school_ids = []
+    for i in range(school_count):
+        school_id, users, tests, results = school_documents(i, args, rng)
+        school_ids.append(school_id)
+        await server.db.users.insert_many(users)
+        token = server.current_school.set(school_id)
+        try:
+            await server.ensure_school_database(school_id)
+            await server.db.tests.insert_many(tests)
+            await server.db.test_results.insert_many(results)
+        finally:
+            server.current_school.reset(token)
+    return school_ids
+
+async def timed(fn, rounds: int) -> dict:
+    await fn()  # warm-up
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fn()
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return {"p50_ms": round(percentile(latencies, 50), 3), "p95_ms": round(percentile(latencies, 95), 3)}
+
+async def docs_examined(collection: str, query: dict) -> dict:
+    plan = await server.db[collection].find(query).explain()
+    stats = plan.get('executionStats', {})
+    return {"keys": stats.get('totalKeysExamined'), "docs": stats.get('totalDocsExamined'),
+            "returned": stats.get('nReturned')}
+
+async def measure(school_count: int, args) -> dict:
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        server.client = AsyncIOMotorClient(args.mongo_url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+        server.INDEX_MODELS = mongomock_index_models()
+    db_name = f"bench_schools_{uuid.uuid4().hex[:8]}"
+    server.db = server.SchoolRoutedDatabase(server.client, db_name) if args.layout == 'database' else server.client[db_name]
+    server._school_databases_ready.clear()
+    try:
+        await server.create_indexes()
+        school_ids = await seed(school_count, args)
+        school_id = school_ids[0]
+        teacher = {'user_id': 'bench', 'role': server.UserRole.TEACHER, 'school_id': school_id}
+
+        async def teacher_tests():
+            server.current_school.set(school_id)
+            return await server.get_tests(class_name='10', test_type=None, current_user=teacher)
+
+        queries = {
+            "admin_stats": lambda: server.get_admin_stats(school=school_id),
+            "admin_users_page": lambda: server.get_all_users(role=server.UserRole.STUDENT, is_active=None,
+                                                             school=school_id, skip=0, limit=50),
+            "admin_tests_page": lambda: server.get_admin_tests(school=school_id, class_name=None, skip=0, limit=50),
+            "teacher_tests": teacher_tests,
+        }
+        report = {name: await timed(fn, args.rounds) for name, fn in queries.items()}
+        if args.mongo_url:
+            server.current_school.set(school_id)
+            report['examined'] = {
+                "users_by_school_role": await docs_examined("users", {"school_id": school_id, "role": server.UserRole.STUDENT}),
+                "tests_by_school_class": await docs_examined("tests", server.school_scope(school_id) | {"class_name": "10"}),
+                "results_by_school": await docs_examined("test_results", {"school_id": school_id}),
+            }
+        return report
+    finally:
+        if args.mongo_url:
+            for name in await server.client.list_database_names():
+                if name.startswith(db_name):
+                    await server.client.drop_database(name)
+
+async def run(args) -> dict:
+    server.SCHOOL_LAYOUT = args.layout
+    report = {"config": {"layout": args.layout, "students_per_school": args.students_per_school,
+                         "teachers_per_school": args.teachers_per_school, "tests_per_school": args.tests_per_school,
+                         "results_per_student": args.results_per_student, "rounds": args.rounds,
+                         "mongo": "mongod" if args.mongo_url else "in-memory"},
+              "by_school_count": {}}
+    for school_count in args.schools:
+        report['by_school_count'][school_count] = await measure(school_count, args)
+        print(f"{school_count:>4} schools: " + "  ".join(
+            f"{name} {stats['p50_ms']:.2f}ms" for name, stats in report['by_school_count'][school_count].items()
+            if 'p50_ms' in stats))
+    first, last = (report['by_school_count'][n] for n in (args.schools[0], args.schools[-1]))
+    report['p50_growth'] = {
+        name: round(last[name]['p50_ms'] / first[name]['p50_ms'], 2)
+        for name in first if 'p50_ms' in first[name]
+    }
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--schools', default='1,4,16', help='comma-separated school counts')
+    parser.add_argument('--layout', choices=['shared', 'database'], default='shared')
+    parser.add_argument('--mongo-url', default=None)
+    parser.add_argument('--students-per-school', type=int, default=300)
+    parser.add_argument('--teachers-per-school', type=int, default=15)
+    parser.add_argument('--tests-per-school', type=int, default=40)
+    parser.add_argument('--results-per-student', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out', default='schools_bench.json')
+    args = parser.parse_args()
+    args.schools = sorted(int(n) for n in args.schools.split(','))
+    report = asyncio.run(run(args))
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(json.dumps(report['p50_growth'], indent=2))
+
+if __name__ == '__main__':
+    main()
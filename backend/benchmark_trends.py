@@ -0,0 +1,184 @@
+"""
+Trend benchmark: a student's weekly trend and a class's per-subject monthly trend, read from
+the performance_rollups buckets vs computed by scanning test_results.
+
+Seeds one school's class with tests across subjects and results spread over --weeks weeks,
+builds the buckets with rebuild_trend_rollups(), then times both ways of answering the same
+trend and checks that they agree. Also reports the cost the rollups add to a submission (one
+$inc bulk write) and the rebuild time. With a real mongod (--mongo-url) the report includes the
+documents each read examined.
+
+Usage:
+    python benchmark_trends.py --students 300 --results-per-student 60 --mongo-url mongodb://localhost:27017
+    python benchmark_trends.py --students 100 --results-per-student 40
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+os.environ.setdefault('JWT_SECRET', 'benchmark-only-secret-' + 'x' * 32)
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+
+import server
+from benchmark import percentile
+from benchmark_schools import docs_examined, timed
+
+SCHOOL_ID = 'bench-school'
+CLASS_NAME = '10'
+
+def documents(args, rng: random.Random):
+    start = datetime(2025, 4, 7, tzinfo=timezone.utc)
+    subjects = [f'subject-{i}' for i in range(args.subjects)]
+    tests = [{
+        'id': str(uuid.uuid4()), 'title': f'Test {i}', 'subject_id': subjects[i % len(subjects)],
+        'class_name': CLASS_NAME, 'test_type': 'weekly', 'duration_minutes': 30, 'total_marks': 20,
+        'questions': [], 'school_id': SCHOOL_ID, 'created_at': start.isoformat(),
+    } for i in range(args.tests)]
+    students = [str(uuid.uuid4()) for _ in range(args.students)]
+    results = [{
+        'id': str(uuid.uuid4()), 'test_id': rng.choice(tests)['id'], 'student_id': student_id,
+        'school_id': SCHOOL_ID, 'answers': [], 'total_score': float(rng.randint(0, 20)), 'max_score': 20,
+        'submitted_at': (start + timedelta(minutes=rng.randint(0, args.weeks * 7 * 24 * 60))).isoformat(),
+        'evaluated': True,
+    } for student_id in students for _ in range(args.results_per_student)]
+    return students, tests, results
+
+def scan_points(results, period: str, limit: int):
+    """The trend computed from raw results, as trend_points() formats bucket documents"""
+    buckets = {}
+    for r in results:
+        bucket_start, label = server.trend_bucket(datetime.fromisoformat(r['submitted_at']), period)
+        b = buckets.setdefault(bucket_start, {'bucket_start': bucket_start, 'label': label, 'tests': 0,
+                                              'obtained': 0.0, 'max_marks': 0.0, 'percent_sum': 0.0})
+        b['tests'] += 1
+        b['obtained'] += r['total_score']
+        b['max_marks'] += r['max_score']
+        b['percent_sum'] += server.result_percent(r['total_score'], r['max_score'])
+    return server.trend_points(sorted(buckets.values(), key=lambda b: b['bucket_start'])[-limit:])
+
+async def scan_student_trend(student_id: str, period: str, limit: int):
+    results = await server.db.test_results.find(
+        {"student_id": student_id}, {"_id": 0, "total_score": 1, "max_score": 1, "submitted_at": 1}
+    ).to_list(None)
+    return scan_points(results, period, limit)
+
+async def scan_class_trend(period: str, limit: int):
+    tests = await server.db.tests.find(
+        {"school_id": SCHOOL_ID, "class_name": CLASS_NAME}, {"_id": 0, "id": 1, "subject_id": 1}).to_list(None)
+    subject_of = {t['id']: t['subject_id'] for t in tests}
+    by_subject = defaultdict(list)
+    async for r in server.db.test_results.find(
+        {"test_id": {"$in": list(subject_of)}},
+        {"_id": 0, "test_id": 1, "total_score": 1, "max_score": 1, "submitted_at": 1}
+    ):
+        by_subject[subject_of[r['test_id']]].append(r)
+    return {subject: scan_points(results, period, limit) for subject, results in by_subject.items()}
+
+async def run(args) -> dict:
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        server.client = AsyncIOMotorClient(args.mongo_url)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        server.client = AsyncMongoMockClient()
+    db_name = f"bench_trends_{uuid.uuid4().hex[:8]}"
+    server.db = server.client[db_name]
+    rng = random.Random(args.seed)
+    try:
+        await server.create_indexes()
+        students, tests, results = documents(args, rng)
+        await server.db.tests.insert_many(tests)
+        for start in range(0, len(results), 10000):
+            await server.db.test_results.insert_many(results[start:start + 10000])
+
+        started = time.perf_counter()
+        rebuilt = await server.rebuild_trend_rollups(SCHOOL_ID)
+        rebuild_ms = (time.perf_counter() - started) * 1000
+
+        student_id = students[0]
+        teacher = {'user_id': 'bench', 'role': server.UserRole.TEACHER, 'school_id': SCHOOL_ID}
+        student = {'user_id': student_id, 'role': server.UserRole.STUDENT, 'school_id': SCHOOL_ID}
+        rollup_student = lambda: server.get_student_trend(student_id, period='week', limit=args.limit, current_user=student)
+        rollup_class = lambda: server.get_class_trend(CLASS_NAME, subject_id=None, period='month', limit=args.limit,
+                                                      school=None, current_user=teacher)
+
+        # Both ways must give the same answer before their timings mean anything
+        rolled = await rollup_class()
+        agree = {
+            "student_week": (await rollup_student())['points'] == await scan_student_trend(student_id, 'week', args.limit),
+            "class_month": {s['subject_id']: s['points'] for s in rolled['subjects']} == await scan_class_trend('month', args.limit),
+        }
+
+        report = {
+            "config": {"students": args.students, "results_per_student": args.results_per_student,
+                       "tests": args.tests, "subjects": args.subjects, "weeks": args.weeks, "limit": args.limit,
+                       "rounds": args.rounds, "periods": server.TREND_PERIODS,
+                       "mongo": "mongod" if args.mongo_url else "in-memory"},
+            "rebuild": {**rebuilt, "ms": round(rebuild_ms, 1)},
+            "agree": agree,
+            "student_week": {
+                "scan": await timed(lambda: scan_student_trend(student_id, 'week', args.limit), args.rounds),
+                "rollup": await timed(rollup_student, args.rounds),
+            },
+            "class_month": {
+                "scan": await timed(lambda: scan_class_trend('month', args.limit), max(args.rounds // 5, 3)),
+                "rollup": await timed(rollup_class, args.rounds),
+            },
+        }
+        for name in ("student_week", "class_month"):
+            report[name]['speedup_p50'] = round(report[name]['scan']['p50_ms'] / report[name]['rollup']['p50_ms'], 1)
+
+        # What a submission pays for keeping the buckets current
+        test = tests[0]
+        latencies = []
+        for _ in range(args.rounds):
+            result = {'student_id': rng.choice(students), 'school_id': SCHOOL_ID, 'total_score': 10.0, 'max_score': 20,
+                      'submitted_at': datetime.now(timezone.utc).isoformat()}
+            started = time.perf_counter()
+            await server.update_trend_rollups(server.result_increments(result, test))
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        report['submission_overhead'] = {
+            "bucket_updates": len(server.result_increments(result, test)),
+            "p50_ms": round(percentile(latencies, 50), 3), "p95_ms": round(percentile(latencies, 95), 3),
+        }
+
+        if args.mongo_url:
+            report['examined'] = {
+                "scan_student": await docs_examined("test_results", {"student_id": student_id}),
+                "rollup_student": await docs_examined("performance_rollups", {"student_id": student_id, "period": "week"}),
+                "scan_class": await docs_examined("test_results", {"test_id": {"$in": [t['id'] for t in tests]}}),
+                "rollup_class": await docs_examined("performance_rollups", {
+                    "scope": "class", "school_id": SCHOOL_ID, "class_name": CLASS_NAME, "period": "month"}),
+            }
+        return report
+    finally:
+        if args.mongo_url:
+            await server.client.drop_database(db_name)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-url', default=None)
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--results-per-student', type=int, default=40)
+    parser.add_argument('--tests', type=int, default=60)
+    parser.add_argument('--subjects', type=int, default=4)
+    parser.add_argument('--weeks', type=int, default=40, help='results are spread over this many weeks')
+    parser.add_argument('--limit', type=int, default=12, help='buckets per trend')
+    parser.add_argument('--rounds', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--out', default='trends_bench.json')
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
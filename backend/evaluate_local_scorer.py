@@ -0,0 +1,116 @@
+"""
+Offline evaluation of the local SHORT/LONG fast-path scorer against LLM grading.
+
+Samples stored submissions, scores every subjective answer both locally (vectorized per
+question) and with the LLM grader, and reports how often the local decision agrees with
+the LLM, how much traffic still goes to the LLM, and the error on locally decided answers.
+Thresholds are read from the same LOCAL_SCORE_* env vars the server uses.
+
+Usage:
+    python evaluate_local_scorer.py --limit 500 --out local_scorer_report.json
+"""
+import argparse
+import asyncio
+import json
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+import server
+
+SUBJECTIVE_TYPES = (server.QuestionType.SHORT, server.QuestionType.LONG)
+
+async def collect_answers(limit: int):
+    """{(test_id, question_index): (question, [answer_text, ...])} from the latest results"""
+    grouped = {}
+    tests = {}
+    cursor = server.db.test_results.find(
+        {}, {"_id": 0, "test_id": 1, "answers": 1}
+    ).sort("submitted_at", -1).limit(limit)
+    async for result in cursor:
+        test_id = result['test_id']
+        if test_id not in tests:
+            tests[test_id] = await server.db.tests.find_one({"id": test_id}, {"_id": 0, "questions": 1})
+        test = tests[test_id]
+        if not test:
+            continue
+        for i, ans in enumerate(server.decode_answers(result.get('answers', []))):
+            if i >= len(test['questions']):
+                break
+            question = test['questions'][i]
+            if question['question_type'] not in SUBJECTIVE_TYPES or not question.get('correct_answer'):
+                continue
+            answer_text = ans.get('ocr_text') or ans.get('answer_text') or ''
+            if not answer_text:
+                continue
+            grouped.setdefault((test_id, i), (question, []))[1].append(answer_text)
+    return grouped
+
+async def evaluate(limit: int, tolerance: float, concurrency: int) -> dict:
+    await server.connect_to_mongo()
+    grouped = await collect_answers(limit)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def llm_score(question, answer):
+        async with semaphore:
+            return await server.evaluate_answer(
+                question['question_text'], question['correct_answer'], answer, question['marks'])
+
+    outcomes = defaultdict(int)
+    abs_errors = []
+    for question, answers in grouped.values():
+        local = server.local_scores(question, answers)
+        llm = await asyncio.gather(*(llm_score(question, a) for a in answers))
+        marks = question['marks']
+        for local_score, llm_value in zip(local, llm):
+            outcomes['answers'] += 1
+            if local_score is None:
+                outcomes['routed_to_llm'] += 1
+                continue
+            label = 'local_right' if local_score > 0 else 'local_wrong'
+            outcomes[label] += 1
+            error = abs(local_score - llm_value)
+            abs_errors.append(error / marks if marks else 0.0)
+            if error <= tolerance * marks:
+                outcomes[f'{label}_agreed'] += 1
+
+    decided = outcomes['local_right'] + outcomes['local_wrong']
+    agreed = outcomes['local_right_agreed'] + outcomes['local_wrong_agreed']
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "results_sampled": limit,
+        "questions": len(grouped),
+        "thresholds": {
+            "high_similarity": server.LOCAL_SCORE_HIGH_SIMILARITY,
+            "high_coverage": server.LOCAL_SCORE_HIGH_COVERAGE,
+            "low_similarity": server.LOCAL_SCORE_LOW_SIMILARITY,
+            "low_coverage": server.LOCAL_SCORE_LOW_COVERAGE,
+            "high_order": server.LOCAL_SCORE_HIGH_ORDER,
+            "min_terms": server.LOCAL_SCORE_MIN_TERMS,
+            "agreement_tolerance": tolerance,
+        },
+        "counts": dict(outcomes),
+        "llm_calls_saved_pct": round(decided / outcomes['answers'] * 100, 2) if outcomes['answers'] else 0.0,
+        "agreement_pct": round(agreed / decided * 100, 2) if decided else None,
+        "local_right_agreement_pct": round(outcomes['local_right_agreed'] / outcomes['local_right'] * 100, 2)
+        if outcomes['local_right'] else None,
+        "local_wrong_agreement_pct": round(outcomes['local_wrong_agreed'] / outcomes['local_wrong'] * 100, 2)
+        if outcomes['local_wrong'] else None,
+        "mean_abs_error_fraction_of_marks": round(sum(abs_errors) / len(abs_errors), 4) if abs_errors else None,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--limit', type=int, default=500, help='latest test_results to sample')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='agreement if |local - llm| <= tolerance * marks')
+    parser.add_argument('--concurrency', type=int, default=8, help='parallel LLM calls')
+    parser.add_argument('--out', default='local_scorer_report.json')
+    args = parser.parse_args()
+
+    report = asyncio.run(evaluate(args.limit, args.tolerance, args.concurrency))
+    Path(args.out).write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Convert stored test_results answers to the compact layout (see server.encode_answers).
+
+Rewrites documents whose answers still use full field names: nulls are dropped, keys are
+shortened and handwritten photos are stored as bytes instead of base64. Reports stored
+bytes per result before and after. The API reads both layouts, so this can run while the
+app is serving traffic and can be stopped and re-run at any point. Per-question scores are
+not back-filled here; re-grade a test (POST /api/tests/{id}/regrade) to store them.
+
+Usage:
+    python migrate_compact_answers.py --dry-run
+    python migrate_compact_answers.py --batch-size 1000
+"""
+import argparse
+import asyncio
+import json
+
+import bson
+from pymongo import UpdateOne
+
+import server
+
+LEGACY = {"answers.question_index": {"$exists": True}}
+
+async def migrate_database(batch_size: int, dry_run: bool, stats: dict):
+    last_id = None
+    while True:
+        query = dict(LEGACY, **({"id": {"$gt": last_id}} if last_id else {}))
+        batch = await server.db.test_results.find(query).sort("id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        updates = []
+        for doc in batch:
+            compact = server.encode_answers(doc['answers'])
+            stats['bytes_before'] += len(bson.encode(doc))
+            stats['bytes_after'] += len(bson.encode({**doc, 'answers': compact}))
+            updates.append(UpdateOne({"id": doc['id'], **LEGACY}, {"$set": {"answers": compact}}))
+        if not dry_run:
+            await server.db.test_results.bulk_write(updates, ordered=False)
+        stats['results'] += len(batch)
+        last_id = batch[-1]['id']
+        print(f"{'measured' if dry_run else 'migrated'} {stats['results']} results")
+
+async def migrate(batch_size: int, dry_run: bool) -> dict:
+    await server.connect_to_mongo()
+    stats = {"results": 0, "bytes_before": 0, "bytes_after": 0}
+    await server.across_schools(lambda: migrate_database(batch_size, dry_run, stats))
+
+    if stats['results']:
+        stats['avg_bytes_before'] = round(stats['bytes_before'] / stats['results'])
+        stats['avg_bytes_after'] = round(stats['bytes_after'] / stats['results'])
+        stats['reduction_pct'] = round((1 - stats['bytes_after'] / stats['bytes_before']) * 100, 1)
+    stats['dry_run'] = dry_run
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true', help='measure the size change without writing')
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(migrate(args.batch_size, args.dry_run)), indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -1,25 +1,55 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, File, UploadFile, Form, status
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import (
+    FastAPI, APIRouter, HTTPException, Depends, File, UploadFile, Form, Request, WebSocket,
+    WebSocketDisconnect, status,
+)
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, Field, EmailStr, validator
+from pymongo import IndexModel, UpdateOne, ReplaceOne, ReturnDocument, ASCENDING, DESCENDING, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.read_preferences import Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest
+from pydantic import BaseModel, Field, EmailStr, ValidationError, validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
 import os
+import re
+import sys
+import heapq
+import random
 import logging
+import threading
 import uuid
 import bcrypt
 import jwt
 import base64
-from io import BytesIO
-from PIL import Image
-import pytesseract
-import pandas as pd
-from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+import binascii
+import csv
+import hashlib
+import secrets
+import json
+import gzip
+import functools
+import math
+import itertools
+import socket
+import zipfile
+import contextlib
+import multiprocessing
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from collections import Counter, OrderedDict
+from io import BytesIO, StringIO
 import asyncio
+# Heavy optional-path dependencies (PIL, pytesseract, pandas, emergentintegrations) are
+# imported inside the functions that use them so worker startup doesn't pay for them.
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -36,15 +66,196 @@ if not JWT_SECRET or len(JWT_SECRET) < 32:
 mongo_url = os.environ.get('MONGO_URL')
 if not mongo_url:
     raise RuntimeError("CRITICAL: MONGO_URL must be set in .env file")
+DB_NAME = os.environ.get('DB_NAME', 'test_database')
+
+# Connection pool configuration (per worker process)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', 100))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', 10000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 10000))
+MONGO_COMPRESSORS = os.environ.get('MONGO_COMPRESSORS', '')  # e.g. "zstd,snappy,zlib"
+
+# Read routing: heavy read endpoints may go to secondaries; anything not listed reads from primary
+READ_PREFERENCES = {
+    'analytics': os.environ.get('READ_PREFERENCE_ANALYTICS', 'secondaryPreferred'),
+    'admin': os.environ.get('READ_PREFERENCE_ADMIN', 'secondaryPreferred'),
+    'master_bank': os.environ.get('READ_PREFERENCE_MASTER_BANK', 'secondaryPreferred'),
+}
+READ_MAX_STALENESS_SECONDS = int(os.environ.get('READ_MAX_STALENESS_SECONDS', 90))  # MongoDB minimum is 90
 
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ.get('DB_NAME', 'test_database')]
+# Command monitoring: per collection/op timings, slow-query log and sampled explain() capture
+MONGO_MONITORING = os.environ.get('MONGO_MONITORING', 'true').lower() == 'true'
+MONGO_SLOW_QUERY_MS = float(os.environ.get('MONGO_SLOW_QUERY_MS', 100))
+MONGO_EXPLAIN_SAMPLE_RATE = float(os.environ.get('MONGO_EXPLAIN_SAMPLE_RATE', 0.1))  # of slow commands
+MONGO_EXPLAIN_INTERVAL_SECONDS = int(os.environ.get('MONGO_EXPLAIN_INTERVAL_SECONDS', 600))  # per shape
+MONGO_SLOW_SHAPES = int(os.environ.get('MONGO_SLOW_SHAPES', 200))  # tracked per worker
+
+for _policy, _mode in READ_PREFERENCES.items():
+    if _mode not in ('primary', 'primaryPreferred', 'secondary', 'secondaryPreferred', 'nearest'):
+        raise RuntimeError(f"CRITICAL: READ_PREFERENCE_{_policy.upper()} has unknown mode '{_mode}'")
+
+# Created per worker in the startup hook (see connect_to_mongo), never at import time
+client: Optional[AsyncIOMotorClient] = None
+db = None
 
 # JWT Configuration
 JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRATION = int(os.environ.get('JWT_EXPIRATION_MINUTES', 10080))
 EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
 
+# Profiling Configuration
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', ROOT_DIR / 'profiles'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+PROFILE_SLOWEST_N = int(os.environ.get('PROFILE_SLOWEST_N', 5))
+PROFILE_FLUSH_SECONDS = int(os.environ.get('PROFILE_FLUSH_SECONDS', 300))
+
+# CPU-bound work (bcrypt, OCR) offloaded to a process pool
+CPU_POOL_WORKERS = int(os.environ.get('CPU_POOL_WORKERS', os.cpu_count() or 2))
+ROSTER_BATCH_SIZE = int(os.environ.get('ROSTER_BATCH_SIZE', 1000))
+
+# OCR: preprocessing of phone photos and Tesseract modes
+OCR_PREPROCESS = os.environ.get('OCR_PREPROCESS', 'true').lower() == 'true'
+OCR_TARGET_DPI = int(os.environ.get('OCR_TARGET_DPI', 300))  # photo treated as an A4 page
+OCR_MAX_UPSCALE = float(os.environ.get('OCR_MAX_UPSCALE', 2.0))
+OCR_BINARIZE_OFFSET = float(os.environ.get('OCR_BINARIZE_OFFSET', 0.15))
+OCR_MAX_SKEW_DEGREES = float(os.environ.get('OCR_MAX_SKEW_DEGREES', 10))
+OCR_PSM = int(os.environ.get('OCR_PSM', 6))  # 6 = single uniform block of text
+OCR_OEM = int(os.environ.get('OCR_OEM', 1))  # 1 = LSTM engine only
+OCR_LANG = os.environ.get('OCR_LANG', 'eng')
+OCR_CACHE_SIZE = int(os.environ.get('OCR_CACHE_SIZE', 2048))  # in-memory LRU entries per worker
+OCR_CACHE_TTL_SECONDS = int(os.environ.get('OCR_CACHE_TTL_SECONDS', 7 * 24 * 3600))  # Mongo TTL
+
+# Local fast-path scoring for SHORT/LONG answers; only the ambiguous middle band goes to the LLM
+LOCAL_SCORING_ENABLED = os.environ.get('LOCAL_SCORING_ENABLED', 'true').lower() == 'true'
+LOCAL_SCORE_HIGH_SIMILARITY = float(os.environ.get('LOCAL_SCORE_HIGH_SIMILARITY', 0.85))
+LOCAL_SCORE_HIGH_COVERAGE = float(os.environ.get('LOCAL_SCORE_HIGH_COVERAGE', 0.9))
+LOCAL_SCORE_LOW_SIMILARITY = float(os.environ.get('LOCAL_SCORE_LOW_SIMILARITY', 0.05))
+LOCAL_SCORE_LOW_COVERAGE = float(os.environ.get('LOCAL_SCORE_LOW_COVERAGE', 0.0))
+# Full marks without the LLM also need the reference's word order (share of its keyword bigrams
+# the answer repeats) and a reference of at least this many keywords; shorter ones need an exact match
+LOCAL_SCORE_HIGH_ORDER = float(os.environ.get('LOCAL_SCORE_HIGH_ORDER', 0.8))
+LOCAL_SCORE_MIN_TERMS = int(os.environ.get('LOCAL_SCORE_MIN_TERMS', 3))
+
+# Re-grading jobs: results per checkpointed batch, parallel LLM calls, worker lease length
+REGRADE_BATCH_SIZE = int(os.environ.get('REGRADE_BATCH_SIZE', 200))
+REGRADE_CONCURRENCY = int(os.environ.get('REGRADE_CONCURRENCY', 8))
+REGRADE_LEASE_SECONDS = int(os.environ.get('REGRADE_LEASE_SECONDS', 120))
+
+# Exam scheduling: pre-warm tests this many minutes before scheduled_at (0 disables) and
+# accept submissions until scheduled_at + duration + grace
+PREWARM_LEAD_MINUTES = int(os.environ.get('PREWARM_LEAD_MINUTES', 10))
+PREWARM_POLL_SECONDS = int(os.environ.get('PREWARM_POLL_SECONDS', 30))
+EXAM_WINDOW_ENFORCED = os.environ.get('EXAM_WINDOW_ENFORCED', 'true').lower() == 'true'
+EXAM_GRACE_MINUTES = int(os.environ.get('EXAM_GRACE_MINUTES', 5))
+
+# HTTP caching/compression of GET responses, and the in-process reference-data cache
+HTTP_ETAGS_ENABLED = os.environ.get('HTTP_ETAGS_ENABLED', 'true').lower() == 'true'
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))  # 11 is too slow per request
+REFERENCE_CACHE_CHECK_SECONDS = float(os.environ.get('REFERENCE_CACHE_CHECK_SECONDS', 5))
+
+# Archival of old results to Parquet: academic terms start on these MM-DD dates
+ARCHIVE_DIR = Path(os.environ.get('ARCHIVE_DIR', ROOT_DIR / 'archive'))
+ACADEMIC_TERM_STARTS = [
+    tuple(int(part) for part in start.split('-'))
+    for start in os.environ.get('ACADEMIC_TERM_STARTS', '04-01,10-01').split(',')
+]
+ARCHIVE_KEEP_TERMS = int(os.environ.get('ARCHIVE_KEEP_TERMS', 2))  # current term + previous
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 5000))
+
+# Item analysis reports kept per worker (one per test)
+ITEM_ANALYSIS_CACHE_SIZE = int(os.environ.get('ITEM_ANALYSIS_CACHE_SIZE', 256))
+
+# Live exam monitoring: updates to a test's viewers are coalesced over LIVE_COALESCE_MS, and
+# the state is re-read from Mongo every LIVE_RESYNC_SECONDS (submissions on other workers)
+LIVE_COALESCE_MS = int(os.environ.get('LIVE_COALESCE_MS', 500))
+LIVE_RESYNC_SECONDS = float(os.environ.get('LIVE_RESYNC_SECONDS', 5))
+LIVE_SEND_TIMEOUT_SECONDS = float(os.environ.get('LIVE_SEND_TIMEOUT_SECONDS', 5))
+LIVE_DISTRIBUTION_BINS = int(os.environ.get('LIVE_DISTRIBUTION_BINS', 10))
+
+# Paper answer sheets: scanned PDF/ZIP/TIFF batches, OCR'd across the CPU pool
+ANSWER_SHEET_MAX_MB = int(os.environ.get('ANSWER_SHEET_MAX_MB', 300))  # upload, and a ZIP's expanded size
+ANSWER_SHEET_MAX_PAGES = int(os.environ.get('ANSWER_SHEET_MAX_PAGES', 1000))
+ANSWER_SHEET_OCR_CONCURRENCY = int(os.environ.get('ANSWER_SHEET_OCR_CONCURRENCY', 2 * CPU_POOL_WORKERS))
+
+# Rate limiting: a token bucket per caller (user, or client IP when unauthenticated) per endpoint
+# class. "<burst>/<seconds>" allows bursts of <burst> requests, refilled at <burst> per <seconds>;
+# "off" disables a class. RATE_LIMIT_STORE=mongo shares the buckets between workers.
+RATE_LIMITS = {
+    'auth': os.environ.get('RATE_LIMIT_AUTH', '10/60'),        # login, signup (bcrypt): per email + IP
+    'auth_ip': os.environ.get('RATE_LIMIT_AUTH_IP', '600/60'), # login, signup: per IP over all emails;
+                                                               # a school behind one NAT logs in together
+    'ocr': os.environ.get('RATE_LIMIT_OCR', '30/60'),          # /upload-image
+    'submit': os.environ.get('RATE_LIMIT_SUBMIT', '10/60'),    # test submissions (OCR + LLM grading)
+    'bulk': os.environ.get('RATE_LIMIT_BULK', '5/300'),        # imports, uploads, answer sheets, re-grades
+}
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))  # in-memory buckets per worker
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+
+# Admission control per worker: requests doing OCR, LLM grading or password hashing at once.
+# Up to <queue> more wait for a slot, for at most <timeout> seconds; the rest get 429.
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_SECONDS', 10))
+ADMISSION_LIMITS = {
+    'ocr': (int(os.environ.get('ADMISSION_OCR_CONCURRENCY', 2 * CPU_POOL_WORKERS)),
+            int(os.environ.get('ADMISSION_OCR_QUEUE', 4 * CPU_POOL_WORKERS)),
+            ADMISSION_QUEUE_TIMEOUT_SECONDS),
+    'grading': (int(os.environ.get('ADMISSION_GRADING_CONCURRENCY', 32)),
+                int(os.environ.get('ADMISSION_GRADING_QUEUE', 64)),
+                ADMISSION_QUEUE_TIMEOUT_SECONDS),
+    # A whole school logs in at exam start and bcrypt takes ~250ms a core: let logins queue
+    # long rather than shed them
+    'hashing': (int(os.environ.get('ADMISSION_HASHING_CONCURRENCY', CPU_POOL_WORKERS)),
+                int(os.environ.get('ADMISSION_HASHING_QUEUE', 2000)),
+                float(os.environ.get('ADMISSION_HASHING_QUEUE_TIMEOUT_SECONDS', 120))),
+}
+ADMISSION_RETRY_AFTER_SECONDS = int(os.environ.get('ADMISSION_RETRY_AFTER_SECONDS', 5))
+
+def parse_rate_limit(name: str, spec: str) -> Optional[tuple]:
+    """'<burst>/<seconds>' -> (capacity, tokens per second); None for 'off'"""
+    if spec.strip().lower() == 'off':
+        return None
+    try:
+        burst, seconds = (float(part) for part in spec.split('/'))
+    except ValueError:
+        burst = seconds = 0
+    if burst < 1 or seconds <= 0:
+        raise RuntimeError(f"CRITICAL: RATE_LIMIT_{name.upper()} must be '<burst>/<seconds>' or 'off', not '{spec}'")
+    return burst, burst / seconds
+
+RATE_LIMIT_BUCKETS = {name: parse_rate_limit(name, spec) for name, spec in RATE_LIMITS.items()}
+if RATE_LIMIT_STORE not in ('memory', 'mongo'):
+    raise RuntimeError(f"CRITICAL: RATE_LIMIT_STORE must be 'memory' or 'mongo', not '{RATE_LIMIT_STORE}'")
+
+# Performance trends: score buckets per student and per class+subject, kept for these periods
+TREND_PERIODS = [p.strip() for p in os.environ.get('TREND_PERIODS', 'week,month,term').split(',') if p.strip()]
+TREND_MAX_BUCKETS = int(os.environ.get('TREND_MAX_BUCKETS', 104))  # points per trend request
+if not TREND_PERIODS or set(TREND_PERIODS) - {'week', 'month', 'term'}:
+    raise RuntimeError(f"CRITICAL: TREND_PERIODS must be a list of week, month, term, not {TREND_PERIODS}")
+
+# Tracing: spans for the stages of a request, exported as OTLP/JSON. TRACE_EXPORT=file appends
+# to TRACE_FILE, =otlp POSTs to an OTLP/HTTP collector. TRACE_SAMPLE_RATE of traces are kept,
+# plus every trace slower than TRACE_SLOW_MS; an incoming traceparent's decision wins.
+TRACE_EXPORT = os.environ.get('TRACE_EXPORT', 'off')
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0.01))
+TRACE_SLOW_MS = float(os.environ.get('TRACE_SLOW_MS', 2000))
+TRACE_FILE = Path(os.environ.get('TRACE_FILE', ROOT_DIR / 'traces' / 'traces.jsonl'))
+TRACE_OTLP_ENDPOINT = os.environ.get('TRACE_OTLP_ENDPOINT', 'http://localhost:4318/v1/traces')
+TRACE_SERVICE_NAME = os.environ.get('TRACE_SERVICE_NAME', 'exam-api')
+TRACE_EXPORT_INTERVAL_SECONDS = float(os.environ.get('TRACE_EXPORT_INTERVAL_SECONDS', 5))
+TRACE_EXPORT_BATCH = int(os.environ.get('TRACE_EXPORT_BATCH', 1000))  # spans per file line / POST
+TRACE_MAX_PENDING = int(os.environ.get('TRACE_MAX_PENDING', 20000))  # spans buffered per worker
+if TRACE_EXPORT not in ('off', 'file', 'otlp'):
+    raise RuntimeError(f"CRITICAL: TRACE_EXPORT must be 'off', 'file' or 'otlp', not '{TRACE_EXPORT}'")
+
+# School scoping: users, tests, results and subjects carry a school_id. SCHOOL_LAYOUT=database
+# keeps each school's tests, results and subjects in a database of its own (<DB_NAME>_<school_id>)
+SCHOOL_LAYOUT = os.environ.get('SCHOOL_LAYOUT', 'shared')
+if SCHOOL_LAYOUT not in ('shared', 'database'):
+    raise RuntimeError(f"CRITICAL: SCHOOL_LAYOUT must be 'shared' or 'database', not '{SCHOOL_LAYOUT}'")
+
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -53,6 +264,572 @@ security = HTTPBearer()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ============= METRICS =============
+
+# In-process counters, per worker. Keys are dotted names, e.g. "reads.analytics.secondaryPreferred"
+METRICS: Counter = Counter()
+
+def incr_metric(name: str, amount: int = 1):
+    METRICS[name] += amount
+
+# ============= TRACING =============
+
+# Spans of the current request; None outside a request (jobs, startup) and when not recording
+current_trace: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+current_span_id: ContextVar[Optional[str]] = ContextVar("current_span_id", default=None)
+
+TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+class Trace:
+    """Spans of one request, kept until its root span ends and the trace is exported or dropped"""
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List[Dict[str, Any]] = []
+
+def parse_traceparent(header: Optional[str]) -> Optional[tuple]:
+    """W3C `traceparent` -> (trace_id, parent_span_id, sampled), None if absent or malformed"""
+    match = TRACEPARENT_RE.match((header or '').strip().lower())
+    if not match or match.group(1) == '0' * 32 or match.group(2) == '0' * 16:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+@contextlib.contextmanager
+def span(name: str, **attributes):
+    """`with span("test.fetch", test_id=...):` times a stage of the current request as a child
+    of the enclosing span; a no-op when the request isn't traced"""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    record = {
+        "name": name, "span_id": secrets.token_hex(8), "parent_span_id": current_span_id.get(),
+        "start_ns": time.time_ns(), "attributes": attributes,
+    }
+    token = current_span_id.set(record['span_id'])
+    try:
+        yield
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record['end_ns'] = time.time_ns()
+        current_span_id.reset(token)
+        trace.spans.append(record)
+
+def otlp_value(value) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def otlp_span(trace_id: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    otlp = {
+        "traceId": trace_id,
+        "spanId": record['span_id'],
+        "name": record['name'],
+        "kind": 2 if record['parent_span_id'] is None or record.get('remote_parent') else 1,  # SERVER / INTERNAL
+        "startTimeUnixNano": str(record['start_ns']),
+        "endTimeUnixNano": str(record['end_ns']),
+        "attributes": [{"key": k, "value": otlp_value(v)} for k, v in record['attributes'].items()],
+        "status": {"code": 2, "message": record['error']} if 'error' in record else {"code": 1},
+    }
+    if record['parent_span_id']:
+        otlp['parentSpanId'] = record['parent_span_id']
+    return otlp
+
+class TraceExporter:
+    """
+    Buffers finished traces and writes them every TRACE_EXPORT_INTERVAL_SECONDS as OTLP/JSON
+    (ExportTraceServiceRequest): one line per batch appended to TRACE_FILE, or POSTed to an
+    OTLP/HTTP collector at TRACE_OTLP_ENDPOINT. Spans beyond TRACE_MAX_PENDING are dropped.
+    """
+    def __init__(self):
+        self.pending: List[Dict[str, Any]] = []
+
+    def add(self, trace: Trace):
+        if len(self.pending) + len(trace.spans) > TRACE_MAX_PENDING:
+            incr_metric("tracing.dropped_spans", len(trace.spans))
+            return
+        self.pending.extend(otlp_span(trace.trace_id, record) for record in trace.spans)
+        incr_metric("tracing.exported_traces")
+
+    def payload(self, spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {"resourceSpans": [{
+            "resource": {"attributes": [
+                {"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}},
+                {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+            ]},
+            "scopeSpans": [{"scope": {"name": "exam-api"}, "spans": spans}],
+        }]}
+
+    async def flush(self):
+        while self.pending:
+            batch, self.pending = self.pending[:TRACE_EXPORT_BATCH], self.pending[TRACE_EXPORT_BATCH:]
+            body = json.dumps(self.payload(batch), separators=(',', ':'))
+            try:
+                if TRACE_EXPORT == 'file':
+                    await asyncio.to_thread(self.append, body)
+                else:
+                    import httpx
+                    async with httpx.AsyncClient(timeout=10) as http:
+                        response = await http.post(
+                            TRACE_OTLP_ENDPOINT, content=body, headers={"Content-Type": "application/json"})
+                        response.raise_for_status()
+                incr_metric("tracing.exported_spans", len(batch))
+            except Exception as e:
+                incr_metric("tracing.export_errors")
+                logger.warning(f"Trace export to {TRACE_EXPORT} failed, dropping {len(batch)} spans: {e}")
+
+    @staticmethod
+    def append(body: str):
+        TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(TRACE_FILE, 'a') as f:
+            f.write(body + '\n')
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(TRACE_EXPORT_INTERVAL_SECONDS)
+            await self.flush()
+
+trace_exporter = TraceExporter()
+
+@app.middleware("http")
+async def tracing_middleware(request: Request, call_next):
+    """
+    Root span per request. The trace continues an incoming W3C `traceparent` (and its sampling
+    decision), else starts here; its id is returned in `traceparent` and `X-Trace-Id` either
+    way. Head-sampled traces (TRACE_SAMPLE_RATE) are exported, and so is any slower than
+    TRACE_SLOW_MS, so spans are recorded for every request while TRACE_EXPORT is on.
+    """
+    incoming = parse_traceparent(request.headers.get('traceparent'))
+    if incoming:
+        trace_id, parent_span_id, sampled = incoming
+    else:
+        trace_id, parent_span_id = secrets.token_hex(16), None
+        sampled = TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE
+    trace = Trace(trace_id, sampled) if TRACE_EXPORT != 'off' else None
+    span_id = secrets.token_hex(8)
+    trace_token = current_trace.set(trace)
+    span_token = current_span_id.set(span_id)
+    started_ns = time.time_ns()
+    response = None
+    try:
+        response = await call_next(request)
+    finally:
+        current_trace.reset(trace_token)
+        current_span_id.reset(span_token)
+        ended_ns = time.time_ns()
+        if trace is not None and (sampled or (ended_ns - started_ns) / 1e6 >= TRACE_SLOW_MS):
+            route = request.scope.get('route')
+            trace.spans.append({
+                "name": f"{request.method} {route.path if route else request.url.path}",
+                "span_id": span_id, "parent_span_id": parent_span_id, "remote_parent": True,
+                "start_ns": started_ns, "end_ns": ended_ns,
+                "attributes": {
+                    "http.method": request.method, "http.target": request.url.path,
+                    "http.status_code": response.status_code if response is not None else 500,
+                },
+                **({} if response is not None else {"error": "unhandled exception"}),
+            })
+            trace_exporter.add(trace)
+    response.headers['traceparent'] = f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+    response.headers['X-Trace-Id'] = trace_id
+    return response
+
+@app.on_event("startup")
+async def start_trace_exporter():
+    if TRACE_EXPORT != 'off':
+        asyncio.create_task(trace_exporter.run())
+
+@app.on_event("shutdown")
+async def flush_traces():
+    if TRACE_EXPORT != 'off':
+        await trace_exporter.flush()
+
+# ============= QUERY MONITORING =============
+
+# Commands whose filter shape is tracked and that can be explained; the rest (insert,
+# getMore, ...) only count towards the per collection/op timings
+SHAPED_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Driver and session fields that must not be passed into an explain
+EXPLAIN_DROP_FIELDS = {
+    "lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit", "startTransaction",
+    "readConcern", "writeConcern", "apiVersion", "apiStrict", "apiDeprecationErrors",
+}
+
+def query_shape(value):
+    """A filter with every value replaced by 1, e.g.
+    {"school_id": {"$in": [...]}, "role": "student"} -> {"role": 1, "school_id": {"$in": 1}}"""
+    if isinstance(value, dict):
+        return {key: query_shape(v) for key, v in sorted(value.items())}
+    if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+        return [query_shape(v) for v in value]  # $and / $or / $nor clauses
+    return 1
+
+def pipeline_stage_shape(stage: Dict):
+    name = next(iter(stage), None)
+    if name == "$match":
+        return {name: query_shape(stage[name])}
+    if name == "$sort":
+        return {name: stage[name]}
+    if name == "$lookup":
+        return {name: stage[name].get("from")}
+    return name
+
+def command_shape(name: str, command: Dict) -> str:
+    """Canonical JSON of what decides a command's plan: filter shape, sort, pipeline stages"""
+    if name == "find":
+        shape = {"filter": query_shape(command.get("filter", {})), "sort": command.get("sort")}
+    elif name == "findAndModify":
+        shape = {"filter": query_shape(command.get("query", {})), "sort": command.get("sort")}
+    elif name == "count":
+        shape = {"filter": query_shape(command.get("query", {}))}
+    elif name == "distinct":
+        shape = {"key": command.get("key"), "filter": query_shape(command.get("query", {}))}
+    elif name == "aggregate":
+        shape = {"pipeline": [pipeline_stage_shape(stage) for stage in command.get("pipeline", [])]}
+    else:  # update / delete: the first statement stands for the batch
+        statements = command.get("updates" if name == "update" else "deletes") or [{}]
+        shape = {"filter": query_shape(statements[0].get("q", {}))}
+    return json.dumps({k: v for k, v in shape.items() if v is not None}, default=str, separators=(',', ':'))
+
+def explain_command(name: str, command: Dict) -> Optional[Dict]:
+    """The command to run under explain, or None if it would write ($out / $merge)"""
+    if name == "aggregate" and any("$out" in stage or "$merge" in stage for stage in command.get("pipeline", [])):
+        return None
+    explained = {key: value for key, value in command.items() if key not in EXPLAIN_DROP_FIELDS}
+    if name in ("update", "delete"):
+        statements = "updates" if name == "update" else "deletes"
+        explained[statements] = explained[statements][:1]
+    return explained
+
+def summarize_explain(explain: Dict) -> Dict[str, Any]:
+    """Winning-plan stages, indexes used and examined/returned counts from explain(executionStats)"""
+    stages: List[str] = []
+    indexes: List[str] = []
+    counts = Counter()
+
+    def walk(node):
+        if isinstance(node, list):
+            for item in node:
+                walk(item)
+            return
+        if not isinstance(node, dict):
+            return
+        if isinstance(node.get("stage"), str):
+            stages.append(node["stage"])
+            if node.get("indexName"):
+                indexes.append(node["indexName"])
+        if node.get("collectionScans"):  # $lookup sub-queries
+            stages.append("COLLSCAN")
+        indexes.extend(index for index in node.get("indexesUsed", []) if isinstance(index, str))
+        stats = node.get("executionStats")
+        if isinstance(stats, dict):
+            counts["docs_examined"] += stats.get("totalDocsExamined", 0)
+            counts["keys_examined"] += stats.get("totalKeysExamined", 0)
+            counts["returned"] += stats.get("nReturned", 0)
+        for key, value in node.items():
+            # rejected plans aren't what ran; executionStages repeats the winning plan
+            if key not in ("rejectedPlans", "allPlansExecution", "executionStages"):
+                walk(value)
+
+    walk(explain)
+    return {
+        "stages": list(dict.fromkeys(stages)),
+        "indexes": list(dict.fromkeys(indexes)),
+        "collscan": "COLLSCAN" in stages,
+        **{key: counts[key] for key in ("docs_examined", "keys_examined", "returned")},
+    }
+
+class QueryMonitor(monitoring.CommandListener):
+    """
+    Driver command listener. Times every command per collection/op, logs commands slower
+    than MONGO_SLOW_QUERY_MS with their filter shape, and passes a MONGO_EXPLAIN_SAMPLE_RATE
+    sample of them (at most one per shape per MONGO_EXPLAIN_INTERVAL_SECONDS) to
+    explain_worker. The callbacks run on driver threads, so shared state is under a lock.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending: Dict[tuple, tuple] = {}
+        self.operations: Dict[str, Dict[str, float]] = {}
+        self.slow_shapes: Dict[tuple, Dict[str, Any]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.explain_queue: Optional[asyncio.Queue] = None
+
+    def started(self, event):
+        name = event.command_name
+        collection = event.command.get("collection" if name == "getMore" else name)
+        if not isinstance(collection, str):
+            return  # server commands: hello, ping, endSessions, explain, ...
+        command = dict(event.command) if name in SHAPED_COMMANDS else None
+        self.pending[(event.connection_id, event.request_id)] = (collection, command)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        entry = self.pending.pop((event.connection_id, event.request_id), None)
+        if entry is None:
+            return
+        collection, command = entry
+        duration_ms = event.duration_micros / 1000
+        slow = duration_ms >= MONGO_SLOW_QUERY_MS
+        with self.lock:
+            stats = self.operations.setdefault(f"{collection}.{event.command_name}", {
+                "count": 0, "failed": 0, "slow": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["failed"] += failed
+            stats["slow"] += slow
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+        if slow and command is not None:
+            self.record_slow(event.database_name, collection, event.command_name, command, duration_ms)
+
+    def record_slow(self, database: str, collection: str, name: str, command: Dict, duration_ms: float):
+        shape = command_shape(name, command)
+        logger.warning(f"Slow Mongo {name} on {database}.{collection}: {duration_ms:.1f}ms {shape}")
+        key = (collection, name, shape)
+        now = time.time()
+        explained = explain_command(name, command) if self.explain_queue is not None else None
+        with self.lock:
+            entry = self.slow_shapes.get(key)
+            if entry is None:
+                if len(self.slow_shapes) >= MONGO_SLOW_SHAPES:
+                    # make room by forgetting the shape that has cost the least time
+                    del self.slow_shapes[min(self.slow_shapes, key=lambda k: self.slow_shapes[k]["total_ms"])]
+                entry = self.slow_shapes[key] = {
+                    "collection": collection, "op": name, "shape": shape, "count": 0,
+                    "total_ms": 0.0, "max_ms": 0.0, "plan": None, "explained_at": None,
+                }
+            entry["count"] += 1
+            entry["total_ms"] += duration_ms
+            entry["max_ms"] = max(entry["max_ms"], duration_ms)
+            entry["database"] = database
+            entry["last_seen"] = now
+            explain = (
+                explained is not None
+                and (entry["explained_at"] is None or now - entry["explained_at"] >= MONGO_EXPLAIN_INTERVAL_SECONDS)
+                and random.random() < MONGO_EXPLAIN_SAMPLE_RATE
+            )
+            if explain:
+                entry["explained_at"] = now
+        if explain:
+            self.loop.call_soon_threadsafe(self._queue_explain, key, database, explained)
+
+    def _queue_explain(self, key: tuple, database: str, command: Dict):
+        try:
+            self.explain_queue.put_nowait((key, database, command))
+        except asyncio.QueueFull:
+            incr_metric("mongo.explain_dropped")
+
+    async def explain_worker(self):
+        while True:
+            key, database, command = await self.explain_queue.get()
+            collection, name, shape = key
+            try:
+                plan = summarize_explain(await client[database].command(
+                    {"explain": command, "verbosity": "executionStats"}))
+            except Exception as e:
+                logger.warning(f"Explain of {name} on {database}.{collection} failed: {e}")
+                continue
+            incr_metric("mongo.explains")
+            with self.lock:
+                if key in self.slow_shapes:
+                    self.slow_shapes[key]["plan"] = plan
+            if plan["collscan"]:
+                incr_metric("mongo.collscans")
+                logger.warning(
+                    f"COLLSCAN: {name} on {database}.{collection} {shape} examined "
+                    f"{plan['docs_examined']} docs to return {plan['returned']}"
+                )
+
+    def report(self, limit: int, sort_by: str) -> Dict[str, Any]:
+        with self.lock:
+            operations = {name: dict(stats) for name, stats in self.operations.items()}
+            shapes = [dict(entry) for entry in self.slow_shapes.values()]
+        for stats in [*operations.values(), *shapes]:
+            stats["avg_ms"] = round(stats["total_ms"] / stats["count"], 2) if stats["count"] else 0.0
+            stats["total_ms"] = round(stats["total_ms"], 2)
+            stats["max_ms"] = round(stats["max_ms"], 2)
+        for entry in shapes:
+            for field in ("explained_at", "last_seen"):
+                if entry.get(field):
+                    entry[field] = datetime.fromtimestamp(entry[field], timezone.utc).isoformat()
+        return {
+            "operations": dict(sorted(operations.items(), key=lambda item: item[1]["total_ms"], reverse=True)),
+            "slow_shapes": sorted(shapes, key=lambda entry: entry[sort_by], reverse=True)[:limit],
+        }
+
+    def reset(self):
+        with self.lock:
+            self.operations.clear()
+            self.slow_shapes.clear()
+
+query_monitor = QueryMonitor()
+
+@app.on_event("startup")
+async def start_query_monitor():
+    if MONGO_MONITORING and MONGO_EXPLAIN_SAMPLE_RATE > 0:
+        query_monitor.loop = asyncio.get_running_loop()
+        query_monitor.explain_queue = asyncio.Queue(maxsize=100)
+        asyncio.create_task(query_monitor.explain_worker())
+
+# ============= DATABASE CONNECTION =============
+
+def create_mongo_client() -> AsyncIOMotorClient:
+    """Build a Motor client from the env-driven pool settings; call once per worker process"""
+    options = {
+        'maxPoolSize': MONGO_MAX_POOL_SIZE,
+        'minPoolSize': MONGO_MIN_POOL_SIZE,
+        'waitQueueTimeoutMS': MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        'appname': f"exam-api-{os.getpid()}",
+    }
+    if MONGO_COMPRESSORS:
+        options['compressors'] = MONGO_COMPRESSORS
+    if MONGO_MONITORING:
+        options['event_listeners'] = [query_monitor]
+    return AsyncIOMotorClient(mongo_url, **options)
+
+@app.on_event("startup")
+async def connect_to_mongo():
+    """Runs after fork, so every worker gets its own pool bound to its own event loop"""
+    global client, db
+    if client is None:
+        client = create_mongo_client()
+        db = SchoolRoutedDatabase(client, DB_NAME) if SCHOOL_LAYOUT == 'database' else client[DB_NAME]
+        logger.info(f"MongoDB client created for pid {os.getpid()} (maxPoolSize={MONGO_MAX_POOL_SIZE})")
+
+READ_PREFERENCE_MODES = {
+    'primary': Primary,
+    'primaryPreferred': PrimaryPreferred,
+    'secondary': Secondary,
+    'secondaryPreferred': SecondaryPreferred,
+    'nearest': Nearest,
+}
+
+def read_preference_for(policy: str):
+    mode = READ_PREFERENCES.get(policy, 'primary')
+    if mode == 'primary':
+        return Primary()
+    return READ_PREFERENCE_MODES[mode](max_staleness=READ_MAX_STALENESS_SECONDS)
+
+class RoutedCollection:
+    """Collection whose reads go per a READ_PREFERENCES policy; counts every query it issues
+    (not the handle, which call sites reuse) under reads.<policy>.<mode>"""
+    READ_METHODS = frozenset({"find", "find_one", "aggregate", "count_documents", "estimated_document_count", "distinct"})
+
+    def __init__(self, collection, policy: str):
+        self.collection = collection
+        self.metric = f"reads.{policy}.{READ_PREFERENCES.get(policy, 'primary')}"
+
+    def __getattr__(self, attr):
+        value = getattr(self.collection, attr)
+        if attr not in self.READ_METHODS:
+            return value
+
+        @functools.wraps(value)
+        def counted(*args, **kwargs):
+            incr_metric(self.metric)
+            return value(*args, **kwargs)
+        return counted
+
+def read_collection(name: str, policy: str) -> RoutedCollection:
+    """Collection handle that routes reads per the named READ_PREFERENCES policy"""
+    return RoutedCollection(db.get_collection(name, read_preference=read_preference_for(policy)), policy)
+
+# ============= SCHOOLS =============
+
+# Collections whose documents belong to one school (moved to per-school databases under
+# SCHOOL_LAYOUT=database). Users, the master bank, jobs and caches stay platform-wide.
+SCHOOL_OWNED_COLLECTIONS = frozenset({"tests", "test_results", "subjects", "performance_rollups"})
+
+# School whose data the current request works on; set by get_current_user
+current_school: ContextVar[Optional[str]] = ContextVar("current_school", default=None)
+
+def school_key(name: Optional[str]) -> Optional[str]:
+    """Stable school id from the free-text school name: "St. Mary's High" -> "st-mary-s-high".
+    Long names are cut and suffixed with a hash so the id fits in a database name."""
+    key = re.sub(r'[^a-z0-9]+', '-', (name or '').lower()).strip('-')
+    if len(key) > 40:
+        key = f"{key[:31]}-{hashlib.sha1(key.encode()).hexdigest()[:8]}"
+    return key or None
+
+def school_scope(school_id: Optional[str], include_shared: bool = True) -> Dict[str, Any]:
+    """Filter for one school's documents, plus platform-wide ones (no school_id) unless
+    include_shared=False; users without a school see everything, as before scoping"""
+    if not school_id:
+        return {}
+    return {"school_id": {"$in": [school_id, None]}} if include_shared else {"school_id": school_id}
+
+def visible_to(doc: Dict[str, Any], current_user: Dict) -> bool:
+    """Whether a school-owned document may be shown to the user"""
+    return (
+        current_user['role'] == UserRole.SUPER_ADMIN
+        or not doc.get('school_id') or not current_user.get('school_id')
+        or doc['school_id'] == current_user['school_id']
+    )
+
+class SchoolRoutedDatabase:
+    """The `db` handle under SCHOOL_LAYOUT=database: school-owned collections resolve to the
+    current school's database, everything else to the platform database"""
+    def __init__(self, client: AsyncIOMotorClient, name: str):
+        self.client = client
+        self.name = name
+        self.platform = client[name]
+
+    def database_for(self, school_id: Optional[str]):
+        return self.client[f"{self.name}_{school_id}"] if school_id else self.platform
+
+    def get_collection(self, name: str, **kwargs):
+        if name in SCHOOL_OWNED_COLLECTIONS:
+            return self.database_for(current_school.get()).get_collection(name, **kwargs)
+        return self.platform.get_collection(name, **kwargs)
+
+    __getitem__ = get_collection
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.get_collection(name)
+
+    async def command(self, *args, **kwargs):
+        return await self.platform.command(*args, **kwargs)
+
+async def known_school_ids() -> List[str]:
+    return sorted(await db.users.distinct("school_id", {"school_id": {"$ne": None}}))
+
+async def resolve_school(school: Optional[str]) -> Optional[str]:
+    """The school id a super admin names (X-School / `school=`, id or name), or None if none is
+    named. Unknown schools are a 400: under SCHOOL_LAYOUT=database the id becomes a database name."""
+    if not school:
+        return None
+    school_id = school_key(school)
+    if school_id not in await known_school_ids():
+        raise HTTPException(status_code=400, detail=f"Unknown school: {school}")
+    return school_id
+
+async def across_schools(fn) -> List[Any]:
+    """Await fn() in every database that holds school data: once per school (with
+    current_school set) under SCHOOL_LAYOUT=database, otherwise once"""
+    if SCHOOL_LAYOUT != 'database':
+        return [await fn()]
+    results = []
+    for school_id in [None, *await known_school_ids()]:
+        token = current_school.set(school_id)
+        try:
+            results.append(await fn())
+        finally:
+            current_school.reset(token)
+    return results
+
 # ============= MODELS =============
 
 class UserRole:
@@ -91,6 +868,7 @@ class User(BaseModel):
     class_name: Optional[str] = None
     section: Optional[str] = None
     school: Optional[str] = None
+    school_id: Optional[str] = None
     student_code: Optional[str] = None
     parent_name: Optional[str] = None
     parent_mobile: Optional[str] = None
@@ -108,6 +886,7 @@ class Subject(BaseModel):
     name: str
     class_name: str
     description: Optional[str] = None
+    school_id: Optional[str] = None
     created_at: str
 
 class QuestionType:
@@ -168,6 +947,7 @@ class Test(BaseModel):
     created_by: str
     created_at: str
     scheduled_at: Optional[str] = None
+    school_id: Optional[str] = None
 
 class AnswerSubmission(BaseModel):
     question_index: int
@@ -186,10 +966,30 @@ class TestResult(BaseModel):
     test_id: str
     student_id: str
     answers: List[AnswerSubmission]
+    question_scores: Optional[List[float]] = None
+    total_score: float
+    max_score: int
+    submitted_at: str
+    evaluated: bool = False
+    school_id: Optional[str] = None
+
+class ResultSummary(BaseModel):
+    """A result for list views: scores plus its test's details, without the answers"""
+    id: str
+    test_id: str
     total_score: float
     max_score: int
     submitted_at: str
     evaluated: bool = False
+    test_title: Optional[str] = None
+    test_type: Optional[str] = None
+    total_marks: Optional[int] = None
+    subject_id: Optional[str] = None
+    subject_name: Optional[str] = None
+
+class ResultSummaryPage(BaseModel):
+    results: List[ResultSummary]
+    next_cursor: Optional[str] = None
 
 class UserUpdate(BaseModel):
     is_active: Optional[bool] = None
@@ -218,19 +1018,136 @@ def create_token(user_id: str, role: str) -> str:
 def generate_student_code() -> str:
     return f"STD{str(uuid.uuid4())[:8].upper()}"
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+# Inserts retried with fresh codes when another writer took the same student code first
+STUDENT_CODE_ATTEMPTS = 5
+
+def is_duplicate_on(error: Dict[str, Any], field: str) -> bool:
+    """Whether a write error is a duplicate key on the unique index over `field`"""
+    return error.get('code') == 11000 and field in (error.get('keyPattern') or error.get('errmsg', ''))
+
+# Stored answer layout: nulls omitted, short keys, handwritten photos as raw bytes instead of
+# base64. Entries stay in submission order and carry their question_index as "i"; documents
+# written before this layout (full field names) are decoded as they are.
+COMPACT_ANSWER_KEYS = {
+    'question_index': 'i', 'answer_text': 't', 'selected_option': 'o',
+    'match_pairs': 'm', 'handwritten_image': 'h', 'ocr_text': 'x',
+}
+ANSWER_FIELDS = {short: field for field, short in COMPACT_ANSWER_KEYS.items()}
+
+def encode_answers(answers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    encoded = []
+    for ans in answers:
+        entry = {COMPACT_ANSWER_KEYS[k]: v for k, v in ans.items() if v is not None and k in COMPACT_ANSWER_KEYS}
+        if isinstance(entry.get('h'), str):
+            try:
+                raw = base64.b64decode(entry['h'], validate=True)
+                # Only when it round-trips exactly; anything else is kept as sent
+                if base64.b64encode(raw).decode('ascii') == entry['h']:
+                    entry['h'] = raw
+            except binascii.Error:
+                pass
+        encoded.append(entry)
+    return encoded
+
+def decode_answers(answers: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    decoded = []
+    for entry in answers:
+        if 'question_index' in entry:
+            decoded.append(entry)
+            continue
+        ans = dict.fromkeys(COMPACT_ANSWER_KEYS)
+        for short, value in entry.items():
+            ans[ANSWER_FIELDS[short]] = value
+        if isinstance(ans['handwritten_image'], bytes):
+            ans['handwritten_image'] = base64.b64encode(ans['handwritten_image']).decode('ascii')
+        decoded.append(ans)
+    return decoded
+
+def decode_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Stored test_results document -> API shape, in place"""
+    if result.get('answers'):
+        result['answers'] = decode_answers(result['answers'])
+    return result
+
+class LRUCache:
+    """Small in-process LRU; only touched from the event loop, so no locking"""
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        if key not in self._data:
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    def set(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash a chunk of passwords; runs inside a process-pool worker"""
+    return [hash_password(p) for p in passwords]
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Shared pool for CPU-bound work, created on first use (spawn: safe next to Motor's threads)"""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=CPU_POOL_WORKERS, mp_context=multiprocessing.get_context('spawn')
+        )
+    return _process_pool
+
+async def hash_passwords_parallel(passwords: List[str], chunk_size: int = 8) -> List[str]:
+    """bcrypt across the process pool, a chunk per hashing admission slot: a roster shares the
+    slots with logins and signups, which go first (a chunk of 8 takes ~2s of a core)"""
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+
+    async def hash_chunk(chunk: List[str]) -> List[str]:
+        async with admission['hashing'].batch():
+            return await loop.run_in_executor(pool, hash_passwords, chunk)
+    chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+    hashed = await asyncio.gather(*(hash_chunk(c) for c in chunks))
+    return [h for chunk in hashed for h in chunk]
+
+async def generate_unique_student_codes(count: int) -> List[str]:
+    """Student codes unique within the batch and against existing users (one $in lookup per round)"""
+    codes: set = set()
+    while len(codes) < count:
+        candidates = {generate_student_code() for _ in range(count - len(codes))} - codes
+        taken = await db.users.distinct("student_code", {"student_code": {"$in": list(candidates)}})
+        codes |= candidates - set(taken)
+    return list(codes)
+
+async def get_current_user(
+    request: Request = None, credentials: HTTPAuthorizationCredentials = Depends(security)
+) -> Dict[str, Any]:
     try:
         token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
         
         # Check if user is active
-        user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
+        with span("auth.user_lookup"):
+            user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
         if not user:
             raise HTTPException(status_code=401, detail="User not found")
         if not user.get('is_active', True):
             raise HTTPException(status_code=403, detail="Account has been deactivated")
         
-        return payload
+        school_id = user.get('school_id')
+        if request is not None and payload['role'] == UserRole.SUPER_ADMIN:
+            # A super admin works on one school's tests/results by naming it
+            school_id = await resolve_school(request.headers.get('X-School')) or school_id
+        current_school.set(school_id)
+        return {**payload, 'school_id': school_id}
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
@@ -245,6 +1162,147 @@ async def get_super_admin(current_user: Dict = Depends(get_current_user)) -> Dic
         )
     return current_user
 
+A4_LONG_SIDE_INCHES = 11.69
+
+def box_sums(values, radius: int):
+    """Sum of `values` over the (2r+1)^2 window around every pixel (clipped at the edges), and window areas"""
+    import numpy as np
+
+    h, w = values.shape
+    integral = np.zeros((h + 1, w + 1), dtype=np.int64)
+    integral[1:, 1:] = values.astype(np.int64).cumsum(axis=0).cumsum(axis=1)
+    # Edge-padding the integral image makes clipped windows plain slices (no fancy indexing)
+    padded = np.pad(integral, radius, mode='edge')
+    size = 2 * radius + 1
+    sums = padded[size:size + h, size:size + w] - padded[:h, size:size + w]
+    sums -= padded[size:size + h, :w]
+    sums += padded[:h, :w]
+    rows = np.minimum(np.arange(h) + radius + 1, h) - np.maximum(np.arange(h) - radius, 0)
+    cols = np.minimum(np.arange(w) + radius + 1, w) - np.maximum(np.arange(w) - radius, 0)
+    return sums, rows[:, None] * cols[None, :]
+
+def binarize_adaptive(gray, offset: float = OCR_BINARIZE_OFFSET):
+    """
+    Bradley local-mean thresholding; returns a bool array, True = ink.
+    Ink is only kept on "paper": bright neighbourhoods, shrunk by one window so the dark
+    desk around a photographed page and the page edge itself don't come out as ink.
+    """
+    import numpy as np
+
+    radius = max(7, min(gray.shape) // 48)
+    gray = gray.astype(np.int64)
+    sums, area = box_sums(gray, radius)
+    ink = gray * area < sums * (1 - offset)
+    paper = sums > area * (0.5 * np.percentile(gray, 95))
+    paper_sums, _ = box_sums(paper, radius)
+    return ink & (paper_sums == area)
+
+def estimate_skew(ink, max_degrees: float = OCR_MAX_SKEW_DEGREES, step: float = 0.5) -> float:
+    """Projection-profile deskew on a small copy: text lines are sharpest when horizontal"""
+    import numpy as np
+    from PIL import Image
+
+    small = Image.fromarray(np.where(ink, 255, 0).astype(np.uint8))
+    small.thumbnail((600, 600))
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_degrees, max_degrees + step / 2, step):
+        rows = np.asarray(small.rotate(float(angle), resample=Image.Resampling.NEAREST)).sum(axis=1)
+        score = float(np.var(rows))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+def preprocess_for_ocr(image):
+    """Grayscale, resize to OCR_TARGET_DPI, adaptive binarization, deskew and border crop"""
+    import numpy as np
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image).convert('L')
+
+    scale = min(A4_LONG_SIDE_INCHES * OCR_TARGET_DPI / max(image.size), OCR_MAX_UPSCALE)
+    if abs(scale - 1) > 0.05:
+        image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))),
+            Image.Resampling.LANCZOS
+        )
+
+    ink = binarize_adaptive(np.asarray(image))
+    # Despeckle: drop ink pixels with fewer than 3 inked neighbours (sensor noise, not strokes)
+    neighbours, _ = box_sums(ink, 1)
+    ink &= neighbours > 3
+
+    if OCR_MAX_SKEW_DEGREES > 0:
+        angle = estimate_skew(ink)
+        if angle:
+            rotated = Image.fromarray(np.where(ink, 255, 0).astype(np.uint8)).rotate(
+                angle, resample=Image.Resampling.NEAREST, expand=True, fillcolor=0
+            )
+            ink = np.asarray(rotated) > 127
+
+    # Crop to the inked area (plus a small margin) so Tesseract skips empty borders;
+    # mostly-blank pages put the median row/column at the residual speckle level
+    row_density, col_density = ink.mean(axis=1), ink.mean(axis=0)
+    rows = np.flatnonzero(row_density > max(0.002, 3 * float(np.median(row_density))))
+    cols = np.flatnonzero(col_density > max(0.002, 3 * float(np.median(col_density))))
+    if rows.size and cols.size:
+        margin = 10
+        ink = ink[max(rows[0] - margin, 0):rows[-1] + margin + 1, max(cols[0] - margin, 0):cols[-1] + margin + 1]
+
+    return Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+
+def run_ocr(image_data: bytes, preprocess: bool = OCR_PREPROCESS) -> str:
+    """Synchronous OCR of raw image bytes (picklable, so it can run in a process pool)"""
+    from PIL import Image
+    import pytesseract
+
+    image = Image.open(BytesIO(image_data))
+    if preprocess:
+        image = preprocess_for_ocr(image)
+    return pytesseract.image_to_string(
+        image, lang=OCR_LANG, config=f"--oem {OCR_OEM} --psm {OCR_PSM}"
+    ).strip()
+
+# OCR output depends on the image bytes and on the OCR settings, so both go into the key
+OCR_CACHE_SETTINGS = (
+    f"{OCR_PREPROCESS}:{OCR_TARGET_DPI}:{OCR_MAX_UPSCALE}:{OCR_BINARIZE_OFFSET}:"
+    f"{OCR_MAX_SKEW_DEGREES}:{OCR_PSM}:{OCR_OEM}:{OCR_LANG}"
+)
+ocr_memory_cache = LRUCache(OCR_CACHE_SIZE)
+
+def ocr_cache_key(image_data: bytes) -> str:
+    digest = hashlib.sha256(image_data).hexdigest()
+    settings = hashlib.sha256(OCR_CACHE_SETTINGS.encode('utf-8')).hexdigest()[:8]
+    return f"{digest}:{settings}"
+
+async def get_cached_ocr(key: str) -> Optional[str]:
+    """In-memory LRU first, then the shared Mongo TTL collection"""
+    text = ocr_memory_cache.get(key)
+    if text is not None:
+        incr_metric("ocr_cache.memory_hit")
+        return text
+    try:
+        doc = await db.ocr_cache.find_one({"_id": key}, {"text": 1})
+    except Exception as e:
+        logger.warning(f"OCR cache lookup failed: {e}")
+        doc = None
+    if doc is not None:
+        incr_metric("ocr_cache.mongo_hit")
+        ocr_memory_cache.set(key, doc['text'])
+        return doc['text']
+    incr_metric("ocr_cache.miss")
+    return None
+
+async def store_cached_ocr(key: str, text: str):
+    ocr_memory_cache.set(key, text)
+    try:
+        await db.ocr_cache.update_one(
+            {"_id": key},
+            {"$set": {"text": text, "created_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"OCR cache store failed: {e}")
+
 async def extract_text_from_image(image_base64: str) -> str:
     """
     REFACTORED: Cost-optimized OCR using pytesseract (open-source)
@@ -253,13 +1311,17 @@ async def extract_text_from_image(image_base64: str) -> str:
     try:
         # Decode base64 image
         image_data = base64.b64decode(image_base64)
-        image = Image.open(BytesIO(image_data))
-        
-        # Use Tesseract OCR (free, open-source)
-        extracted_text = pytesseract.image_to_string(image)
+
+        # The same photo usually arrives twice: /upload-image, then again in submit_test
+        cache_key = ocr_cache_key(image_data)
+        cached_text = await get_cached_ocr(cache_key)
+        if cached_text is not None:
+            return cached_text
         
-        # Clean up the text
-        extracted_text = extracted_text.strip()
+        # Preprocess and run Tesseract OCR (free, open-source) off the event loop
+        loop = asyncio.get_running_loop()
+        extracted_text = await loop.run_in_executor(get_process_pool(), run_ocr, image_data)
+        await store_cached_ocr(cache_key, extracted_text)
         
         logger.info(f"OCR extraction successful: {len(extracted_text)} characters")
         return extracted_text
@@ -270,6 +1332,8 @@ async def extract_text_from_image(image_base64: str) -> str:
 async def evaluate_answer(question: str, correct_answer: str, student_answer: str, marks: int) -> float:
     """AI evaluation using LLM - kept for grading logic only"""
     try:
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+
         chat = LlmChat(
             api_key=EMERGENT_LLM_KEY,
             session_id=f"eval_{uuid.uuid4()}",
@@ -287,127 +1351,802 @@ async def evaluate_answer(question: str, correct_answer: str, student_answer: st
         logger.error(f"Evaluation error: {e}")
         return 0.0
 
-# ============= STARTUP: CREATE INDEXES FOR SCALABILITY =============
+# ============= LOCAL ANSWER SCORING =============
 
-@app.on_event("startup")
-async def create_indexes():
-    """Create MongoDB indexes for production scalability (5000+ users)"""
-    try:
-        # User indexes
-        await db.users.create_index("email", unique=True)
-        await db.users.create_index("id")
-        await db.users.create_index([("role", 1), ("is_active", 1)])
-        await db.users.create_index("student_code")
-        
-        # Test indexes
-        await db.tests.create_index("id")
-        await db.tests.create_index([("class_name", 1), ("test_type", 1)])
-        await db.tests.create_index("created_by")
-        
-        # Test results indexes for fast student dashboard queries
-        await db.test_results.create_index("id")
-        await db.test_results.create_index("student_id")
-        await db.test_results.create_index([("student_id", 1), ("submitted_at", -1)])
-        
-        # Master question bank indexes
-        await db.master_questions.create_index("id")
-        await db.master_questions.create_index([("subject", 1), ("class_name", 1)])
-        await db.master_questions.create_index([("difficulty", 1), ("question_type", 1)])
-        
-        # Subject indexes
-        await db.subjects.create_index("id")
-        await db.subjects.create_index("class_name")
-        
-        logger.info("✅ Database indexes created successfully for scalability")
-    except Exception as e:
-        logger.error(f"Error creating indexes: {e}")
+# Negations and modal/auxiliary verbs are kept as terms: they change what an answer says
+STOPWORDS = frozenset(
+    "a an the is are was were be been being of in on at to for and or but with by from as "
+    "that this these those it its into than then so such which who whom what when where how".split()
+)
+NEGATIONS = frozenset("not no never none nothing nobody neither nor cannot without".split())
+CONTRACTIONS = {"ca": "can", "wo": "will", "sha": "shall"}
 
-# ============= AUTH ROUTES =============
+def normalize_answer(text: Optional[str]) -> str:
+    return " ".join(re.findall(r"\w+", (text or "").lower()))
 
-@api_router.post("/auth/signup", response_model=User)
-async def signup(user_data: UserSignup):
-    existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    user_dict = user_data.model_dump()
-    user_dict['id'] = str(uuid.uuid4())
-    user_dict['created_at'] = datetime.now(timezone.utc).isoformat()
-    user_dict['is_active'] = True
-    
-    if user_data.role == UserRole.STUDENT:
-        user_dict['student_code'] = generate_student_code()
-    
-    user_dict['password'] = hash_password(user_data.password)
-    
-    await db.users.insert_one(user_dict)
-    
-    user_dict.pop('password')
-    return User(**user_dict)
+def answer_terms(text: Optional[str]) -> List[str]:
+    text = re.sub(r"\b(\w+?)n['’]t\b",  # "doesn't"/"can't"/"won't" -> "does/can/will not"
+                  lambda m: f"{CONTRACTIONS.get(m.group(1), m.group(1))} not", (text or "").lower())
+    return [t for t in re.findall(r"\w+", text) if t not in STOPWORDS]
 
-@api_router.post("/auth/login")
-async def login(credentials: UserLogin):
-    user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user['password']):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    if not user.get('is_active', True):
-        raise HTTPException(status_code=403, detail="Account has been deactivated. Contact administrator.")
-    
-    token = create_token(user['id'], user['role'])
-    user.pop('password')
-    
-    return {
-        "token": token,
-        "user": User(**user)
-    }
+def order_overlap(reference_terms: List[str], terms: List[str]) -> float:
+    """Share of the reference's consecutive keyword pairs that the answer also has in that
+    order; low for reversed cause/effect and for keyword salad"""
+    reference_pairs = set(zip(reference_terms, reference_terms[1:]))
+    if not reference_pairs:
+        return 0.0
+    return len(reference_pairs & set(zip(terms, terms[1:]))) / len(reference_pairs)
 
-@api_router.get("/auth/me", response_model=User)
-async def get_me(current_user: Dict = Depends(get_current_user)):
-    user = await db.users.find_one({"id": current_user['user_id']}, {"_id": 0, "password": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return User(**user)
+def negation_parity(terms: List[str]) -> int:
+    return sum(term in NEGATIONS for term in terms) % 2
 
-# ============= SUPER ADMIN ROUTES =============
+def local_similarity(reference: str, answers: List[str]):
+    """
+    Keyword coverage and TF-IDF cosine similarity of every answer against the reference.
+    IDF is taken over the reference and the one answer being compared, so an answer scores
+    the same whether it is graded alone at submission or in a re-grade batch. Returns two
+    NumPy arrays aligned with `answers`.
+    """
+    import numpy as np
 
-@api_router.get("/admin/users", dependencies=[Depends(get_super_admin)])
-async def get_all_users(
-    role: Optional[str] = None,
-    is_active: Optional[bool] = None,
-    skip: int = 0,
-    limit: int = 100
-):
-    """Get paginated list of all users - Super Admin only"""
-    query = {}
-    if role:
-        query['role'] = role
-    if is_active is not None:
-        query['is_active'] = is_active
-    
-    total_count = await db.users.count_documents(query)
-    users = await db.users.find(query, {"_id": 0, "password": 0}).skip(skip).limit(limit).to_list(limit)
-    
-    return {
-        "total": total_count,
-        "users": users,
-        "skip": skip,
-        "limit": limit
-    }
+    docs = [answer_terms(reference)] + [answer_terms(a) for a in answers]
+    vocab = {term: i for i, term in enumerate(sorted({t for doc in docs for t in doc}))}
+    counts = np.zeros((len(docs), max(len(vocab), 1)))
+    for row, doc in enumerate(docs):
+        for term in doc:
+            counts[row, vocab[term]] += 1
 
-@api_router.patch("/admin/users/{user_id}", dependencies=[Depends(get_super_admin)])
-async def update_user(user_id: str, update_data: UserUpdate):
-    """Update user (reset password, toggle active status) - Super Admin only"""
-    user = await db.users.find_one({"id": user_id}, {"_id": 0})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    update_fields = {}
-    if update_data.is_active is not None:
-        update_fields['is_active'] = update_data.is_active
+    present = counts > 0
+    coverage = (present[1:] & present[0]).sum(axis=1) / max(present[0].sum(), 1)
+
+    # One IDF row per answer: document frequency over its (reference, answer) pair
+    idf = np.log(3 / (1 + present[0] + present[1:])) + 1
+    tf = np.where(present, 1 + np.log(np.maximum(counts, 1)), 0.0)
+    answer_vectors, reference_vectors = tf[1:] * idf, tf[0] * idf
+    norms = np.linalg.norm(answer_vectors, axis=1) * np.linalg.norm(reference_vectors, axis=1)
+    cosine = (answer_vectors * reference_vectors).sum(axis=1) / np.where(norms == 0, 1, norms)
+    return coverage, cosine
+
+def local_scores(question: Dict[str, Any], answers: List[str]) -> List[Optional[float]]:
+    """Confident local scores (full marks or zero); None where the LLM has to decide"""
+    marks = float(question['marks'])
+    reference = question.get('correct_answer') or ''
+    reference_norm = normalize_answer(reference)
+    reference_terms = answer_terms(reference)
+    coverage, cosine = local_similarity(reference, answers)
+
+    scores: List[Optional[float]] = []
+    for i, answer in enumerate(answers):
+        answer_norm = normalize_answer(answer)
+        terms = answer_terms(answer)
+        if not answer_norm:
+            scores.append(0.0)
+        elif answer_norm == reference_norm:
+            scores.append(marks)
+        elif not reference_terms:
+            scores.append(None)
+        elif (
+            cosine[i] >= LOCAL_SCORE_HIGH_SIMILARITY and coverage[i] >= LOCAL_SCORE_HIGH_COVERAGE
+            and len(reference_terms) >= LOCAL_SCORE_MIN_TERMS
+            and order_overlap(reference_terms, terms) >= LOCAL_SCORE_HIGH_ORDER
+            and negation_parity(terms) == negation_parity(reference_terms)
+        ):
+            scores.append(marks)
+        elif cosine[i] <= LOCAL_SCORE_LOW_SIMILARITY and coverage[i] <= LOCAL_SCORE_LOW_COVERAGE:
+            scores.append(0.0)
+        else:
+            scores.append(None)
+    return scores
+
+async def grade_subjective(question: Dict[str, Any], answers: List[str],
+                           semaphore: Optional[asyncio.Semaphore] = None) -> List[float]:
+    """Score SHORT/LONG answers to one question: local fast path first, LLM for the rest.
+    LLM calls run concurrently, bounded by `semaphore` when one is given."""
+    decided = local_scores(question, answers) if LOCAL_SCORING_ENABLED else [None] * len(answers)
+
+    async def llm_score(answer: str) -> float:
+        incr_metric("grading.llm")
+        if semaphore is None:
+            with span("grading.llm"):
+                return await evaluate_answer(question['question_text'], question['correct_answer'], answer, question['marks'])
+        async with semaphore:
+            with span("grading.llm"):
+                return await evaluate_answer(question['question_text'], question['correct_answer'], answer, question['marks'])
+
+    pending = [i for i, score in enumerate(decided) if score is None]
+    for score in decided:
+        if score is not None:
+            incr_metric("grading.local_right" if score > 0 else "grading.local_wrong")
+    scores = list(decided)
+    for i, score in zip(pending, await asyncio.gather(*(llm_score(answers[i]) for i in pending))):
+        scores[i] = score
+    return scores
+
+def score_objective_answer(question: Dict[str, Any], ans: Dict[str, Any]) -> float:
+    """Marks for an MCQ/FILL_BLANK answer; other question types score 0 here"""
+    if question['question_type'] == QuestionType.MCQ:
+        if ans.get('selected_option') == question.get('correct_answer'):
+            return float(question['marks'])
+    elif question['question_type'] == QuestionType.FILL_BLANK:
+        if (ans.get('answer_text') or '').strip().lower() == (question.get('correct_answer') or '').strip().lower():
+            return float(question['marks'])
+    return 0.0
+
+# ============= REQUEST PROFILING =============
+
+class StackSampler:
+    """
+    Statistical profiler: samples one thread's Python stack every interval and
+    aggregates them in collapsed-stack format (flamegraph.pl / speedscope compatible).
+    Given the thread's event `loop`, a sample is kept only while one of `tasks` runs,
+    so other requests interleaved on the same loop stay out of the report.
+    """
+    def __init__(self, thread_id: int, interval_ms: float = PROFILE_INTERVAL_MS,
+                 loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.loop = loop
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            task = asyncio.current_task(self.loop) if self.loop else None
+            frame = sys._current_frames().get(self.thread_id)
+            # Skip the sample if the loop switched tasks while the frames were read
+            if self.loop and (task not in self.tasks or asyncio.current_task(self.loop) is not task):
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> "StackSampler":
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+# Sampler of the request being profiled; tasks the request starts inherit it with its context
+profiled_request: ContextVar[Optional[StackSampler]] = ContextVar("profiled_request", default=None)
+
+def profiling_task_factory(loop, coro, **kwargs):
+    """Event-loop task factory: tasks started while a request is profiled are sampled with it"""
+    task = asyncio.Task(coro, loop=loop, **kwargs)
+    sampler = profiled_request.get()
+    if sampler is not None:
+        sampler.tasks.add(task)
+    return task
+
+# Slowest background-sampled requests of the current interval: (duration, seq, name, folded)
+_slow_profiles: List[tuple] = []
+_profile_seq = 0
+
+def write_profile(method: str, path: str, duration_ms: float, folded: str) -> str:
+    """Store a collapsed-stack report under PROFILE_DIR and return its file name"""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    slug = path.strip('/').replace('/', '_') or 'root'
+    name = (
+        f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')}_{method}_{slug}"
+        f"_{int(duration_ms)}ms_{str(uuid.uuid4())[:8]}.folded"
+    )
+    (PROFILE_DIR / name).write_text(folded)
+    return name
+
+def flush_slow_profiles() -> List[str]:
+    """Write out the slowest sampled requests collected since the last flush"""
+    written = [write_profile(*entry[2], entry[0], entry[3]) for entry in sorted(_slow_profiles, reverse=True)]
+    _slow_profiles.clear()
+    return written
+
+async def is_super_admin_request(request: Request) -> bool:
+    auth = request.headers.get('Authorization', '')
+    if not auth.startswith('Bearer '):
+        return False
+    try:
+        payload = jwt.decode(auth[len('Bearer '):], JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        return False
+    if payload.get('role') != UserRole.SUPER_ADMIN:
+        return False
+    user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0, "is_active": 1})
+    return user is not None and user.get('is_active', True)
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """
+    On demand: a super admin sends `X-Profile: 1` (or `?profile=1`) to profile that single
+    request; the report name is returned in the `X-Profile-Report` header. Only the request's
+    own tasks are sampled, not the other requests sharing the worker's event loop.
+    Background: PROFILE_SAMPLE_RATE of requests are sampled and the PROFILE_SLOWEST_N
+    slowest per PROFILE_FLUSH_SECONDS interval are written to PROFILE_DIR.
+    """
+    on_demand = (
+        (request.headers.get('X-Profile') == '1' or request.query_params.get('profile') == '1')
+        and await is_super_admin_request(request)
+    )
+    sampled = not on_demand and PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+    if not (on_demand or sampled):
+        return await call_next(request)
+
+    global _profile_seq
+    loop = asyncio.get_running_loop()
+    if loop.get_task_factory() is None:
+        loop.set_task_factory(profiling_task_factory)
+    sampler = StackSampler(threading.get_ident(), loop=loop)
+    sampler.tasks.add(asyncio.current_task())
+    token = profiled_request.set(sampler)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        sampler.stop()
+        profiled_request.reset(token)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    if on_demand:
+        name = write_profile(request.method, request.url.path, duration_ms, sampler.folded())
+        response.headers['X-Profile-Report'] = name
+        logger.info(f"Profiled {request.method} {request.url.path} in {duration_ms:.1f}ms -> {name}")
+    else:
+        _profile_seq += 1
+        entry = (duration_ms, _profile_seq, (request.method, request.url.path), sampler.folded())
+        if len(_slow_profiles) < PROFILE_SLOWEST_N:
+            heapq.heappush(_slow_profiles, entry)
+        elif PROFILE_SLOWEST_N > 0:
+            heapq.heappushpop(_slow_profiles, entry)
+    return response
+
+async def flush_slow_profiles_periodically():
+    while True:
+        await asyncio.sleep(PROFILE_FLUSH_SECONDS)
+        try:
+            written = flush_slow_profiles()
+            if written:
+                logger.info(f"Wrote {len(written)} sampled slow-request profiles to {PROFILE_DIR}")
+        except Exception as e:
+            logger.error(f"Profile flush error: {e}")
+
+@app.on_event("startup")
+async def start_background_profiling():
+    if PROFILE_SAMPLE_RATE > 0:
+        asyncio.create_task(flush_slow_profiles_periodically())
+
+# ============= HTTP CACHING & COMPRESSION =============
+
+@functools.lru_cache(maxsize=None)
+def brotli_module():
+    """The optional `brotli` package, or None; looked up once"""
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+def weak_etag(body: bytes) -> str:
+    # Weak: the same tag covers the identity, gzip and br encodings of the body
+    return f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+def pick_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {
+        part.split(';')[0].strip().lower()
+        for part in accept_encoding.split(',')
+        if not part.strip().endswith(';q=0')
+    }
+    if 'br' in accepted and brotli_module() is not None:
+        return 'br'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+@app.middleware("http")
+async def conditional_get_middleware(request: Request, call_next):
+    """
+    For successful GET responses with a JSON/text body: attach a weak ETag, answer a matching
+    If-None-Match with 304 and no body, and gzip/brotli bodies of COMPRESS_MIN_BYTES or more.
+    """
+    response = await call_next(request)
+    content_type = response.headers.get('content-type', '')
+    if (
+        request.method != 'GET'
+        or response.status_code != 200
+        or 'content-encoding' in response.headers
+        or not (content_type.startswith('application/json') or content_type.startswith('text/'))
+    ):
+        return response
+
+    body = b''.join([chunk async for chunk in response.body_iterator])
+    headers = {k: v for k, v in response.headers.items() if k.lower() not in ('content-length', 'etag')}
+    headers.setdefault('cache-control', 'private, no-cache')
+    headers['vary'] = 'Accept-Encoding' if 'vary' not in headers else f"{headers['vary']}, Accept-Encoding"
+    if HTTP_ETAGS_ENABLED:
+        headers['etag'] = weak_etag(body)
+        if etag_matches(request.headers.get('if-none-match', ''), headers['etag']):
+            incr_metric("http.not_modified")
+            headers.pop('content-type', None)
+            return Response(status_code=304, headers=headers)
+
+    encoding = pick_encoding(request.headers.get('accept-encoding', '')) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding == 'br':
+        body = brotli_module().compress(body, quality=COMPRESS_BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        body = gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+    if encoding:
+        headers['content-encoding'] = encoding
+        incr_metric(f"http.compressed.{encoding}")
+    return Response(content=body, status_code=200, headers=headers)
+
+class VersionedCache:
+    """
+    In-process cache for reference data, keyed by query. Writers bump the collection's
+    counter in `cache_versions` through invalidate(); every worker re-checks that counter at
+    most every REFERENCE_CACHE_CHECK_SECONDS and drops its entries when it has moved.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.version: Optional[int] = None
+        self.checked_at = 0.0
+        self.entries: Dict[Any, Any] = {}
+
+    async def refresh_version(self):
+        now = time.monotonic()
+        if now - self.checked_at < REFERENCE_CACHE_CHECK_SECONDS:
+            return
+        doc = await db.cache_versions.find_one({"_id": self.name})
+        version = doc['version'] if doc else 0
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+        self.checked_at = now
+
+    async def get(self, key, loader):
+        await self.refresh_version()
+        if key in self.entries:
+            incr_metric(f"cache.{self.name}.hit")
+            return self.entries[key]
+        incr_metric(f"cache.{self.name}.miss")
+        version = self.version
+        value = await loader()
+        # Don't keep a value loaded across an invalidation
+        if self.version == version:
+            self.entries[key] = value
+        return value
+
+    async def invalidate(self):
+        await db.cache_versions.update_one({"_id": self.name}, {"$inc": {"version": 1}}, upsert=True)
+        self.entries.clear()
+        self.version = None
+        self.checked_at = 0.0
+
+subjects_cache = VersionedCache("subjects")
+
+# ============= RATE LIMITING & ADMISSION CONTROL =============
+
+def client_identity(request: Request) -> str:
+    """Rate-limit key of the caller: the user id of a valid bearer token, else the client IP"""
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        try:
+            return f"user:{jwt.decode(auth[len('Bearer '):], JWT_SECRET, algorithms=[JWT_ALGORITHM])['user_id']}"
+        except (jwt.InvalidTokenError, KeyError):
+            pass
+    forwarded = request.headers.get('X-Forwarded-For', '') if RATE_LIMIT_TRUST_FORWARDED else ''
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+class TokenBuckets:
+    """In-process token buckets, least recently used evicted; only touched from the event loop"""
+    def __init__(self, max_keys: int):
+        self.buckets = LRUCache(max_keys)
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> float:
+        """Spend a token: 0 if there was one, else the seconds until there will be"""
+        tokens, updated = self.buckets.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        if tokens >= 1:
+            self.buckets.set(key, (tokens - 1, now))
+            return 0.0
+        self.buckets.set(key, (tokens, now))
+        return (1 - tokens) / rate
+
+token_buckets = TokenBuckets(RATE_LIMIT_MAX_KEYS)
+
+async def take_shared_token(key: str, capacity: float, rate: float, now: float) -> float:
+    """TokenBuckets.take in one atomic pipeline update on `rate_limits` (MongoDB 4.2+); idle
+    buckets expire through the TTL index once they would be full again"""
+    refilled = {"$min": [capacity, {"$add": [
+        {"$ifNull": ["$tokens", capacity]},
+        {"$multiply": [{"$subtract": [now, {"$ifNull": ["$updated", now]}]}, rate]},
+    ]}]}
+    bucket = await db.rate_limits.find_one_and_update(
+        {"_id": key},
+        [
+            {"$set": {"tokens": refilled, "updated": now,
+                      "expires_at": datetime.now(timezone.utc) + timedelta(seconds=capacity / rate)}},
+            {"$set": {"allowed": {"$gte": ["$tokens", 1]}}},
+            {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", 1]}, "$tokens"]}}},
+        ],
+        upsert=True, return_document=ReturnDocument.AFTER,
+    )
+    return 0.0 if bucket['allowed'] else (1 - bucket['tokens']) / rate
+
+async def take_token(key: str, capacity: float, rate: float) -> float:
+    now = time.time()
+    if RATE_LIMIT_STORE == 'mongo':
+        try:
+            return await take_shared_token(key, capacity, rate, now)
+        except Exception as e:
+            # Fail open to the per-worker buckets: an outage of the limiter must not lock users out
+            incr_metric("rate_limit.store_errors")
+            logger.warning(f"Shared rate-limit store failed, using in-process buckets: {e}")
+    return token_buckets.take(key, capacity, rate, now)
+
+async def login_identity(request: Request) -> str:
+    """Rate-limit key of a login/signup: the submitted email together with the client IP, so
+    that students sharing one IP don't share one bucket"""
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    email = body.get('email') if isinstance(body, dict) else None
+    return f"{str(email or '').strip().lower()}|{client_identity(request)}"
+
+def rate_limit(endpoint_class: str, identity=None):
+    """Dependency: spend one of the caller's tokens for the endpoint class, or 429 + Retry-After.
+    The caller is client_identity(), or what the async `identity(request)` returns."""
+    async def check(request: Request):
+        bucket = RATE_LIMIT_BUCKETS[endpoint_class]
+        if bucket is None:
+            return
+        key = await identity(request) if identity else client_identity(request)
+        wait = await take_token(f"{endpoint_class}:{key}", *bucket)
+        if wait > 0:
+            incr_metric(f"rate_limit.rejected.{endpoint_class}")
+            raise HTTPException(
+                status_code=429, detail="Too many requests, please retry later",
+                headers={"Retry-After": str(max(1, math.ceil(wait)))}
+            )
+        incr_metric(f"rate_limit.allowed.{endpoint_class}")
+    return check
+
+AUTH_RATE_LIMITS = [Depends(rate_limit("auth_ip")), Depends(rate_limit("auth", identity=login_identity))]
+
+class AdmissionLimit:
+    """
+    `async with admission['ocr']:` - at most `limit` requests of one kind of expensive work
+    at once in this worker. Up to `max_waiting` more wait for a slot; the rest, and waiters
+    that time out, are shed with 429 instead of queueing without bound.
+    """
+    def __init__(self, name: str, limit: int, max_waiting: int, timeout: float):
+        self.name = name
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.batch_waiting = 0
+
+    def reject(self):
+        incr_metric(f"admission.rejected.{self.name}")
+        raise HTTPException(
+            status_code=429, detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)}
+        )
+
+    async def __aenter__(self):
+        if self.semaphore.locked():
+            if self.waiting >= self.max_waiting:
+                self.reject()
+            self.waiting += 1
+            try:
+                with span("admission.wait", limit=self.name):
+                    await asyncio.wait_for(self.semaphore.acquire(), self.timeout)
+            except asyncio.TimeoutError:
+                self.reject()
+            finally:
+                self.waiting -= 1
+            incr_metric(f"admission.queued.{self.name}")
+        else:
+            await self.semaphore.acquire()
+        incr_metric(f"admission.admitted.{self.name}")
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def priority(self):
+        """A slot for work inside a request already admitted by another limit (OCR while grading
+        a submission): never shed, and ahead of batch units like any queued request"""
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self.semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def batch(self):
+        """
+        `async with admission['ocr'].batch():` - a slot for one unit of a batch job (a roster
+        chunk, a scanned page). Batch units share the limit with requests but are never shed,
+        and a unit that gets a slot while requests are queued hands it on and queues again.
+        """
+        self.batch_waiting += 1
+        try:
+            while True:
+                await self.semaphore.acquire()
+                if not self.waiting:
+                    break
+                self.semaphore.release()
+                incr_metric(f"admission.yielded.{self.name}")
+        finally:
+            self.batch_waiting -= 1
+        incr_metric(f"admission.batch.{self.name}")
+        try:
+            yield
+        finally:
+            self.semaphore.release()
+
+    def state(self) -> Dict[str, int]:
+        return {"limit": self.limit, "in_flight": self.limit - self.semaphore._value,
+                "waiting": self.waiting, "max_waiting": self.max_waiting, "batch_waiting": self.batch_waiting}
+
+admission = {name: AdmissionLimit(name, *limits) for name, limits in ADMISSION_LIMITS.items()}
+
+# ============= STARTUP: CREATE INDEXES FOR SCALABILITY =============
+
+# Index definitions per collection, created in one createIndexes command per collection
+INDEX_MODELS: Dict[str, List[IndexModel]] = {
+    # User indexes
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("role", ASCENDING), ("is_active", ASCENDING)]),
+        # Answer sheets are matched to students by code; only students have one
+        IndexModel([("student_code", ASCENDING)], name="student_code_unique", unique=True,
+                   partialFilterExpression={"student_code": {"$type": "string"}}),
+        # Parent -> children resolution for the parent dashboard
+        IndexModel([("parent_email", ASCENDING), ("role", ASCENDING)]),
+        # Students of a class (exam pre-warming)
+        IndexModel([("role", ASCENDING), ("class_name", ASCENDING)]),
+        # School-scoped admin listings/stats and school-scoped pre-warming
+        IndexModel([("school_id", ASCENDING), ("role", ASCENDING), ("is_active", ASCENDING)]),
+        IndexModel([("school_id", ASCENDING), ("role", ASCENDING), ("class_name", ASCENDING)]),
+    ],
+    # Test indexes
+    "tests": [
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("class_name", ASCENDING), ("test_type", ASCENDING)]),
+        IndexModel([("created_by", ASCENDING)]),
+        IndexModel([("scheduled_at", ASCENDING)]),
+        # School-scoped listings: a school's (plus shared) tests per class, admin listing by date
+        IndexModel([("school_id", ASCENDING), ("class_name", ASCENDING), ("test_type", ASCENDING)]),
+        IndexModel([("school_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    # Test results indexes for fast student dashboard queries
+    "test_results": [
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("student_id", ASCENDING)]),
+        # Newest first per student; id breaks submitted_at ties for keyset pagination
+        IndexModel([("student_id", ASCENDING), ("submitted_at", DESCENDING), ("id", DESCENDING)]),
+        # Per-test scans in result-id order (re-grading keyset pagination)
+        IndexModel([("test_id", ASCENDING), ("id", ASCENDING)]),
+        # A test's latest submission (item analysis cache fingerprint)
+        IndexModel([("test_id", ASCENDING), ("submitted_at", DESCENDING)]),
+        # Archival scan: not-yet-archived results ({archived: null}) by age
+        IndexModel([("archived", ASCENDING), ("submitted_at", ASCENDING)]),
+        # School-scoped submission counts
+        IndexModel([("school_id", ASCENDING), ("submitted_at", DESCENDING)]),
+    ],
+    # Master question bank indexes
+    "master_questions": [
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("subject", ASCENDING), ("class_name", ASCENDING)]),
+        IndexModel([("difficulty", ASCENDING), ("question_type", ASCENDING)]),
+        IndexModel([("school_id", ASCENDING), ("subject", ASCENDING), ("class_name", ASCENDING)]),
+    ],
+    # One document per facet cell; upserted by the full cell on every bulk upload
+    "master_question_facets": [
+        IndexModel([("scope", ASCENDING), ("subject", ASCENDING), ("class_name", ASCENDING),
+                    ("difficulty", ASCENDING), ("question_type", ASCENDING)], unique=True),
+    ],
+    # Subject indexes
+    "subjects": [
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("class_name", ASCENDING)]),
+        IndexModel([("school_id", ASCENDING), ("class_name", ASCENDING)]),
+    ],
+    # Re-grading jobs: lookup by id, latest job per test, orphaned-lease scan
+    "regrade_jobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("test_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+    ],
+    # Paper answer-sheet batches: lookup by id, a test's batches newest first
+    "answer_sheet_batches": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("test_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    # OCR results keyed by image hash; expired by MongoDB's TTL monitor
+    "ocr_cache": [
+        IndexModel([("created_at", ASCENDING)], expireAfterSeconds=OCR_CACHE_TTL_SECONDS),
+    ],
+    # Trend buckets: by id (rollup $inc), a student's / a class's series, a school's rebuild range
+    "performance_rollups": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("student_id", ASCENDING), ("period", ASCENDING), ("bucket_start", DESCENDING)]),
+        IndexModel([("school_id", ASCENDING), ("class_name", ASCENDING), ("period", ASCENDING), ("bucket_start", DESCENDING)]),
+        IndexModel([("school_id", ASCENDING), ("bucket_start", ASCENDING)]),
+    ],
+    # Shared token buckets (RATE_LIMIT_STORE=mongo); dropped once they would be full again
+    "rate_limits": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+# Only the designated migrator worker/pod needs to (re)create indexes on boot
+CREATE_INDEXES_ON_STARTUP = os.environ.get('CREATE_INDEXES_ON_STARTUP', 'true').lower() == 'true'
+
+STARTUP_TIMINGS: Dict[str, float] = {}
+
+@app.on_event("startup")
+async def create_indexes():
+    """Create MongoDB indexes for production scalability (5000+ users)"""
+    if not CREATE_INDEXES_ON_STARTUP:
+        logger.info("Skipping index creation (CREATE_INDEXES_ON_STARTUP=false)")
+        return
+    started = time.perf_counter()
+    try:
+        # The unique student_code index replaces the plain one of earlier releases
+        if "student_code_1" in await db.users.index_information():
+            await db.users.drop_index("student_code_1")
+        # One batched createIndexes per collection, all collections concurrently
+        await asyncio.gather(*(
+            db[collection].create_indexes(models) for collection, models in INDEX_MODELS.items()
+        ))
+        if SCHOOL_LAYOUT == 'database':
+            await asyncio.gather(*(ensure_school_database(school_id) for school_id in await known_school_ids()))
+        STARTUP_TIMINGS['index_creation_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        logger.info(f"✅ Database indexes created successfully for scalability in {STARTUP_TIMINGS['index_creation_ms']}ms")
+    except Exception as e:
+        logger.error(f"Error creating indexes: {e}")
+
+_school_databases_ready: set = set()
+
+async def ensure_school_database(school_id: Optional[str]):
+    """SCHOOL_LAYOUT=database: create a school's indexes the first time this worker sees it"""
+    if SCHOOL_LAYOUT != 'database' or not school_id or school_id in _school_databases_ready:
+        return
+    database = db.database_for(school_id)
+    await asyncio.gather(*(
+        database[collection].create_indexes(INDEX_MODELS[collection]) for collection in SCHOOL_OWNED_COLLECTIONS
+    ))
+    _school_databases_ready.add(school_id)
+
+# ============= AUTH ROUTES =============
+
+@api_router.post("/auth/signup", response_model=User, dependencies=AUTH_RATE_LIMITS)
+async def signup(user_data: UserSignup):
+    existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    
+    user_dict = user_data.model_dump()
+    user_dict['id'] = str(uuid.uuid4())
+    user_dict['created_at'] = datetime.now(timezone.utc).isoformat()
+    user_dict['is_active'] = True
+    user_dict['school_id'] = school_key(user_data.school)
+    await ensure_school_database(user_dict['school_id'])
+    
+    async with admission['hashing']:
+        user_dict['password'] = await asyncio.to_thread(hash_password, user_data.password)
+    
+    for attempt in range(STUDENT_CODE_ATTEMPTS):
+        if user_data.role == UserRole.STUDENT:
+            user_dict['student_code'] = (await generate_unique_student_codes(1))[0]
+        try:
+            await db.users.insert_one(user_dict)
+            break
+        except DuplicateKeyError as e:
+            # A concurrent signup/import took the code between the check and the insert
+            if not is_duplicate_on({'code': e.code, **(e.details or {})}, 'student_code') or attempt == STUDENT_CODE_ATTEMPTS - 1:
+                raise
+    
+    user_dict.pop('password')
+    return User(**user_dict)
+
+@api_router.post("/auth/login", dependencies=AUTH_RATE_LIMITS)
+async def login(credentials: UserLogin):
+    user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
+    async with admission['hashing']:
+        valid = bool(user) and await asyncio.to_thread(verify_password, credentials.password, user['password'])
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    if not user.get('is_active', True):
+        raise HTTPException(status_code=403, detail="Account has been deactivated. Contact administrator.")
+    
+    token = create_token(user['id'], user['role'])
+    user.pop('password')
+    
+    return {
+        "token": token,
+        "user": User(**user)
+    }
+
+@api_router.get("/auth/me", response_model=User)
+async def get_me(current_user: Dict = Depends(get_current_user)):
+    user = await db.users.find_one({"id": current_user['user_id']}, {"_id": 0, "password": 0})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return User(**user)
+
+# ============= SUPER ADMIN ROUTES =============
+
+@api_router.get("/admin/users", dependencies=[Depends(get_super_admin)])
+async def get_all_users(
+    role: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    school: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+):
+    """Get paginated list of all users, optionally of one school (school id) - Super Admin only"""
+    query = {}
+    if school:
+        query['school_id'] = school
+    if role:
+        query['role'] = role
+    if is_active is not None:
+        query['is_active'] = is_active
+    
+    users_collection = read_collection("users", "admin")
+    total_count = await users_collection.count_documents(query)
+    users = await users_collection.find(query, {"_id": 0, "password": 0}).skip(skip).limit(limit).to_list(limit)
+    
+    return {
+        "total": total_count,
+        "users": users,
+        "skip": skip,
+        "limit": limit
+    }
+
+@api_router.patch("/admin/users/{user_id}", dependencies=[Depends(get_super_admin)])
+async def update_user(user_id: str, update_data: UserUpdate):
+    """Update user (reset password, toggle active status) - Super Admin only"""
+    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    update_fields = {}
+    if update_data.is_active is not None:
+        update_fields['is_active'] = update_data.is_active
     
     if update_data.password:
-        update_fields['password'] = hash_password(update_data.password)
+        async with admission['hashing']:
+            update_fields['password'] = await asyncio.to_thread(hash_password, update_data.password)
     
     if update_fields:
         await db.users.update_one({"id": user_id}, {"$set": update_fields})
@@ -415,18 +2154,163 @@ async def update_user(user_id: str, update_data: UserUpdate):
     updated_user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
     return {"message": "User updated successfully", "user": updated_user}
 
-@api_router.post("/admin/questions/bulk-upload", dependencies=[Depends(get_super_admin)])
+ROSTER_REPORT_FIELDS = ['row', 'email', 'status', 'student_code', 'initial_password', 'error']
+
+@api_router.post("/admin/users/bulk-import", dependencies=[Depends(get_super_admin), Depends(rate_limit("bulk"))])
+async def bulk_import_students(
+    file: UploadFile = File(...),
+    class_name: Optional[str] = Form(None),
+    school: Optional[str] = Form(None)
+):
+    """
+    Bulk import a student roster from CSV/Excel - Super Admin only
+    Required columns: name, email, dob, class_name (unless given as a form field)
+    Optional columns: nickname, mobile, section, school, parent_name, parent_mobile,
+                      parent_email, password (generated when empty)
+    Returns a per-row CSV report: created / duplicate / invalid, with student codes
+    and initial passwords for created accounts.
+    """
+    import pandas as pd
+
+    contents = await file.read()
+    try:
+        if file.filename.endswith('.csv'):
+            df = pd.read_csv(BytesIO(contents), dtype=str, keep_default_na=False)
+        elif file.filename.endswith(('.xlsx', '.xls')):
+            df = pd.read_excel(BytesIO(contents), dtype=str).fillna('')
+        else:
+            raise HTTPException(status_code=400, detail="File must be CSV or Excel (.xlsx, .xls)")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read file: {str(e)}")
+
+    df.columns = [str(col).strip().lower() for col in df.columns]
+    required_cols = ['name', 'email', 'dob'] + ([] if class_name else ['class_name'])
+    missing_cols = [col for col in required_cols if col not in df.columns]
+    if missing_cols:
+        raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(missing_cols)}")
+
+    report = []
+    users = []
+    pending = []  # report entries aligned with `users`
+    now = datetime.now(timezone.utc).isoformat()
+    for i, record in enumerate(df.to_dict('records')):
+        row = {key: str(value).strip() for key, value in record.items()}
+        entry = {field: '' for field in ROSTER_REPORT_FIELDS}
+        entry.update({'row': i + 2, 'email': row.get('email', '')})  # spreadsheet line number
+        report.append(entry)
+
+        password = row.get('password') or secrets.token_urlsafe(9)
+        try:
+            signup_data = UserSignup(
+                name=row['name'],
+                nickname=row.get('nickname') or row['name'],
+                email=row['email'],
+                mobile=row.get('mobile', ''),
+                password=password,
+                role=UserRole.STUDENT,
+                dob=row['dob'],
+                class_name=row.get('class_name') or class_name,
+                section=row.get('section') or None,
+                school=row.get('school') or school,
+                parent_name=row.get('parent_name') or None,
+                parent_mobile=row.get('parent_mobile') or None,
+                parent_email=row.get('parent_email') or None
+            )
+        except ValidationError as e:
+            entry['status'] = 'invalid'
+            entry['error'] = '; '.join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            continue
+        if not (signup_data.name and signup_data.dob and signup_data.class_name):
+            entry['status'] = 'invalid'
+            entry['error'] = 'name, dob and class_name are required'
+            continue
+
+        user_dict = signup_data.model_dump()
+        user_dict['id'] = str(uuid.uuid4())
+        user_dict['created_at'] = now
+        user_dict['is_active'] = True
+        user_dict['school_id'] = school_key(user_dict.get('school'))
+        entry['initial_password'] = password
+        users.append(user_dict)
+        pending.append(entry)
+
+    for school_id in {u['school_id'] for u in users}:
+        await ensure_school_database(school_id)
+
+    # bcrypt is the bottleneck: hash across the process pool instead of on the event loop
+    codes = await generate_unique_student_codes(len(users))
+    hashed = await hash_passwords_parallel([u['password'] for u in users])
+    for user_dict, code, password_hash, entry in zip(users, codes, hashed, pending):
+        user_dict['student_code'] = code
+        user_dict['password'] = password_hash
+        entry['student_code'] = code
+
+    # Unordered batches; the unique email index reports duplicates instead of per-row lookups.
+    # Rows whose student code was taken meanwhile (concurrent import/signup) go again with new codes.
+    for start in range(0, len(users), ROSTER_BATCH_SIZE):
+        write_errors = {}
+        rows = list(range(start, min(start + ROSTER_BATCH_SIZE, len(users))))
+        for attempt in range(STUDENT_CODE_ATTEMPTS):
+            try:
+                await db.users.insert_many([users[i] for i in rows], ordered=False)
+                failed = {}
+            except BulkWriteError as e:
+                failed = {rows[err['index']]: err for err in e.details.get('writeErrors', [])}
+            for i in rows:
+                write_errors.pop(i, None)
+            write_errors.update(failed)
+            rows = [i for i, err in failed.items() if is_duplicate_on(err, 'student_code')]
+            if not rows or attempt == STUDENT_CODE_ATTEMPTS - 1:
+                break
+            for i, code in zip(rows, await generate_unique_student_codes(len(rows))):
+                users[i]['student_code'] = pending[i]['student_code'] = code
+        for i in range(start, min(start + ROSTER_BATCH_SIZE, len(users))):
+            entry, err = pending[i], write_errors.get(i)
+            if err is None:
+                entry['status'] = 'created'
+                continue
+            duplicate_email = is_duplicate_on(err, 'email')
+            entry['status'] = 'duplicate' if duplicate_email else 'failed'
+            entry['error'] = 'Email already registered' if duplicate_email else err.get('errmsg', '')
+            entry['student_code'] = ''
+            entry['initial_password'] = ''
+
+    counts = Counter(entry['status'] for entry in report)
+    logger.info(f"Roster import: {dict(counts)}")
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=ROSTER_REPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(report)
+    return Response(
+        content=buffer.getvalue(),
+        media_type="text/csv",
+        headers={
+            "Content-Disposition": f'attachment; filename="roster_import_{datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")}.csv"',
+            "X-Created": str(counts['created']),
+            "X-Duplicates": str(counts['duplicate']),
+            "X-Invalid": str(counts['invalid'] + counts['failed']),
+            "Access-Control-Expose-Headers": "Content-Disposition, X-Created, X-Duplicates, X-Invalid"
+        }
+    )
+
+@api_router.post("/admin/questions/bulk-upload", dependencies=[Depends(get_super_admin), Depends(rate_limit("bulk"))])
 async def bulk_upload_questions(
     file: UploadFile = File(...),
     subject: str = Form(...),
-    class_name: str = Form(...)
+    class_name: str = Form(...),
+    school: Optional[str] = Form(None)
 ):
     """
     Bulk upload questions from CSV/Excel file - Super Admin only
     Expected columns: question_text, question_type, options (JSON/comma-separated), 
                      correct_answer, marks, difficulty
+    Questions are shared with every school unless `school` (a school name or id) is given
     """
     try:
+        import pandas as pd
+
         contents = await file.read()
         
         # Read file based on extension
@@ -458,6 +2342,7 @@ async def bulk_upload_questions(
                 'correct_answer': str(row['correct_answer']),
                 'marks': int(row['marks']),
                 'difficulty': str(row.get('difficulty', 'medium')).lower(),
+                'school_id': school_key(school),
                 'created_at': datetime.now(timezone.utc).isoformat()
             }
             
@@ -473,11 +2358,7 @@ async def bulk_upload_questions(
             questions.append(question_dict)
         
         if questions:
-            result = await db.master_questions.insert_many(questions)
-            return {
-                "message": f"Successfully uploaded {len(questions)} questions",
-                "count": len(questions)
-            }
+            await db.master_questions.insert_many(questions)
         else:
             raise HTTPException(status_code=400, detail="No valid questions found in file")
             
@@ -485,25 +2366,46 @@ async def bulk_upload_questions(
         logger.error(f"Bulk upload error: {e}")
         raise HTTPException(status_code=400, detail=f"Upload failed: {str(e)}")
 
+    # The questions are stored: a failed facet update must not fail the upload (a retry would
+    # insert them again), so the facets are only marked for a recount on their next read
+    try:
+        await adjust_question_facets(questions)
+    except Exception as e:
+        logger.error(f"Question facet update failed, facets will be recounted: {e}")
+        incr_metric("facets.update_failed")
+        try:
+            await invalidate_question_facets()
+        except Exception as e:
+            logger.error(f"Could not mark question facets for a recount: {e}")
+    return {
+        "message": f"Successfully uploaded {len(questions)} questions",
+        "count": len(questions)
+    }
+
 @api_router.get("/admin/questions/master-bank", dependencies=[Depends(get_super_admin)])
 async def get_master_question_bank(
     subject: Optional[str] = None,
     class_name: Optional[str] = None,
     difficulty: Optional[str] = None,
+    question_type: Optional[str] = None,
+    school: Optional[str] = None,
     skip: int = 0,
     limit: int = 100
 ):
     """Get questions from master bank with filters - Super Admin only"""
-    query = {}
+    query = school_scope(school)
     if subject:
         query['subject'] = subject
     if class_name:
         query['class_name'] = class_name
     if difficulty:
         query['difficulty'] = difficulty
+    if question_type:
+        query['question_type'] = question_type
     
-    total_count = await db.master_questions.count_documents(query)
-    questions = await db.master_questions.find(query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
+    master_questions = read_collection("master_questions", "master_bank")
+    total_count = await master_questions.count_documents(query)
+    questions = await master_questions.find(query, {"_id": 0}).skip(skip).limit(limit).to_list(limit)
     
     return {
         "total": total_count,
@@ -513,14 +2415,26 @@ async def get_master_question_bank(
     }
 
 @api_router.get("/admin/stats", dependencies=[Depends(get_super_admin)])
-async def get_admin_stats():
-    """Get platform statistics - Super Admin only"""
-    total_students = await db.users.count_documents({"role": UserRole.STUDENT})
-    total_teachers = await db.users.count_documents({"role": UserRole.TEACHER})
-    total_tests = await db.tests.count_documents({})
-    total_submissions = await db.test_results.count_documents({})
-    active_users = await db.users.count_documents({"is_active": True})
-    master_questions = await db.master_questions.count_documents({})
+async def get_admin_stats(school: Optional[str] = None):
+    """Get platform statistics, or one school's (school id) - Super Admin only"""
+    school = await resolve_school(school)
+    scope = {"school_id": school} if school else {}
+    if school:
+        current_school.set(school)
+
+    async def count_school_owned(name: str) -> int:
+        async def count() -> int:
+            return await read_collection(name, "admin").count_documents(scope)
+        # Platform-wide under SCHOOL_LAYOUT=database means summing every school's database
+        return await count() if school else sum(await across_schools(count))
+
+    users = read_collection("users", "admin")
+    total_students = await users.count_documents({**scope, "role": UserRole.STUDENT})
+    total_teachers = await users.count_documents({**scope, "role": UserRole.TEACHER})
+    total_tests = await count_school_owned("tests")
+    total_submissions = await count_school_owned("test_results")
+    active_users = await users.count_documents({**scope, "is_active": True})
+    master_questions = await read_collection("master_questions", "admin").count_documents(school_scope(school))
     
     return {
         "total_students": total_students,
@@ -531,6 +2445,227 @@ async def get_admin_stats():
         "master_questions": master_questions
     }
 
+@api_router.get("/admin/schools", dependencies=[Depends(get_super_admin)])
+async def get_schools():
+    """Schools with their user counts by role - Super Admin only"""
+    rows = await read_collection("users", "admin").aggregate([
+        {"$match": {"school_id": {"$ne": None}}},
+        {"$group": {"_id": {"school_id": "$school_id", "role": "$role"},
+                    "school": {"$first": "$school"}, "count": {"$sum": 1}}},
+    ]).to_list(None)
+    schools: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        school_id = row['_id']['school_id']
+        entry = schools.setdefault(school_id, {"school_id": school_id, "school": row['school'], "users": {}})
+        entry['users'][row['_id']['role']] = row['count']
+    return {"layout": SCHOOL_LAYOUT, "schools": sorted(schools.values(), key=lambda s: s['school_id'])}
+
+@api_router.get("/admin/tests", dependencies=[Depends(get_super_admin)])
+async def get_admin_tests(
+    school: Optional[str] = None,
+    class_name: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100
+):
+    """Tests newest first, optionally of one school (school id), without questions - Super Admin only"""
+    query: Dict[str, Any] = {}
+    school = await resolve_school(school)
+    if school:
+        current_school.set(school)
+        query['school_id'] = school
+    if class_name:
+        query['class_name'] = class_name
+    tests = read_collection("tests", "admin")
+    total_count = await tests.count_documents(query)
+    page = await tests.find(query, {"_id": 0, "questions": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
+    return {
+        "total": total_count,
+        "tests": page,
+        "skip": skip,
+        "limit": limit
+    }
+
+@api_router.get("/admin/metrics", dependencies=[Depends(get_super_admin)])
+async def get_metrics():
+    """In-process counters for this worker - Super Admin only"""
+    ocr_hits = METRICS["ocr_cache.memory_hit"] + METRICS["ocr_cache.mongo_hit"]
+    ocr_lookups = ocr_hits + METRICS["ocr_cache.miss"]
+    return {
+        "pid": os.getpid(),
+        "read_preferences": {**READ_PREFERENCES, "max_staleness_seconds": READ_MAX_STALENESS_SECONDS},
+        "ocr_cache": {
+            "memory_entries": len(ocr_memory_cache),
+            "hit_rate": round(ocr_hits / ocr_lookups, 4) if ocr_lookups else None
+        },
+        "prewarmed_tests": sorted(prewarmed_tests),
+        "live_exam_viewers": {test_id: len(channel.sockets) for test_id, channel in live_exam_hub.channels.items()},
+        "rate_limits": {"store": RATE_LIMIT_STORE, "tracked_keys": len(token_buckets.buckets), **RATE_LIMITS},
+        "admission": {name: limit.state() for name, limit in admission.items()},
+        "tracing": {"export": TRACE_EXPORT, "sample_rate": TRACE_SAMPLE_RATE, "slow_ms": TRACE_SLOW_MS,
+                    "pending_spans": len(trace_exporter.pending)},
+        "counters": dict(sorted(METRICS.items()))
+    }
+
+@api_router.get("/admin/slow-queries", dependencies=[Depends(get_super_admin)])
+async def get_slow_queries(limit: int = 20, sort: str = "total_ms"):
+    """Slowest Mongo query shapes with captured plans, and timings per collection/op, for this
+    worker - Super Admin only"""
+    if sort not in ("total_ms", "max_ms", "avg_ms", "count"):
+        raise HTTPException(status_code=400, detail="sort must be total_ms, max_ms, avg_ms or count")
+    return {
+        "pid": os.getpid(),
+        "monitoring": MONGO_MONITORING,
+        "slow_query_ms": MONGO_SLOW_QUERY_MS,
+        "explain_sample_rate": MONGO_EXPLAIN_SAMPLE_RATE,
+        **query_monitor.report(limit, sort)
+    }
+
+@api_router.delete("/admin/slow-queries", dependencies=[Depends(get_super_admin)])
+async def reset_slow_queries():
+    """Forget the collected timings and slow shapes of this worker - Super Admin only"""
+    query_monitor.reset()
+    return {"message": "Query statistics reset"}
+
+@api_router.get("/admin/profiles", dependencies=[Depends(get_super_admin)])
+async def list_profiles(limit: int = 100):
+    """List stored request profiles, newest first - Super Admin only"""
+    if not PROFILE_DIR.exists():
+        return {"profiles": []}
+    files = sorted(PROFILE_DIR.glob("*.folded"), key=lambda p: p.stat().st_mtime, reverse=True)[:limit]
+    return {
+        "profiles": [{"name": p.name, "size_bytes": p.stat().st_size} for p in files]
+    }
+
+@api_router.get("/admin/profiles/{name}", response_class=PlainTextResponse, dependencies=[Depends(get_super_admin)])
+async def get_profile(name: str):
+    """Download a collapsed-stack profile (feed to flamegraph.pl or speedscope) - Super Admin only"""
+    path = PROFILE_DIR / Path(name).name
+    if path.suffix != '.folded' or not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return path.read_text()
+
+# ============= QUESTION BANK FACETS =============
+
+# Question counts per cell (school scope, subject, class, difficulty, type), materialized in
+# master_question_facets. The cells are counted once with a single aggregation over
+# master_questions and then adjusted with $inc on every bulk upload. Facet counts, filtered or
+# not, are summed from the cells in memory, so reading them never scans the question bank.
+QUESTION_FACETS = ("subject", "class_name", "difficulty", "question_type")
+question_facets_cache = VersionedCache("master_question_facets")
+
+def question_cell(question: Dict[str, Any]) -> Dict[str, Any]:
+    return {"scope": question.get('school_id'), **{facet: question.get(facet) for facet in QUESTION_FACETS}}
+
+async def rebuild_question_facets() -> int:
+    """Recount every cell from master_questions; returns the number of cells"""
+    rows = await db.master_questions.aggregate([
+        {"$group": {
+            "_id": {field: {"$ifNull": [f"${field}", None]} for field in ("school_id", *QUESTION_FACETS)},
+            "count": {"$sum": 1},
+        }},
+    ]).to_list(None)
+    cells = [{**question_cell(row['_id']), "count": row['count']} for row in rows]
+    await db.master_question_facets.delete_many({})
+    if cells:
+        try:
+            await db.master_question_facets.insert_many(cells, ordered=False)
+        except BulkWriteError:
+            pass  # a concurrent rebuild already inserted the same counts
+    await db.cache_versions.update_one(
+        {"_id": question_facets_cache.name},
+        {"$set": {"built_at": datetime.now(timezone.utc).isoformat()}}, upsert=True
+    )
+    await question_facets_cache.invalidate()
+    logger.info(f"Rebuilt question bank facets: {len(cells)} cells")
+    return len(cells)
+
+async def adjust_question_facets(questions: List[Dict[str, Any]]):
+    """Count newly inserted questions into their cells"""
+    counts = Counter(tuple(question_cell(q).items()) for q in questions)
+    await db.master_question_facets.bulk_write([
+        UpdateOne(dict(cell), {"$inc": {"count": count}}, upsert=True) for cell, count in counts.items()
+    ], ordered=False)
+    await question_facets_cache.invalidate()
+
+async def invalidate_question_facets():
+    """Drop the built marker (and every worker's cached cells) so that the next read recounts every cell"""
+    question_facets_cache.entries.clear()
+    await db.cache_versions.update_one(
+        {"_id": question_facets_cache.name}, {"$unset": {"built_at": ""}, "$inc": {"version": 1}}, upsert=True
+    )
+
+async def question_facet_cells(scopes: Optional[List[Optional[str]]]) -> List[Dict[str, Any]]:
+    """Cells of the given school scopes (None = every scope); counted on first use"""
+    async def load():
+        marker = await db.cache_versions.find_one({"_id": question_facets_cache.name}, {"built_at": 1})
+        if not (marker and marker.get('built_at')):
+            await rebuild_question_facets()
+        query = {"scope": {"$in": scopes}} if scopes is not None else {}
+        return await read_collection("master_question_facets", "master_bank").find(query, {"_id": 0}).to_list(None)
+    return await question_facets_cache.get(tuple(scopes) if scopes is not None else None, load)
+
+def summarize_facets(cells: List[Dict[str, Any]], filters: Dict[str, Optional[str]], include_cells: bool) -> Dict[str, Any]:
+    """Counts per value of each facet under the filters on the other facets (so a picker
+    still shows its alternatives), and the total under all filters"""
+    active = {facet: value for facet, value in filters.items() if value}
+
+    def matches(cell, ignore=None):
+        return all(cell[facet] == value for facet, value in active.items() if facet != ignore)
+
+    facets = {}
+    for facet in QUESTION_FACETS:
+        counts = Counter()
+        for cell in cells:
+            if matches(cell, ignore=facet):
+                counts[cell[facet]] += cell['count']
+        facets[facet] = [{"value": value, "count": count} for value, count in counts.most_common() if count > 0]
+
+    selected = Counter()
+    for cell in cells:
+        if matches(cell):
+            selected[tuple(cell[facet] for facet in QUESTION_FACETS)] += cell['count']
+    summary = {"total": sum(selected.values()), "filters": active, "facets": facets}
+    if include_cells:
+        summary['cells'] = [
+            {**dict(zip(QUESTION_FACETS, key)), "count": count} for key, count in selected.most_common() if count > 0
+        ]
+    return summary
+
+@api_router.get("/admin/questions/facets", dependencies=[Depends(get_super_admin)])
+async def get_master_question_facets(
+    school: Optional[str] = None,
+    subject: Optional[str] = None,
+    class_name: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    question_type: Optional[str] = None,
+    cells: bool = False
+):
+    """Master bank question counts per subject/class/difficulty/type - Super Admin only.
+    `cells=true` adds the count of every combination (for test blueprints)."""
+    filters = {"subject": subject, "class_name": class_name, "difficulty": difficulty, "question_type": question_type}
+    return summarize_facets(await question_facet_cells([school, None] if school else None), filters, cells)
+
+@api_router.post("/admin/questions/facets/rebuild", dependencies=[Depends(get_super_admin)])
+async def rebuild_master_question_facets():
+    """Recount the facets from the question bank (after edits made outside the API) - Super Admin only"""
+    return {"message": "Question bank facets rebuilt", "cells": await rebuild_question_facets()}
+
+@api_router.get("/questions/master-bank/facets")
+async def get_master_question_facets_for_teachers(
+    current_user: Dict = Depends(get_current_user),
+    subject: Optional[str] = None,
+    class_name: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    question_type: Optional[str] = None,
+    cells: bool = False
+):
+    """Counts of the questions a teacher can pull, per subject/class/difficulty/type"""
+    if current_user['role'] not in [UserRole.TEACHER, UserRole.SUPER_ADMIN]:
+        raise HTTPException(status_code=403, detail="Only teachers can access question bank")
+    school_id = current_user['school_id']
+    filters = {"subject": subject, "class_name": class_name, "difficulty": difficulty, "question_type": question_type}
+    return summarize_facets(await question_facet_cells([school_id, None] if school_id else None), filters, cells)
+
 # ============= TEACHER: PULL FROM MASTER BANK =============
 
 @api_router.get("/questions/master-bank")
@@ -539,21 +2674,24 @@ async def get_master_questions_for_teachers(
     subject: Optional[str] = None,
     class_name: Optional[str] = None,
     difficulty: Optional[str] = None,
+    question_type: Optional[str] = None,
     limit: int = 50
 ):
     """Teachers can pull questions from master bank"""
     if current_user['role'] not in [UserRole.TEACHER, UserRole.SUPER_ADMIN]:
         raise HTTPException(status_code=403, detail="Only teachers can access question bank")
     
-    query = {}
+    query = school_scope(current_user['school_id'])
     if subject:
         query['subject'] = subject
     if class_name:
         query['class_name'] = class_name
     if difficulty:
         query['difficulty'] = difficulty
+    if question_type:
+        query['question_type'] = question_type
     
-    questions = await db.master_questions.find(query, {"_id": 0}).limit(limit).to_list(limit)
+    questions = await read_collection("master_questions", "master_bank").find(query, {"_id": 0}).limit(limit).to_list(limit)
     return questions
 
 # ============= SUBJECT ROUTES =============
@@ -565,17 +2703,23 @@ async def create_subject(subject_data: SubjectCreate, current_user: Dict = Depen
     
     subject_dict = subject_data.model_dump()
     subject_dict['id'] = str(uuid.uuid4())
+    subject_dict['school_id'] = current_user['school_id']
     subject_dict['created_at'] = datetime.now(timezone.utc).isoformat()
     
     await db.subjects.insert_one(subject_dict)
+    await subjects_cache.invalidate()
     return Subject(**subject_dict)
 
 @api_router.get("/subjects", response_model=List[Subject])
-async def get_subjects(class_name: Optional[str] = None):
-    query = {"class_name": class_name} if class_name else {}
-    subjects = await db.subjects.find(query, {"_id": 0}).to_list(1000)
-    return [Subject(**s) for s in subjects]
-
+async def get_subjects(class_name: Optional[str] = None, current_user: Dict = Depends(get_current_user)):
+    query = school_scope(current_user['school_id'])
+    if class_name:
+        query['class_name'] = class_name
+    subjects = await subjects_cache.get(
+        (current_user['school_id'], class_name), lambda: db.subjects.find(query, {"_id": 0}).to_list(1000)
+    )
+    return [Subject(**s) for s in subjects]
+
 # ============= TEST ROUTES =============
 
 @api_router.post("/tests", response_model=Test)
@@ -584,7 +2728,14 @@ async def create_test(test_data: TestCreate, current_user: Dict = Depends(get_cu
         raise HTTPException(status_code=403, detail="Only teachers can create tests")
     
     test_dict = test_data.model_dump()
+    if test_dict.get('scheduled_at'):
+        # Stored as UTC ISO strings so the pre-warm scheduler can range-query them
+        try:
+            test_dict['scheduled_at'] = parse_schedule(test_dict['scheduled_at']).isoformat()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="scheduled_at must be an ISO 8601 datetime")
     test_dict['id'] = str(uuid.uuid4())
+    test_dict['school_id'] = current_user['school_id']
     test_dict['created_by'] = current_user['user_id']
     test_dict['created_at'] = datetime.now(timezone.utc).isoformat()
     
@@ -592,8 +2743,13 @@ async def create_test(test_data: TestCreate, current_user: Dict = Depends(get_cu
     return Test(**test_dict)
 
 @api_router.get("/tests", response_model=List[Test])
-async def get_tests(class_name: Optional[str] = None, test_type: Optional[str] = None):
-    query = {}
+async def get_tests(
+    class_name: Optional[str] = None,
+    test_type: Optional[str] = None,
+    current_user: Dict = Depends(get_current_user)
+):
+    """Tests of the user's school plus shared ones"""
+    query = school_scope(current_user['school_id'])
     if class_name:
         query['class_name'] = class_name
     if test_type:
@@ -603,68 +2759,80 @@ async def get_tests(class_name: Optional[str] = None, test_type: Optional[str] =
     return [Test(**t) for t in tests]
 
 @api_router.get("/tests/{test_id}", response_model=Test)
-async def get_test(test_id: str):
-    test = await db.tests.find_one({"id": test_id}, {"_id": 0})
-    if not test:
+async def get_test(test_id: str, current_user: Dict = Depends(get_current_user)):
+    test = await get_test_doc(test_id)
+    if not test or not visible_to(test, current_user):
         raise HTTPException(status_code=404, detail="Test not found")
+    if current_user['role'] == UserRole.STUDENT:
+        check_exam_window(test, submitting=False)
     return Test(**test)
 
 # ============= SUBMISSION ROUTES =============
 
-@api_router.post("/tests/{test_id}/submit")
+@api_router.post("/tests/{test_id}/submit", dependencies=[Depends(rate_limit("submit"))])
 async def submit_test(test_id: str, submission: TestSubmission, current_user: Dict = Depends(get_current_user)):
     if current_user['role'] != UserRole.STUDENT:
         raise HTTPException(status_code=403, detail="Only students can submit tests")
     
-    test = await db.tests.find_one({"id": test_id}, {"_id": 0})
-    if not test:
+    with span("test.fetch", test_id=test_id):
+        test = await get_test_doc(test_id)
+    if not test or not visible_to(test, current_user):
         raise HTTPException(status_code=404, detail="Test not found")
+    check_exam_window(test, submitting=True)
     
-    # Process answers with OCR if needed (using pytesseract now)
-    processed_answers = []
-    for ans in submission.answers:
-        ans_dict = ans.model_dump()
-        if ans.handwritten_image and not ans.ocr_text:
-            ans_dict['ocr_text'] = await extract_text_from_image(ans.handwritten_image)
-        processed_answers.append(ans_dict)
-    
-    # Calculate score
-    total_score = 0.0
-    for i, ans in enumerate(processed_answers):
-        if i < len(test['questions']):
-            question = test['questions'][i]
-            
-            if question['question_type'] == QuestionType.MCQ:
-                if ans.get('selected_option') == question.get('correct_answer'):
-                    total_score += question['marks']
-            
-            elif question['question_type'] == QuestionType.FILL_BLANK:
-                if ans.get('answer_text', '').strip().lower() == question.get('correct_answer', '').strip().lower():
-                    total_score += question['marks']
-            
-            elif question['question_type'] in [QuestionType.SHORT, QuestionType.LONG]:
-                answer_text = ans.get('ocr_text') or ans.get('answer_text', '')
-                if answer_text and question.get('correct_answer'):
-                    score = await evaluate_answer(
-                        question['question_text'],
-                        question['correct_answer'],
-                        answer_text,
-                        question['marks']
-                    )
-                    total_score += score
-    
-    result_dict = {
-        'id': str(uuid.uuid4()),
-        'test_id': test_id,
-        'student_id': current_user['user_id'],
-        'answers': processed_answers,
-        'total_score': total_score,
-        'max_score': test['total_marks'],
-        'submitted_at': datetime.now(timezone.utc).isoformat(),
-        'evaluated': True
-    }
-    
-    await db.test_results.insert_one(result_dict)
+    # OCR and LLM grading are the expensive part: bounded per worker. All-objective
+    # submissions are scored inline and are never shed.
+    expensive = any(ans.handwritten_image and not ans.ocr_text for ans in submission.answers) or any(
+        q['question_type'] in [QuestionType.SHORT, QuestionType.LONG] for q in test['questions'])
+    async with admission['grading'] if expensive else contextlib.nullcontext():
+        live_exam_hub.grading_started(test_id)
+        stored = None
+        try:
+            # Process answers with OCR if needed (using pytesseract now)
+            processed_answers = []
+            for i, ans in enumerate(submission.answers):
+                ans_dict = ans.model_dump()
+                if ans.handwritten_image and not ans.ocr_text:
+                    with span("answer.ocr", question_index=i):
+                        async with admission['ocr'].priority():
+                            ans_dict['ocr_text'] = await extract_text_from_image(ans.handwritten_image)
+                processed_answers.append(ans_dict)
+
+            # Calculate score, per question (aligned with test['questions'])
+            question_scores = [0.0] * len(test['questions'])
+            with span("scoring", answers=len(processed_answers)):
+                for i, ans in enumerate(processed_answers):
+                    if i < len(test['questions']):
+                        question = test['questions'][i]
+
+                        if question['question_type'] in [QuestionType.SHORT, QuestionType.LONG]:
+                            answer_text = ans.get('ocr_text') or ans.get('answer_text', '')
+                            if answer_text and question.get('correct_answer'):
+                                with span("answer.grade", question_index=i, question_type=question['question_type']):
+                                    question_scores[i] = (await grade_subjective(question, [answer_text]))[0]
+                        else:
+                            question_scores[i] = score_objective_answer(question, ans)
+
+            result_dict = {
+                'id': str(uuid.uuid4()),
+                'test_id': test_id,
+                'student_id': current_user['user_id'],
+                'school_id': current_user['school_id'],
+                'answers': processed_answers,
+                'question_scores': question_scores,
+                'total_score': float(sum(question_scores)),
+                'max_score': test['total_marks'],
+                'submitted_at': datetime.now(timezone.utc).isoformat(),
+                'evaluated': True
+            }
+
+            with span("result.insert"):
+                await db.test_results.insert_one({**result_dict, 'answers': encode_answers(processed_answers)})
+            stored = result_dict
+            with span("trends.update"):
+                await update_trend_rollups(result_increments(result_dict, test))
+        finally:
+            live_exam_hub.grading_finished(test_id, stored)
     return TestResult(**result_dict)
 
 @api_router.get("/results/student/{student_id}", response_model=List[TestResult])
@@ -678,24 +2846,811 @@ async def get_student_results(student_id: str, current_user: Dict = Depends(get_
         {"_id": 0}
     ).sort("submitted_at", -1).limit(100).to_list(100)
     
-    return [TestResult(**r) for r in results]
+    return [TestResult(**decode_result(r)) for r in await hydrate_archived(results)]
+
+def encode_cursor(values: List[Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode('ascii')
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeEncodeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+@api_router.get("/results/student/{student_id}/summary", response_model=ResultSummaryPage)
+async def get_student_result_summaries(
+    student_id: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: Dict = Depends(get_current_user)
+):
+    """Newest first, with test title/type/marks and subject name joined in and no answers.
+    Pass the returned next_cursor to get the following page."""
+    if current_user['role'] == UserRole.STUDENT and current_user['user_id'] != student_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    limit = min(max(limit, 1), 100)
+
+    match: Dict[str, Any] = {"student_id": student_id}
+    if cursor:
+        submitted_at, result_id = decode_cursor(cursor, 2)
+        match['$or'] = [
+            {"submitted_at": {"$lt": submitted_at}},
+            {"submitted_at": submitted_at, "id": {"$lt": result_id}},
+        ]
+    # One round trip; the lookups (localField + pipeline needs MongoDB 5.0+) hit the id indexes
+    # of tests/subjects and bring back only the listed fields, never the questions
+    rows = await db.test_results.aggregate([
+        {"$match": match},
+        {"$sort": {"submitted_at": -1, "id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {"_id": 0, "id": 1, "test_id": 1, "total_score": 1, "max_score": 1,
+                      "submitted_at": 1, "evaluated": 1}},
+        {"$lookup": {
+            "from": "tests", "localField": "test_id", "foreignField": "id", "as": "test",
+            "pipeline": [{"$project": {"_id": 0, "title": 1, "test_type": 1, "total_marks": 1, "subject_id": 1}}],
+        }},
+        {"$unwind": {"path": "$test", "preserveNullAndEmptyArrays": True}},
+        {"$lookup": {
+            "from": "subjects", "localField": "test.subject_id", "foreignField": "id", "as": "subject",
+            "pipeline": [{"$project": {"_id": 0, "name": 1}}],
+        }},
+        {"$unwind": {"path": "$subject", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            "id": 1, "test_id": 1, "total_score": 1, "max_score": 1, "submitted_at": 1, "evaluated": 1,
+            "test_title": "$test.title", "test_type": "$test.test_type", "total_marks": "$test.total_marks",
+            "subject_id": "$test.subject_id", "subject_name": "$subject.name",
+        }},
+    ]).to_list(limit + 1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1]['submitted_at'], rows[-1]['id']])
+    return ResultSummaryPage(results=[ResultSummary(**r) for r in rows], next_cursor=next_cursor)
 
 @api_router.get("/results/{result_id}", response_model=TestResult)
 async def get_result(result_id: str, current_user: Dict = Depends(get_current_user)):
     result = await db.test_results.find_one({"id": result_id}, {"_id": 0})
-    if not result:
+    if not result or not visible_to(result, current_user):
         raise HTTPException(status_code=404, detail="Result not found")
     
     if current_user['role'] == UserRole.STUDENT and current_user['user_id'] != result['student_id']:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    return TestResult(**result)
+    await hydrate_archived([result])
+    return TestResult(**decode_result(result))
+
+# ============= RESULT ARCHIVE =============
+
+# Results from before the archive cutoff (the start of the ARCHIVE_KEEP_TERMS-th most recent
+# academic term) are moved to zstd Parquet files under ARCHIVE_DIR, partitioned
+# school=/class=/term=. Mongo keeps a slim summary (scores, ids, dates) plus `archived.path`,
+# and the answers are read back from that file when the result is requested.
+
+def academic_term_starts(year: int) -> List[datetime]:
+    """Term start dates of the academic year beginning in `year`; starts earlier in the
+    calendar than the first one fall in the next calendar year"""
+    first = ACADEMIC_TERM_STARTS[0]
+    return [
+        datetime(year if (month, day) >= first else year + 1, month, day, tzinfo=timezone.utc)
+        for month, day in ACADEMIC_TERM_STARTS
+    ]
+
+def academic_term(moment: datetime) -> tuple:
+    """(academic year, 1-based term number) containing `moment`"""
+    year = moment.year if moment >= academic_term_starts(moment.year)[0] else moment.year - 1
+    starts = academic_term_starts(year)
+    term = max(i for i, start in enumerate(starts) if moment >= start) + 1
+    return year, term
+
+def archive_cutoff(now: datetime, keep_terms: int = None) -> datetime:
+    """Start of the oldest term that stays hot: the current one plus keep_terms - 1 before it"""
+    keep_terms = ARCHIVE_KEEP_TERMS if keep_terms is None else keep_terms
+    year, term = academic_term(now)
+    for _ in range(max(keep_terms, 1) - 1):
+        term -= 1
+        if term == 0:
+            year, term = year - 1, len(ACADEMIC_TERM_STARTS)
+    return academic_term_starts(year)[term - 1]
+
+def archive_slug(value: str) -> str:
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', value or '').strip('_') or 'unknown'
+
+def write_archive_partition(partition: tuple, rows: List[Dict[str, Any]]) -> str:
+    """Write one Parquet part file (atomically) and return its path relative to ARCHIVE_DIR"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    school, class_name, term = partition
+    relative = (Path(f"school={archive_slug(school)}") / f"class={archive_slug(class_name)}"
+                / f"term={term}" / f"part-{uuid.uuid4().hex}.parquet")
+    path = ARCHIVE_DIR / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.table({
+        "id": [r['id'] for r in rows],
+        "test_id": [r['test_id'] for r in rows],
+        "student_id": [r['student_id'] for r in rows],
+        "submitted_at": [r['submitted_at'] for r in rows],
+        "total_score": [float(r['total_score']) for r in rows],
+        "max_score": [int(r['max_score']) for r in rows],
+        # Answers vary in shape per question type; kept as JSON text
+        "answers": [json.dumps(decode_answers(r.get('answers', []))) for r in rows],
+    })
+    partial = path.with_suffix('.partial')
+    pq.write_table(table, partial, compression='zstd')
+    os.replace(partial, path)
+    return relative.as_posix()
+
+def read_archived_answers(relative_path: str, ids: List[str]) -> Dict[str, list]:
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(ARCHIVE_DIR / relative_path, columns=['id', 'answers'], filters=[('id', 'in', ids)])
+    return {
+        result_id: json.loads(answers)
+        for result_id, answers in zip(table.column('id').to_pylist(), table.column('answers').to_pylist())
+    }
+
+async def hydrate_archived(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fill in `answers` of archived results in place, one file read per part file"""
+    by_path: Dict[str, List[str]] = {}
+    for result in results:
+        if result.get('archived') and 'answers' not in result:
+            by_path.setdefault(result['archived']['path'], []).append(result['id'])
+    if not by_path:
+        return results
+
+    async def load(path, ids):
+        try:
+            return await asyncio.to_thread(read_archived_answers, path, ids)
+        except Exception as e:
+            logger.error(f"Archived answers unavailable in {path}: {e}")
+            return {}
+
+    loaded: Dict[str, list] = {}
+    for chunk in await asyncio.gather(*(load(path, ids) for path, ids in by_path.items())):
+        loaded.update(chunk)
+    for result in results:
+        if result.get('archived') and 'answers' not in result:
+            result['answers'] = loaded.get(result['id'], [])
+    incr_metric("archive.file_reads", len(by_path))
+    return results
+
+async def archive_results(cutoff: datetime, batch_size: int = None) -> Dict[str, int]:
+    """Move results submitted before `cutoff` to Parquet; safe to re-run after a crash
+    (a batch written to disk but not yet slimmed in Mongo is simply written again)"""
+    stats: Counter = Counter()
+    for school_stats in await across_schools(lambda: archive_school_results(cutoff, batch_size)):
+        stats.update(school_stats)
+    return dict(stats)
+
+async def archive_school_results(cutoff: datetime, batch_size: int = None) -> Dict[str, int]:
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    query = {"archived": None, "submitted_at": {"$lt": cutoff.isoformat()}}
+    stats: Counter = Counter()
+    while True:
+        batch = await db.test_results.find(query, {"_id": 0}).sort("submitted_at", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        tests = {t['id']: t for t in await db.tests.find(
+            {"id": {"$in": list({r['test_id'] for r in batch})}}, {"_id": 0, "id": 1, "class_name": 1}
+        ).to_list(None)}
+        students = {u['id']: u for u in await db.users.find(
+            {"id": {"$in": list({r['student_id'] for r in batch})}}, {"_id": 0, "id": 1, "school": 1, "class_name": 1}
+        ).to_list(None)}
+
+        partitions: Dict[tuple, List[Dict[str, Any]]] = {}
+        for result in batch:
+            student = students.get(result['student_id'], {})
+            class_name = tests.get(result['test_id'], {}).get('class_name') or student.get('class_name')
+            year, term = academic_term(datetime.fromisoformat(result['submitted_at']))
+            key = (student.get('school') or 'unknown', class_name or 'unknown', f"{year}-T{term}")
+            partitions.setdefault(key, []).append(result)
+
+        now = datetime.now(timezone.utc).isoformat()
+        updates = []
+        for key, rows in partitions.items():
+            path = await asyncio.to_thread(write_archive_partition, key, rows)
+            stats['files'] += 1
+            updates.extend(
+                UpdateOne({"id": r['id'], "archived": None}, {
+                    "$set": {"archived": {"path": path, "term": key[2], "archived_at": now}},
+                    "$unset": {"answers": ""},
+                })
+                for r in rows
+            )
+        written = await db.test_results.bulk_write(updates, ordered=False)
+        stats['results'] += written.modified_count
+        incr_metric("archive.results", written.modified_count)
+        logger.info(f"Archived {written.modified_count} results into {len(partitions)} partitions")
+    return dict(stats)
+
+# ============= RE-GRADING JOBS =============
+
+# A job re-scores every stored result of one test after an answer-key fix or a grader
+# incident. It is driven by whichever worker holds its lease and checkpoints after every
+# batch (last result id + counters), so if that worker dies another one picks the job up
+# from the checkpoint once the lease expires. Re-running a batch is harmless: scores are
+# recomputed from the answers, never incremented.
+
+REGRADE_ACTIVE_STATUSES = ["pending", "running"]
+
+_background_tasks: set = set()
+
+def spawn_background(coro) -> asyncio.Task:
+    """create_task that holds a reference so the task isn't garbage-collected mid-run"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def regrade_lease_expiry() -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=REGRADE_LEASE_SECONDS)).isoformat()
+
+async def claim_regrade_job(job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Atomically take the lease on an unowned or orphaned job (the given one, or any)"""
+    query = {
+        "status": {"$in": REGRADE_ACTIVE_STATUSES},
+        "$or": [
+            {"lease_expires_at": None},
+            {"lease_expires_at": {"$lt": datetime.now(timezone.utc).isoformat()}},
+        ],
+    }
+    if job_id:
+        query["id"] = job_id
+    lease = {"status": "running", "lease_owner": worker_id(), "lease_expires_at": regrade_lease_expiry()}
+    return await db.regrade_jobs.find_one_and_update(
+        query, {"$set": lease}, projection={"_id": 0}, return_document=ReturnDocument.AFTER,
+    )
+
+async def renew_regrade_lease(job_id: str, owner: str):
+    """Heartbeat so a slow batch (many LLM calls) doesn't look like a dead worker"""
+    while True:
+        await asyncio.sleep(REGRADE_LEASE_SECONDS / 3)
+        await db.regrade_jobs.update_one(
+            {"id": job_id, "lease_owner": owner}, {"$set": {"lease_expires_at": regrade_lease_expiry()}}
+        )
+
+async def regrade_batch(test: Dict[str, Any], results: List[Dict[str, Any]],
+                        semaphore: asyncio.Semaphore) -> List[List[float]]:
+    """New per-question scores per result; subjective answers are graded per question across the batch"""
+    questions = test['questions']
+    scores = [[0.0] * len(questions) for _ in results]
+    subjective: Dict[int, List[tuple]] = {}
+    for r, result in enumerate(results):
+        for q, ans in enumerate(result.get('answers', [])[:len(questions)]):
+            question = questions[q]
+            if question['question_type'] in [QuestionType.SHORT, QuestionType.LONG]:
+                answer_text = ans.get('ocr_text') or ans.get('answer_text') or ''
+                if answer_text and question.get('correct_answer'):
+                    subjective.setdefault(q, []).append((r, answer_text))
+            else:
+                scores[r][q] = score_objective_answer(question, ans)
+
+    graded = await asyncio.gather(*(
+        grade_subjective(questions[q], [text for _, text in items], semaphore)
+        for q, items in subjective.items()
+    ))
+    for (q, items), question_scores in zip(subjective.items(), graded):
+        for (r, _), score in zip(items, question_scores):
+            scores[r][q] = score
+    return scores
+
+async def run_regrade_job(job: Dict[str, Any]):
+    """Re-score the job's results in id order from its checkpoint; call only while holding the lease"""
+    job_id, owner = job['id'], worker_id()
+    # Runs as its own task (also when adopted), so this only scopes the job's own reads
+    current_school.set(job.get('school_id'))
+    test = await db.tests.find_one({"id": job['test_id']}, {"_id": 0})
+    if not test:
+        await db.regrade_jobs.update_one(
+            {"id": job_id}, {"$set": {"status": "failed", "error": "Test not found", "lease_expires_at": None}}
+        )
+        return
+
+    await db.regrade_jobs.update_one(
+        {"id": job_id, "lease_owner": owner},
+        {"$set": {"run_started_at": datetime.now(timezone.utc).isoformat(), "run_start_processed": job['processed']}},
+    )
+    heartbeat = spawn_background(renew_regrade_lease(job_id, owner))
+    semaphore = asyncio.Semaphore(REGRADE_CONCURRENCY)
+    last_id = job.get('last_result_id')
+    logger.info(f"Re-grade job {job_id} running on {owner} from {last_id or 'the start'}")
+    try:
+        while True:
+            # Keyset pagination instead of one long-lived cursor: a batch can wait minutes on
+            # the LLM, longer than the server keeps an idle cursor open
+            query: Dict[str, Any] = {"test_id": job['test_id']}
+            if last_id:
+                query['id'] = {"$gt": last_id}
+            batch = await db.test_results.find(
+                query, {"_id": 0, "id": 1, "answers": 1, "total_score": 1, "archived": 1,
+                        "student_id": 1, "school_id": 1, "max_score": 1, "submitted_at": 1}
+            ).sort("id", 1).limit(REGRADE_BATCH_SIZE).to_list(REGRADE_BATCH_SIZE)
+            if not batch:
+                break
+            await hydrate_archived(batch)
+            for result in batch:
+                decode_result(result)
+
+            question_scores = await regrade_batch(test, batch, semaphore)
+            totals = [float(sum(row)) for row in question_scores]
+            now = datetime.now(timezone.utc).isoformat()
+            await db.test_results.bulk_write([
+                UpdateOne({"id": result['id']}, {"$set": {
+                    "question_scores": row, "total_score": total, "max_score": test['total_marks'], "regraded_at": now,
+                }})
+                for result, row, total in zip(batch, question_scores, totals)
+            ], ordered=False)
+            changed = sum(1 for result, total in zip(batch, totals) if abs(total - result.get('total_score', 0)) > 1e-9)
+            # Move the trend buckets by each score change
+            await update_trend_rollups([
+                row
+                for result, total in zip(batch, totals)
+                if abs(total - result.get('total_score', 0)) > 1e-9 or result.get('max_score') != test['total_marks']
+                for row in rollup_increments(
+                    result, test, 0, total - result.get('total_score', 0),
+                    test['total_marks'] - (result.get('max_score') or 0),
+                    result_percent(total, test['total_marks'])
+                    - result_percent(result.get('total_score', 0), result.get('max_score')))
+            ])
+            last_id = batch[-1]['id']
+            checkpoint = await db.regrade_jobs.update_one(
+                {"id": job_id, "lease_owner": owner},
+                {"$set": {"last_result_id": last_id, "updated_at": now, "lease_expires_at": regrade_lease_expiry()},
+                 "$inc": {"processed": len(batch), "changed": changed}},
+            )
+            incr_metric("regrade.results", len(batch))
+            live_exam_hub.invalidate(job['test_id'])
+            if checkpoint.matched_count == 0:
+                logger.warning(f"Re-grade job {job_id} lease lost; stopping on {owner}")
+                return
+
+        now = datetime.now(timezone.utc).isoformat()
+        await db.regrade_jobs.update_one(
+            {"id": job_id, "lease_owner": owner},
+            {"$set": {"status": "completed", "completed_at": now, "updated_at": now, "lease_expires_at": None}},
+        )
+        live_exam_hub.invalidate(job['test_id'])
+        logger.info(f"Re-grade job {job_id} completed")
+    except Exception as e:
+        logger.error(f"Re-grade job {job_id} failed: {e}")
+        await db.regrade_jobs.update_one(
+            {"id": job_id, "lease_owner": owner},
+            {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.now(timezone.utc).isoformat(),
+                      "lease_expires_at": None}},
+        )
+    finally:
+        heartbeat.cancel()
+
+def regrade_progress(job: Dict[str, Any]) -> Dict[str, Any]:
+    progress = {key: job.get(key) for key in (
+        "id", "test_id", "status", "total", "processed", "changed",
+        "created_by", "created_at", "updated_at", "completed_at", "error",
+    )}
+    total, processed = job['total'], job['processed']
+    progress['percent'] = round(min(processed / total, 1.0) * 100, 1) if total else 100.0
+    # ETA from this run's throughput only, so time spent before a crash doesn't skew it
+    eta = None
+    if job['status'] == 'running' and job.get('run_started_at'):
+        done = processed - job.get('run_start_processed', 0)
+        elapsed = (datetime.now(timezone.utc) - datetime.fromisoformat(job['run_started_at'])).total_seconds()
+        if done > 0 and elapsed > 0:
+            eta = round(max(total - processed, 0) * elapsed / done, 1)
+    progress['eta_seconds'] = eta
+    return progress
+
+async def get_regrade_job_for_user(job_id: str, current_user: Dict) -> Dict[str, Any]:
+    job = await db.regrade_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Re-grade job not found")
+    if current_user['role'] != UserRole.SUPER_ADMIN and job['created_by'] != current_user['user_id']:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return job
+
+@api_router.post("/tests/{test_id}/regrade", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(rate_limit("bulk"))])
+async def start_regrade(test_id: str, current_user: Dict = Depends(get_current_user)):
+    """Start re-scoring all results of a test; returns the already active job if there is one"""
+    if current_user['role'] not in [UserRole.TEACHER, UserRole.SUPER_ADMIN]:
+        raise HTTPException(status_code=403, detail="Only teachers can re-grade tests")
+    test = await db.tests.find_one({"id": test_id}, {"_id": 0, "created_by": 1})
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    if current_user['role'] == UserRole.TEACHER and test['created_by'] != current_user['user_id']:
+        raise HTTPException(status_code=403, detail="Only the test's author can re-grade it")
+
+    active = await db.regrade_jobs.find_one(
+        {"test_id": test_id, "status": {"$in": REGRADE_ACTIVE_STATUSES}}, {"_id": 0}
+    )
+    if active:
+        return regrade_progress(active)
+
+    now = datetime.now(timezone.utc).isoformat()
+    job = {
+        'id': str(uuid.uuid4()),
+        'test_id': test_id,
+        'school_id': current_user['school_id'],
+        'status': 'pending',
+        'total': await db.test_results.count_documents({"test_id": test_id}),
+        'processed': 0,
+        'changed': 0,
+        'last_result_id': None,
+        'created_by': current_user['user_id'],
+        'created_at': now,
+        'updated_at': now,
+        'lease_owner': None,
+        'lease_expires_at': None,
+    }
+    await db.regrade_jobs.insert_one(job)
+    claimed = await claim_regrade_job(job['id'])
+    if claimed:
+        spawn_background(run_regrade_job(claimed))
+        job = claimed
+    return regrade_progress(job)
+
+@api_router.get("/regrade-jobs/{job_id}")
+async def get_regrade_job(job_id: str, current_user: Dict = Depends(get_current_user)):
+    return regrade_progress(await get_regrade_job_for_user(job_id, current_user))
+
+@api_router.post("/regrade-jobs/{job_id}/resume", status_code=status.HTTP_202_ACCEPTED)
+async def resume_regrade_job(job_id: str, current_user: Dict = Depends(get_current_user)):
+    """Restart a failed job from its checkpoint, or adopt one whose worker has gone away"""
+    job = await get_regrade_job_for_user(job_id, current_user)
+    if job['status'] == 'completed':
+        raise HTTPException(status_code=400, detail="Re-grade job already completed")
+    if job['status'] == 'failed':
+        await db.regrade_jobs.update_one(
+            {"id": job_id, "status": "failed"}, {"$set": {"status": "pending", "error": None}}
+        )
+    claimed = await claim_regrade_job(job_id)
+    if claimed:
+        spawn_background(run_regrade_job(claimed))
+        job = claimed
+    return regrade_progress(await db.regrade_jobs.find_one({"id": job_id}, {"_id": 0}) or job)
+
+async def adopt_orphaned_regrade_jobs():
+    """Every lease period, pick up jobs whose worker died without finishing them"""
+    while True:
+        try:
+            while (job := await claim_regrade_job()) is not None:
+                logger.info(f"Adopting orphaned re-grade job {job['id']}")
+                spawn_background(run_regrade_job(job))
+        except Exception as e:
+            logger.error(f"Re-grade job adoption error: {e}")
+        await asyncio.sleep(REGRADE_LEASE_SECONDS)
+
+@app.on_event("startup")
+async def start_regrade_adoption():
+    spawn_background(adopt_orphaned_regrade_jobs())
+
+# ============= EXAM SCHEDULING & PRE-WARMING =============
+
+# Tests whose scheduled_at is within PREWARM_LEAD_MINUTES are loaded into this worker's memory
+# ahead of the start-of-exam burst, together with the grading path, the index ranges the
+# burst reads and the CPU pool processes OCR runs in. Entries expire at the end of the exam
+# window. Tests have no edit endpoint, so a cached document cannot go stale under the API.
+prewarmed_tests: Dict[str, Dict[str, Any]] = {}
+
+def parse_schedule(value: str) -> datetime:
+    """ISO 8601 -> aware UTC datetime; naive values are taken as UTC"""
+    moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+def exam_window(test: Dict[str, Any]) -> Optional[tuple]:
+    """(start, submission deadline) for a scheduled test, None for an unscheduled one"""
+    if not test.get('scheduled_at'):
+        return None
+    try:
+        start = parse_schedule(test['scheduled_at'])
+    except ValueError:
+        logger.warning(f"Test {test.get('id')} has unparseable scheduled_at {test['scheduled_at']!r}")
+        return None
+    return start, start + timedelta(minutes=test['duration_minutes'] + EXAM_GRACE_MINUTES)
+
+def check_exam_window(test: Dict[str, Any], submitting: bool):
+    """Students can't see a scheduled test before it starts or submit after its window closes"""
+    window = exam_window(test) if EXAM_WINDOW_ENFORCED else None
+    if window is None:
+        return
+    now = datetime.now(timezone.utc)
+    if now < window[0]:
+        raise HTTPException(status_code=403, detail="Test has not started yet")
+    if submitting and now > window[1]:
+        raise HTTPException(status_code=403, detail="Test submission window has closed")
+
+async def get_test_doc(test_id: str) -> Optional[Dict[str, Any]]:
+    """Test document, from the pre-warmed copy while its exam window is open (don't mutate it)"""
+    entry = prewarmed_tests.get(test_id)
+    if entry and entry['expires_at'] > datetime.now(timezone.utc):
+        incr_metric("tests.prewarmed_hit")
+        return entry['test']
+    return await db.tests.find_one({"id": test_id}, {"_id": 0})
+
+def warm_pool_worker() -> int:
+    """Runs in a CPU pool process: pay the OCR imports before the first real image arrives"""
+    import numpy  # noqa: F401
+    import pytesseract  # noqa: F401
+    from PIL import Image  # noqa: F401
+    return os.getpid()
+
+async def prewarm_process_pool() -> int:
+    """Start every pool process now instead of on the first OCR/hashing job; returns the count"""
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    pids = await asyncio.gather(*(loop.run_in_executor(pool, warm_pool_worker) for _ in range(CPU_POOL_WORKERS)))
+    return len(set(pids))
+
+def warm_grading_path(test: Dict[str, Any]):
+    """Import the grader client and run the local scorer once per subjective question"""
+    for question in test['questions']:
+        if question['question_type'] in [QuestionType.SHORT, QuestionType.LONG] and question.get('correct_answer'):
+            local_scores(question, [question['correct_answer']])
+    try:
+        from emergentintegrations.llm.chat import LlmChat  # noqa: F401
+    except ImportError:
+        logger.warning("LLM client not installed; subjective grading will fail")
+
+async def touch_exam_indexes(test: Dict[str, Any]):
+    """Read what the exam burst reads so those index and document pages are in Mongo's cache:
+    the class's user documents by id (auth on every request) and the test's result range"""
+    # The class in the test's school only; served by (school_id, role, class_name)
+    students = await db.users.find(
+        {**school_scope(test.get('school_id'), include_shared=False),
+         "role": UserRole.STUDENT, "class_name": test['class_name']}, {"_id": 0, "id": 1}
+    ).to_list(None)
+    await db.users.find(
+        {"id": {"$in": [s['id'] for s in students]}}, {"_id": 0, "id": 1, "is_active": 1}
+    ).to_list(None)
+    await db.test_results.find({"test_id": test['id']}, {"_id": 0, "id": 1}).to_list(None)
+    return len(students)
+
+async def prewarm_test(test: Dict[str, Any]) -> Dict[str, Any]:
+    """Pre-load one test; returns what was warmed and how long each step took"""
+    timings = {}
+    started = time.perf_counter()
+    window = exam_window(test)
+    expires_at = window[1] if window else datetime.now(timezone.utc) + timedelta(minutes=PREWARM_LEAD_MINUTES)
+    warm_grading_path(test)
+    timings['grading_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    async def timed(name, coro):
+        step_started = time.perf_counter()
+        result = await coro
+        timings[f'{name}_ms'] = round((time.perf_counter() - step_started) * 1000, 2)
+        return result
+
+    students, pool_workers = await asyncio.gather(
+        timed('indexes', touch_exam_indexes(test)), timed('pool', prewarm_process_pool())
+    )
+    # Cached last, so a failed step is retried on the scheduler's next pass
+    prewarmed_tests[test['id']] = {"test": test, "expires_at": expires_at}
+    incr_metric("prewarm.tests")
+    logger.info(f"Pre-warmed test {test['id']} ({students} students, {pool_workers} pool workers): {timings}")
+    return {"test_id": test['id'], "students": students, "pool_workers": pool_workers, **timings}
+
+async def prewarm_upcoming_tests():
+    now = datetime.now(timezone.utc)
+    for test_id in [t for t, entry in prewarmed_tests.items() if entry['expires_at'] <= now]:
+        del prewarmed_tests[test_id]
+    await across_schools(lambda: prewarm_school_tests(now))
+
+async def prewarm_school_tests(now: datetime):
+    # Look back a day so a worker started mid-exam still warms the running test
+    upcoming = await db.tests.find({"scheduled_at": {
+        "$gte": (now - timedelta(days=1)).isoformat(),
+        "$lte": (now + timedelta(minutes=PREWARM_LEAD_MINUTES)).isoformat(),
+    }}, {"_id": 0}).to_list(None)
+    for test in upcoming:
+        window = exam_window(test)
+        if test['id'] not in prewarmed_tests and window and window[1] > now:
+            await prewarm_test(test)
+
+async def prewarm_scheduler():
+    while True:
+        try:
+            await prewarm_upcoming_tests()
+        except Exception as e:
+            logger.error(f"Pre-warm scheduler error: {e}")
+        await asyncio.sleep(PREWARM_POLL_SECONDS)
+
+@app.on_event("startup")
+async def start_prewarm_scheduler():
+    if PREWARM_LEAD_MINUTES > 0:
+        spawn_background(prewarm_scheduler())
+
+# ============= LIVE EXAM MONITORING =============
+
+# Teachers watching a test get pushed snapshots (submissions, grading in progress, score
+# distribution, re-grade progress) over a WebSocket instead of polling the dashboard.
+# submit_test publishes to this worker's in-process hub. Each watched test has one flusher
+# task that coalesces bursts of updates into one snapshot per LIVE_COALESCE_MS, serializes
+# it once and sends it to every viewer. The flusher also re-reads the test's results from
+# Mongo every LIVE_RESYNC_SECONDS, which picks up submissions handled by other workers.
+
+class LiveExamChannel:
+    """One watched test: its live state, viewers and flusher; only touched from the event loop"""
+    def __init__(self, test: Dict[str, Any]):
+        self.test_id = test['id']
+        self.max_score = test.get('total_marks') or 0
+        self.sockets: set = set()
+        self.results: Dict[str, tuple] = {}  # result id -> (student_id, total_score, max_score)
+        self.grading = 0
+        self.regrade: Optional[Dict[str, Any]] = None
+        self.changed = asyncio.Event()
+        self.stale = True
+        self.last_message: Optional[str] = None
+        self.flusher: Optional[asyncio.Task] = None
+
+    async def resync(self):
+        incr_metric("live.resyncs")
+        results = await db.test_results.find(
+            {"test_id": self.test_id}, {"_id": 0, "id": 1, "student_id": 1, "total_score": 1, "max_score": 1}
+        ).to_list(None)
+        # Merged, not replaced: a submission stored after this read started is not lost
+        self.results.update(
+            (r['id'], (r['student_id'], r.get('total_score', 0), r.get('max_score'))) for r in results
+        )
+        jobs = await db.regrade_jobs.find({"test_id": self.test_id}, {"_id": 0}).sort(
+            "created_at", -1).limit(1).to_list(1)
+        self.regrade = regrade_progress(jobs[0]) if jobs else None
+        self.stale = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        bins = [0] * LIVE_DISTRIBUTION_BINS
+        percents = []
+        for _, total_score, max_score in self.results.values():
+            max_score = max_score or self.max_score
+            percent = min(max(total_score / max_score * 100, 0.0), 100.0) if max_score else 0.0
+            percents.append(percent)
+            bins[min(int(percent * LIVE_DISTRIBUTION_BINS / 100), LIVE_DISTRIBUTION_BINS - 1)] += 1
+        width = 100 / LIVE_DISTRIBUTION_BINS
+        return {
+            "test_id": self.test_id,
+            "submitted": len(self.results),
+            "students_submitted": len({student_id for student_id, _, _ in self.results.values()}),
+            "grading_in_progress": self.grading,
+            "max_score": self.max_score,
+            "mean_percent": round(sum(percents) / len(percents), 2) if percents else None,
+            "distribution": [
+                {"from": round(i * width, 2), "to": round((i + 1) * width, 2), "count": count}
+                for i, count in enumerate(bins)
+            ],
+            "regrade": self.regrade,
+        }
+
+    async def send(self, websocket: WebSocket, message: str):
+        try:
+            await asyncio.wait_for(websocket.send_text(message), LIVE_SEND_TIMEOUT_SECONDS)
+        except Exception:
+            # A viewer that can't keep up is dropped instead of holding back the others
+            incr_metric("live.dropped")
+            self.sockets.discard(websocket)
+
+    async def broadcast(self):
+        message = json.dumps(self.snapshot())
+        if message == self.last_message:
+            return
+        self.last_message = message
+        viewers = list(self.sockets)
+        incr_metric("live.broadcasts")
+        incr_metric("live.messages", len(viewers))
+        await asyncio.gather(*(self.send(websocket, message) for websocket in viewers))
+
+    async def run(self):
+        while self.sockets:
+            try:
+                await asyncio.wait_for(self.changed.wait(), LIVE_RESYNC_SECONDS)
+                await asyncio.sleep(LIVE_COALESCE_MS / 1000)
+            except asyncio.TimeoutError:
+                self.stale = True
+            self.changed.clear()
+            try:
+                if self.stale:
+                    await self.resync()
+                await self.broadcast()
+            except Exception as e:
+                logger.error(f"Live exam channel {self.test_id} error: {e}")
+
+    def touch(self, stale: bool = False):
+        self.stale = self.stale or stale
+        self.changed.set()
+
+class LiveExamHub:
+    def __init__(self):
+        self.channels: Dict[str, LiveExamChannel] = {}
+
+    async def subscribe(self, test: Dict[str, Any], websocket: WebSocket) -> LiveExamChannel:
+        channel = self.channels.get(test['id'])
+        if channel is None:
+            channel = self.channels[test['id']] = LiveExamChannel(test)
+        # Registered before any await, so another viewer leaving meanwhile can't drop the channel
+        channel.sockets.add(websocket)
+        if channel.stale:
+            await channel.resync()
+        await channel.send(websocket, json.dumps(channel.snapshot()))
+        if channel.flusher is None or channel.flusher.done():
+            channel.flusher = spawn_background(channel.run())
+        incr_metric("live.connections")
+        return channel
+
+    def unsubscribe(self, test_id: str, websocket: WebSocket):
+        channel = self.channels.get(test_id)
+        if channel is None:
+            return
+        channel.sockets.discard(websocket)
+        if not channel.sockets:
+            # State is rebuilt from Mongo when the next viewer connects
+            del self.channels[test_id]
+            if channel.flusher:
+                channel.flusher.cancel()
+
+    def grading_started(self, test_id: str):
+        channel = self.channels.get(test_id)
+        if channel:
+            channel.grading += 1
+            channel.touch()
+
+    def grading_finished(self, test_id: str, result: Optional[Dict[str, Any]]):
+        """After a submission is stored (result) or has failed (None)"""
+        channel = self.channels.get(test_id)
+        if channel:
+            channel.grading = max(channel.grading - 1, 0)
+            if result:
+                channel.results[result['id']] = (result['student_id'], result['total_score'], result['max_score'])
+            channel.touch()
+
+    def invalidate(self, test_id: str):
+        """Scores or job state changed in Mongo: re-read before the next update"""
+        channel = self.channels.get(test_id)
+        if channel:
+            channel.touch(stale=True)
+
+live_exam_hub = LiveExamHub()
+
+@api_router.websocket("/tests/{test_id}/live")
+async def live_exam_socket(websocket: WebSocket, test_id: str):
+    """Live snapshots for the test's author or a super admin. Browsers can't set headers on a
+    WebSocket, so the JWT comes as ?token= (an Authorization header also works)."""
+    token = websocket.query_params.get('token') or websocket.headers.get('Authorization', '').removeprefix('Bearer ')
+    try:
+        user = await get_current_user(credentials=HTTPAuthorizationCredentials(scheme='Bearer', credentials=token))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    test = await get_test_doc(test_id)
+    allowed = test and (
+        user['role'] == UserRole.SUPER_ADMIN
+        or (user['role'] == UserRole.TEACHER and test['created_by'] == user['user_id'])
+    )
+    if not allowed:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    await live_exam_hub.subscribe(test, websocket)
+    try:
+        while True:
+            # Nothing is expected from the client; this only notices the disconnect
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live_exam_hub.unsubscribe(test_id, websocket)
 
 # ============= FILE UPLOAD ROUTE =============
 
-@api_router.post("/upload-image")
+@api_router.post("/upload-image", dependencies=[Depends(rate_limit("ocr"))])
 async def upload_image(file: UploadFile = File(...)):
     try:
+        from PIL import Image
+
         contents = await file.read()
         
         # Convert to base64
@@ -713,22 +3668,394 @@ async def upload_image(file: UploadFile = File(...)):
         img_base64 = base64.b64encode(buffered.getvalue()).decode('utf-8')
         
         # Extract text using Tesseract OCR (cost-optimized)
-        ocr_text = await extract_text_from_image(img_base64)
+        async with admission['ocr']:
+            ocr_text = await extract_text_from_image(img_base64)
         
         return {
             "image_base64": img_base64,
             "ocr_text": ocr_text
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Image upload error: {e}")
         raise HTTPException(status_code=400, detail=f"Image processing failed: {str(e)}")
 
+# ============= PAPER ANSWER SHEETS =============
+
+# A batch is one upload of scanned answer sheets for one test: a PDF, a ZIP of page images
+# (and/or PDFs), a multi-page TIFF or a single image. Pages are OCR'd across the CPU pool,
+# grouped into sheets by the student code written on each sheet's first page, mapped to
+# questions and graded like a re-grade batch. Sheets of one student follow each other:
+# pages without a code belong to the last sheet that had one.
+
+SCAN_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.bmp', '.webp')
+# "STD" + 8 hex digits (generate_student_code), matched after removing spaces/punctuation
+STUDENT_CODE_PATTERN = re.compile(r"STD([0-9A-Z]{8})")
+# Letters Tesseract reads for digits in a hex code
+STUDENT_CODE_OCR_FIXES = str.maketrans("OQILZSG", "0011256")
+# "Q3", "Q.3)", "Question 3:" at the start of a line
+QUESTION_MARKER_PATTERN = re.compile(r"^[ \t]*(?:Q|Ques|Question)\.?[ \t]*(\d{1,3})\b[ \t]*[).:\-]?", re.IGNORECASE | re.MULTILINE)
+
+def natural_key(name: str) -> list:
+    """page2.jpg before page10.jpg"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', name)]
+
+def split_pdf(label: str, data: bytes) -> List[Dict[str, Any]]:
+    """One page per PDF page: its scan image (the largest embedded image), or its text layer
+    when it has no image (typed or already OCR'd sheets)"""
+    from pypdf import PdfReader
+
+    pages = []
+    for number, page in enumerate(PdfReader(BytesIO(data)).pages, 1):
+        entry = {"label": f"{label}#{number}", "image": None, "text": None, "error": None}
+        try:
+            images = page.images
+            if len(images):
+                entry['image'] = max(images, key=lambda image: len(image.data)).data
+            else:
+                entry['text'] = page.extract_text() or ''
+        except Exception as e:  # e.g. JBIG2/CCITT scans without the decoder installed
+            entry['error'] = f"Could not read page: {e}"
+        pages.append(entry)
+    return pages
+
+def split_tiff(label: str, data: bytes) -> List[Dict[str, Any]]:
+    from PIL import Image, ImageSequence
+
+    with Image.open(BytesIO(data)) as image:
+        if getattr(image, 'n_frames', 1) == 1:
+            return [{"label": label, "image": data, "text": None, "error": None}]
+        pages = []
+        for number, frame in enumerate(ImageSequence.Iterator(image), 1):
+            buffered = BytesIO()
+            frame.save(buffered, format="PNG")
+            pages.append({"label": f"{label}#{number}", "image": buffered.getvalue(), "text": None, "error": None})
+        return pages
+
+def split_scan_file(filename: str, data: bytes, nested: bool = False) -> List[Dict[str, Any]]:
+    """Pages of an uploaded scan file, in order. Runs in a thread (decompression is CPU work)."""
+    name = filename.lower()
+    if name.endswith('.pdf'):
+        return split_pdf(filename, data)
+    if name.endswith(('.tif', '.tiff')):
+        return split_tiff(filename, data)
+    if name.endswith(SCAN_IMAGE_EXTENSIONS):
+        return [{"label": filename, "image": data, "text": None, "error": None}]
+    if name.endswith('.zip') and not nested:
+        with zipfile.ZipFile(BytesIO(data)) as archive:
+            entries = sorted(
+                (info for info in archive.infolist()
+                 if not info.is_dir() and not Path(info.filename).name.startswith('.') and '__MACOSX' not in info.filename),
+                key=lambda info: natural_key(info.filename)
+            )
+            if sum(info.file_size for info in entries) > ANSWER_SHEET_MAX_MB * 1024 * 1024:
+                raise ValueError(f"ZIP expands to more than {ANSWER_SHEET_MAX_MB} MB")
+            return [page for info in entries for page in split_scan_file(info.filename, archive.read(info), nested=True)]
+    if nested:
+        return []  # stray files in a ZIP (notes, thumbnails.db, ...)
+    raise ValueError("File must be a PDF, a ZIP of scans, a TIFF or an image")
+
+def process_scan_page(image_data: bytes, ocr: bool) -> tuple:
+    """(OCR text or None, the JPEG kept with the answer - sized like /upload-image);
+    runs inside a process-pool worker"""
+    from PIL import Image, ImageOps
+
+    text = run_ocr(image_data) if ocr else None
+    image = ImageOps.exif_transpose(Image.open(BytesIO(image_data)))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((1024, 1024), Image.Resampling.LANCZOS)
+    buffered = BytesIO()
+    image.save(buffered, format="JPEG")
+    return text, buffered.getvalue()
+
+def find_student_code(text: str) -> tuple:
+    """(student code, text without the line it was written on), or (None, text)"""
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        match = STUDENT_CODE_PATTERN.search(re.sub(r"[^0-9A-Z]", "", line.upper()))
+        if not match:
+            continue
+        digits = match.group(1).translate(STUDENT_CODE_OCR_FIXES)
+        if re.fullmatch(r"[0-9A-F]{8}", digits):
+            return f"STD{digits}", "\n".join(lines[:i] + lines[i + 1:])
+    return None, text
+
+def group_sheets(pages: List[Dict[str, Any]]) -> tuple:
+    """({student code: [pages]}, pages before the first code); pages carry 'text'"""
+    sheets: Dict[str, List[Dict[str, Any]]] = {}
+    unassigned = []
+    current = None
+    for page in pages:
+        code, page['text'] = find_student_code(page['text'])
+        if code:
+            current = code
+            sheets.setdefault(code, [])
+        if current is None:
+            unassigned.append(page)
+        else:
+            sheets[current].append(page)
+    return sheets, unassigned
+
+def map_sheet_answers(pages: List[Dict[str, Any]], questions: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """
+    {question index: {"text", "page"}} for one student's pages. With question markers ("Q3")
+    anywhere on the sheet, text goes to the last marker before it, across page breaks.
+    Without markers, page k answers the k-th short/long question.
+    """
+    if not any(QUESTION_MARKER_PATTERN.search(page['text']) for page in pages):
+        subjective = [i for i, q in enumerate(questions) if q['question_type'] in (QuestionType.SHORT, QuestionType.LONG)]
+        return {q: {"text": page['text'].strip(), "page": page} for q, page in zip(subjective, pages)}
+
+    answers: Dict[int, Dict[str, Any]] = {}
+    current = None
+    for page in pages:
+        text = page['text']
+        markers = [m for m in QUESTION_MARKER_PATTERN.finditer(text) if 1 <= int(m.group(1)) <= len(questions)]
+        cuts = [m.start() for m in markers] + [len(text)]
+        if current is not None:
+            answers[current]['parts'].append(text[:cuts[0]])
+        for marker, end in zip(markers, cuts[1:]):
+            current = int(marker.group(1)) - 1
+            answers.setdefault(current, {"parts": [], "page": page})['parts'].append(text[marker.end():end])
+    return {q: {"text": "\n".join(part.strip() for part in entry['parts'] if part.strip()), "page": entry['page']}
+            for q, entry in answers.items()}
+
+def paper_answer(question_index: int, question: Dict[str, Any], text: str, image: Optional[str]) -> Dict[str, Any]:
+    """An answer entry like a submitted one: OCR text for written answers, the chosen option
+    (letter or option text) for MCQs, the text for fill-in-the-blanks"""
+    ans = {'question_index': question_index, 'answer_text': None, 'selected_option': None,
+           'match_pairs': None, 'handwritten_image': image, 'ocr_text': text}
+    if question['question_type'] == QuestionType.FILL_BLANK:
+        ans['answer_text'] = text.strip()
+    elif question['question_type'] == QuestionType.MCQ:
+        options = question.get('options') or []
+        choice = text.strip().rstrip('.)').strip()
+        if len(choice) == 1 and choice.isalpha() and ord(choice.upper()) - ord('A') < len(options):
+            ans['selected_option'] = options[ord(choice.upper()) - ord('A')]
+        else:
+            ans['selected_option'] = next((o for o in options if o.strip().lower() == choice.lower()), None)
+    return ans
+
+def pages_per_minute(pages: int, started: float) -> float:
+    elapsed = time.perf_counter() - started
+    return round(pages / elapsed * 60, 1) if elapsed > 0 else 0.0
+
+async def ocr_scan_pages(pages: List[Dict[str, Any]], emit) -> float:
+    """Fill in each page's 'text' and 'image' (base64 JPEG) from the CPU pool, OCR cache first;
+    emits a progress event per page as pages finish. Returns the OCR phase's pages/minute."""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(ANSWER_SHEET_OCR_CONCURRENCY)
+    started = time.perf_counter()
+    done = 0
+
+    async def process(page: Dict[str, Any]) -> Dict[str, Any]:
+        if page['image'] is None:
+            page.setdefault('ocr', 'text_layer' if page['error'] is None else 'failed')
+            page['text'] = page['text'] or ''
+            return page
+        cache_key = ocr_cache_key(page['image'])
+        cached = await get_cached_ocr(cache_key)
+        try:
+            # A batch's own share, within the worker-wide OCR limit that exam-time OCR goes first in
+            async with semaphore, admission['ocr'].batch():
+                text, jpeg = await loop.run_in_executor(get_process_pool(), process_scan_page, page['image'], cached is None)
+        except Exception as e:
+            page.update(text='', image=None, ocr='failed', error=f"Could not process image: {e}")
+            return page
+        if cached is None:
+            await store_cached_ocr(cache_key, text)
+        page.update(text=cached if cached is not None else text, image=base64.b64encode(jpeg).decode('ascii'),
+                    ocr='cached' if cached is not None else 'ocr')
+        return page
+
+    for finished in asyncio.as_completed([process(page) for page in pages]):
+        page = await finished
+        done += 1
+        incr_metric(f"answer_sheets.pages.{page['ocr']}")
+        event = {"event": "page", "page": page['label'], "ocr": page['ocr'], "characters": len(page['text']),
+                 "pages_done": done, "pages_total": len(pages), "pages_per_minute": pages_per_minute(done, started)}
+        if page['error']:
+            event['error'] = page['error']
+        emit(event)
+    return pages_per_minute(len(pages), started)
+
+async def run_answer_sheet_batch(batch: Dict[str, Any], test: Dict[str, Any], pages: List[Dict[str, Any]], emit):
+    """OCR -> group into sheets -> map answers -> grade -> store; every step reports through emit"""
+    started = time.perf_counter()
+    batch_id, test_id = batch['id'], test['id']
+    summary: Dict[str, Any] = {"pages": len(pages)}
+    try:
+        summary['ocr_pages_per_minute'] = await ocr_scan_pages(pages, emit)
+        await db.answer_sheet_batches.update_one(
+            {"id": batch_id}, {"$set": {"pages_done": len(pages), "updated_at": datetime.now(timezone.utc).isoformat()}})
+
+        sheets, unassigned = group_sheets([page for page in pages if page['error'] is None])
+        students = {u['student_code']: u for u in await db.users.find(
+            {"student_code": {"$in": list(sheets)}, "role": UserRole.STUDENT},
+            {"_id": 0, "id": 1, "role": 1, "student_code": 1, "school_id": 1}
+        ).to_list(None)}
+        unknown_codes = sorted(code for code in sheets if code not in students or not visible_to(test, students[code]))
+        online = set(await db.test_results.distinct("student_id", {
+            "test_id": test_id, "student_id": {"$in": [u['id'] for u in students.values()]}, "source": {"$ne": "paper"},
+        }))
+        summary.update(
+            sheets=len(sheets), unassigned_pages=[page['label'] for page in unassigned], unknown_codes=unknown_codes,
+            failed_pages=[page['label'] for page in pages if page['error']],
+        )
+        emit({"event": "mapped", **{key: summary[key] for key in ("sheets", "unassigned_pages", "unknown_codes", "failed_pages")}})
+
+        results = []
+        for code, sheet_pages in sheets.items():
+            if code in unknown_codes:
+                continue
+            student = students[code]
+            if student['id'] in online:
+                emit({"event": "skipped", "student_code": code, "student_id": student['id'],
+                      "reason": "Student already submitted this test online"})
+                continue
+            mapped = map_sheet_answers(sheet_pages, test['questions'])
+            answers = [
+                paper_answer(q, question, mapped[q]['text'], mapped[q]['page']['image']) if q in mapped
+                else {'question_index': q, 'answer_text': None, 'selected_option': None, 'match_pairs': None,
+                      'handwritten_image': None, 'ocr_text': None}
+                for q, question in enumerate(test['questions'])
+            ]
+            results.append({
+                'id': str(uuid.uuid4()),
+                'test_id': test_id,
+                'student_id': student['id'],
+                'school_id': student.get('school_id'),
+                'answers': answers,
+                'max_score': test['total_marks'],
+                'submitted_at': datetime.now(timezone.utc).isoformat(),
+                'evaluated': True,
+                'source': 'paper',
+                'answer_sheet_batch_id': batch_id,
+                'student_code': code,
+                'answered': len(mapped),
+            })
+
+        semaphore = asyncio.Semaphore(REGRADE_CONCURRENCY)
+        stored = 0
+        for start in range(0, len(results), REGRADE_BATCH_SIZE):
+            chunk = results[start:start + REGRADE_BATCH_SIZE]
+            for result, question_scores in zip(chunk, await regrade_batch(test, chunk, semaphore)):
+                result['question_scores'] = question_scores
+                result['total_score'] = float(sum(question_scores))
+            # Re-ingesting a sheet replaces its earlier paper result. The new results go in before
+            # the old ones (by id) come out, so a failure in between leaves both rather than neither;
+            # the next ingest of those sheets replaces both. The rollups follow each write.
+            replaced = await db.test_results.find(
+                {"test_id": test_id, "source": "paper", "student_id": {"$in": [r['student_id'] for r in chunk]}},
+                {"_id": 0, "id": 1, "student_id": 1, "school_id": 1, "total_score": 1, "max_score": 1, "submitted_at": 1},
+            ).to_list(None)
+            await db.test_results.insert_many([
+                {**{k: v for k, v in r.items() if k not in ('student_code', 'answered')}, 'answers': encode_answers(r['answers'])}
+                for r in chunk
+            ])
+            await update_trend_rollups([row for r in chunk for row in result_increments(r, test)])
+            if replaced:
+                await db.test_results.delete_many({"id": {"$in": [r['id'] for r in replaced]}})
+                await update_trend_rollups([row for r in replaced for row in result_increments(r, test, -1)])
+            stored += len(chunk)
+            incr_metric("answer_sheets.results", len(chunk))
+            for r in chunk:
+                emit({"event": "result", "student_code": r['student_code'], "student_id": r['student_id'],
+                      "result_id": r['id'], "answered": r['answered'], "total_score": r['total_score'],
+                      "max_score": r['max_score']})
+        if stored:
+            live_exam_hub.invalidate(test_id)
+
+        summary.update(results=stored, pages_per_minute=pages_per_minute(len(pages), started),
+                       seconds=round(time.perf_counter() - started, 2))
+        now = datetime.now(timezone.utc).isoformat()
+        await db.answer_sheet_batches.update_one(
+            {"id": batch_id}, {"$set": {**summary, "status": "completed", "completed_at": now, "updated_at": now}})
+        logger.info(f"Answer-sheet batch {batch_id}: {len(pages)} pages, {stored} results, "
+                    f"{summary['pages_per_minute']} pages/min")
+        emit({"event": "done", "batch_id": batch_id, **summary})
+    except Exception as e:
+        logger.error(f"Answer-sheet batch {batch_id} failed: {e}")
+        await db.answer_sheet_batches.update_one(
+            {"id": batch_id}, {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.now(timezone.utc).isoformat()}})
+        emit({"event": "error", "batch_id": batch_id, "detail": str(e)})
+
+@api_router.post("/tests/{test_id}/answer-sheets", dependencies=[Depends(rate_limit("bulk"))])
+async def ingest_answer_sheets(test_id: str, file: UploadFile = File(...), current_user: Dict = Depends(get_current_user)):
+    """
+    Grade a paper exam from scans: a PDF, a ZIP of page images/PDFs (pages in file-name
+    order), a multi-page TIFF or one image. Each student's sheet starts with a page showing
+    their student code; "Q<n>" at the start of a line marks where an answer begins (without
+    markers, each page answers the next short/long question).
+    Streams NDJSON progress: page, mapped, result / skipped, then done (or error). The batch
+    keeps running if the client disconnects; GET /answer-sheet-batches/{id} has its summary.
+    """
+    if current_user['role'] not in [UserRole.TEACHER, UserRole.SUPER_ADMIN]:
+        raise HTTPException(status_code=403, detail="Only teachers can upload answer sheets")
+    test = await get_test_doc(test_id)
+    if not test or not visible_to(test, current_user):
+        raise HTTPException(status_code=404, detail="Test not found")
+    if current_user['role'] == UserRole.TEACHER and test['created_by'] != current_user['user_id']:
+        raise HTTPException(status_code=403, detail="Only the test's author can upload its answer sheets")
+
+    contents = await file.read()
+    if len(contents) > ANSWER_SHEET_MAX_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"Upload is larger than {ANSWER_SHEET_MAX_MB} MB")
+    try:
+        pages = await asyncio.to_thread(split_scan_file, file.filename or '', contents)
+    except (ValueError, zipfile.BadZipFile) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not read file: {e}")
+    if not pages:
+        raise HTTPException(status_code=400, detail="No scanned pages found")
+    if len(pages) > ANSWER_SHEET_MAX_PAGES:
+        raise HTTPException(status_code=400, detail=f"At most {ANSWER_SHEET_MAX_PAGES} pages per upload")
+
+    now = datetime.now(timezone.utc).isoformat()
+    batch = {
+        'id': str(uuid.uuid4()),
+        'test_id': test_id,
+        'school_id': test.get('school_id'),
+        'filename': file.filename,
+        'status': 'running',
+        'pages': len(pages),
+        'pages_done': 0,
+        'created_by': current_user['user_id'],
+        'created_at': now,
+        'updated_at': now,
+    }
+    await db.answer_sheet_batches.insert_one(dict(batch))
+    events: asyncio.Queue = asyncio.Queue()
+    events.put_nowait({"event": "accepted", "batch_id": batch['id'], "pages": len(pages)})
+    spawn_background(run_answer_sheet_batch(batch, test, pages, events.put_nowait))
+
+    async def stream():
+        while True:
+            event = await events.get()
+            yield json.dumps(event) + "\n"
+            if event['event'] in ('done', 'error'):
+                return
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", headers={"X-Batch-Id": batch['id']})
+
+@api_router.get("/answer-sheet-batches/{batch_id}")
+async def get_answer_sheet_batch(batch_id: str, current_user: Dict = Depends(get_current_user)):
+    batch = await db.answer_sheet_batches.find_one({"id": batch_id}, {"_id": 0})
+    if not batch:
+        raise HTTPException(status_code=404, detail="Answer-sheet batch not found")
+    if current_user['role'] != UserRole.SUPER_ADMIN and batch['created_by'] != current_user['user_id']:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return batch
+
 # ============= ANALYTICS ROUTES =============
 
 @api_router.get("/analytics/student/{student_id}")
 async def get_student_analytics(student_id: str, current_user: Dict = Depends(get_current_user)):
-    # Use indexed query for performance
-    results = await db.test_results.find(
+    # Use indexed query for performance; analytics tolerate bounded staleness
+    results = await read_collection("test_results", "analytics").find(
         {"student_id": student_id}, 
         {"_id": 0, "total_score": 1, "max_score": 1}
     ).to_list(1000)
@@ -753,10 +4080,498 @@ async def get_student_analytics(student_id: str, current_user: Dict = Depends(ge
         "obtained_marks": round(obtained_marks, 2)
     }
 
+# ============= PERFORMANCE TRENDS =============
+
+# Pre-aggregated score buckets in `performance_rollups`, one document per (student) or
+# (school, class, subject) and period bucket: weeks start on Monday, months on the 1st and
+# terms on ACADEMIC_TERM_STARTS. Every write of a result $inc's its buckets, so a trend
+# reads a few bucket documents instead of scanning test_results; rebuild_trend_rollups()
+# recomputes them from the results after anything changed them outside these paths.
+
+def trend_bucket(moment: datetime, period: str) -> tuple:
+    """(bucket start as YYYY-MM-DD, label) of the period bucket containing `moment`"""
+    moment = moment.astimezone(timezone.utc)
+    if period == 'week':
+        start = (moment - timedelta(days=moment.weekday())).date()
+        year, week, _ = start.isocalendar()
+        return start.isoformat(), f"{year}-W{week:02d}"
+    if period == 'month':
+        return moment.date().replace(day=1).isoformat(), moment.strftime('%Y-%m')
+    year, term = academic_term(moment)
+    return academic_term_starts(year)[term - 1].date().isoformat(), f"{year}-T{term}"
+
+def result_percent(total_score: float, max_score: Optional[float]) -> float:
+    return min(max(total_score / max_score * 100, 0.0), 100.0) if max_score else 0.0
+
+def rollup_increments(result: Dict[str, Any], test: Dict[str, Any], tests: int, obtained: float,
+                      max_marks: float, percent: float) -> List[tuple]:
+    """(bucket id, bucket fields, increments) adding (tests, obtained, max_marks, percent) to every
+    bucket of the result: its student's and its class+subject's, for each of TREND_PERIODS"""
+    moment = datetime.fromisoformat(result['submitted_at'])
+    school_id = result.get('school_id')
+    scopes = [
+        ("student", {"student_id": result['student_id']}),
+        ("class", {"class_name": test.get('class_name'), "subject_id": test.get('subject_id')}),
+    ]
+    increments = {"tests": tests, "obtained": obtained, "max_marks": max_marks, "percent_sum": percent}
+    rows = []
+    for period in TREND_PERIODS:
+        bucket_start, label = trend_bucket(moment, period)
+        for scope, fields in scopes:
+            key = ':'.join([scope, school_id or '-', *(str(v) for v in fields.values()), period, bucket_start])
+            rows.append((key, {"scope": scope, "school_id": school_id, **fields, "period": period,
+                               "bucket_start": bucket_start, "label": label}, increments))
+    return rows
+
+def result_increments(result: Dict[str, Any], test: Dict[str, Any], sign: int = 1) -> List[tuple]:
+    """Add (sign=1) or remove (sign=-1) a stored result from its buckets"""
+    total, max_score = result.get('total_score', 0.0), result.get('max_score') or 0
+    return rollup_increments(result, test, sign, sign * total, sign * max_score,
+                             sign * result_percent(total, max_score))
+
+async def update_trend_rollups(increments: List[tuple]):
+    """Apply rollup increments as $inc upserts; a failure only leaves the trends stale (until a
+    rebuild), so it never fails the write of the result itself"""
+    if not increments:
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    try:
+        await db.performance_rollups.bulk_write([
+            UpdateOne({"id": key}, {"$inc": inc, "$set": {"updated_at": now}, "$setOnInsert": fields}, upsert=True)
+            for key, fields, inc in increments
+        ], ordered=False)
+        incr_metric("trends.rollup_updates", len(increments))
+    except Exception as e:
+        incr_metric("trends.rollup_errors")
+        logger.error(f"Trend rollup update failed, rebuild to repair: {e}")
+
+async def rebuild_trend_rollups(school_id: Optional[str] = None, since: Optional[datetime] = None,
+                                batch_size: int = 5000) -> Dict[str, int]:
+    """
+    Recompute one school's buckets (school_id None = results without a school) from
+    test_results: all of them, or those starting on/after the earliest bucket that contains
+    `since`. Buckets are replaced in place and ones no longer backed by a result deleted, so
+    trends stay readable meanwhile; submissions during the rebuild may be counted twice or
+    not at all, so run it outside exam hours.
+    """
+    floor = min(trend_bucket(since, period)[0] for period in TREND_PERIODS) if since else None
+    query: Dict[str, Any] = {"school_id": school_id}
+    if floor:
+        query['submitted_at'] = {"$gte": floor}
+    tests: Dict[str, Dict[str, Any]] = {}
+    buckets: Dict[str, Dict[str, Any]] = {}
+    results = 0
+    cursor = db.test_results.find(query, {
+        "_id": 0, "test_id": 1, "student_id": 1, "school_id": 1, "total_score": 1, "max_score": 1, "submitted_at": 1,
+    }).batch_size(batch_size)
+    async for result in cursor:
+        if result['test_id'] not in tests:
+            tests[result['test_id']] = await db.tests.find_one(
+                {"id": result['test_id']}, {"_id": 0, "class_name": 1, "subject_id": 1}) or {}
+        results += 1
+        for key, fields, inc in result_increments(result, tests[result['test_id']]):
+            bucket = buckets.setdefault(key, {"id": key, **fields, "tests": 0, "obtained": 0.0,
+                                              "max_marks": 0.0, "percent_sum": 0.0})
+            for field, amount in inc.items():
+                bucket[field] += amount
+
+    rebuilt_at = datetime.now(timezone.utc).isoformat()
+    scope: Dict[str, Any] = {"school_id": school_id}
+    if floor:
+        scope['bucket_start'] = {"$gte": floor}
+    docs = list(buckets.values())
+    for start in range(0, len(docs), batch_size):
+        await db.performance_rollups.bulk_write([
+            ReplaceOne({"id": doc['id']}, {**doc, "updated_at": rebuilt_at, "rebuilt_at": rebuilt_at}, upsert=True)
+            for doc in docs[start:start + batch_size]
+        ], ordered=False)
+    removed = await db.performance_rollups.delete_many({**scope, "rebuilt_at": {"$ne": rebuilt_at}})
+    incr_metric("trends.rebuilds")
+    return {"results": results, "buckets": len(docs), "removed": removed.deleted_count}
+
+async def rebuild_all_trend_rollups(since: Optional[datetime] = None) -> Dict[str, Any]:
+    """rebuild_trend_rollups() for every school and the unscoped results"""
+    report: Dict[str, Any] = {}
+
+    async def rebuild_database():
+        # Under SCHOOL_LAYOUT=database a school's database holds only that school's results
+        school_ids = [current_school.get()] if SCHOOL_LAYOUT == 'database' else [None, *await known_school_ids()]
+        for school_id in school_ids:
+            report[school_id or '-'] = await rebuild_trend_rollups(school_id, since)
+
+    await across_schools(rebuild_database)
+    return report
+
+def trend_points(buckets: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Bucket documents -> chart points, oldest first"""
+    return [{
+        "bucket_start": b['bucket_start'],
+        "label": b['label'],
+        "tests": b['tests'],
+        "percent": round(b['obtained'] / b['max_marks'] * 100, 2) if b['max_marks'] else 0,
+        "average_percent": round(b['percent_sum'] / b['tests'], 2) if b['tests'] else 0,
+        "obtained_marks": round(b['obtained'], 2),
+        "total_marks": b['max_marks'],
+    } for b in sorted(buckets, key=lambda b: b['bucket_start']) if b['tests'] > 0]
+
+def check_trend_period(period: str, limit: int) -> int:
+    if period not in TREND_PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(TREND_PERIODS)}")
+    return min(max(limit, 1), TREND_MAX_BUCKETS)
+
+@api_router.get("/trends/student/{student_id}")
+async def get_student_trend(student_id: str, period: str = "week", limit: int = 12,
+                            current_user: Dict = Depends(get_current_user)):
+    """A student's score per week/month/term, the latest `limit` buckets, oldest first"""
+    if current_user['role'] == UserRole.STUDENT and current_user['user_id'] != student_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    limit = check_trend_period(period, limit)
+    buckets = await read_collection("performance_rollups", "analytics").find(
+        {"student_id": student_id, "period": period}, {"_id": 0}
+    ).sort("bucket_start", -1).limit(limit).to_list(limit)
+    return {"student_id": student_id, "period": period, "points": trend_points(buckets)}
+
+@api_router.get("/trends/class")
+async def get_class_trend(class_name: str, subject_id: Optional[str] = None, period: str = "week",
+                          limit: int = 12, school: Optional[str] = None,
+                          current_user: Dict = Depends(get_current_user)):
+    """Class averages per week/month/term for one subject, or for each of the class's subjects"""
+    if current_user['role'] not in [UserRole.TEACHER, UserRole.SUPER_ADMIN]:
+        raise HTTPException(status_code=403, detail="Only teachers can view class trends")
+    limit = check_trend_period(period, limit)
+    school_id = current_user.get('school_id')
+    if current_user['role'] == UserRole.SUPER_ADMIN and school:
+        school_id = await resolve_school(school)
+        current_school.set(school_id)
+    query: Dict[str, Any] = {"scope": "class", "school_id": school_id, "class_name": class_name, "period": period}
+    if subject_id:
+        query['subject_id'] = subject_id
+    by_subject: Dict[str, List[Dict[str, Any]]] = {}
+    async for bucket in read_collection("performance_rollups", "analytics").find(query, {"_id": 0}).sort("bucket_start", -1):
+        subject_buckets = by_subject.setdefault(bucket['subject_id'], [])
+        if len(subject_buckets) < limit:
+            subject_buckets.append(bucket)
+    return {
+        "class_name": class_name, "period": period,
+        "subjects": [{"subject_id": sid, "points": trend_points(buckets)} for sid, buckets in by_subject.items()],
+    }
+
+@api_router.post("/admin/trends/rebuild", dependencies=[Depends(get_super_admin), Depends(rate_limit("bulk"))])
+async def rebuild_trends(since: Optional[str] = None):
+    """Recompute the trend buckets from test_results (all, or from the buckets containing `since`)"""
+    try:
+        since_moment = parse_schedule(since) if since else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="since must be an ISO 8601 date")
+    return await rebuild_all_trend_rollups(since_moment)
+
+# ============= ITEM ANALYSIS =============
+
+def answer_matrix(rows: List[Optional[list]], width: int):
+    """Ragged per-result value lists -> (results x questions) object matrix, None-padded"""
+    import numpy as np
+
+    if all(row is not None and len(row) == width for row in rows):
+        flat = itertools.chain.from_iterable(rows)
+        return np.fromiter(flat, dtype=object, count=len(rows) * width).reshape(len(rows), width)
+    matrix = np.full((len(rows), width), None, dtype=object)
+    for i, row in enumerate(rows):
+        row = (row or [])[:width]
+        matrix[i, :len(row)] = row
+    return matrix
+
+def answer_values(field: str) -> Dict[str, Any]:
+    """Aggregation expression: one answer field as an array aligned by position, from either
+    stored answer layout ($ifNull keeps gaps as null)"""
+    short = COMPACT_ANSWER_KEYS[field]
+    return {"$map": {"input": "$answers", "as": "a",
+                     "in": {"$ifNull": [f"$$a.{short}", {"$ifNull": [f"$$a.{field}", None]}]}}}
+
+ITEM_ANALYSIS_PROJECTION = {
+    "_id": 0, "id": 1, "archived": 1, "question_scores": 1,
+    "selected_option": answer_values('selected_option'),
+    "answer_text": answer_values('answer_text'),
+}
+
+def item_analysis(test: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Classical item statistics for one test on a students x items score matrix: difficulty
+    (mean fraction of marks), discrimination (upper minus lower 27% by total), corrected
+    item-total correlation, MCQ option frequencies and Cronbach's alpha. `results` carry
+    per-question `selected_option` / `answer_text` lists (see ITEM_ANALYSIS_PROJECTION).
+    MCQ and FILL_BLANK items are scored from the answers against the current key; other
+    items use the stored `question_scores`, when every result has them. CPU-bound; run it
+    in a thread.
+    """
+    import numpy as np
+    import pandas as pd
+
+    questions = test['questions']
+    n = len(results)
+    if n == 0:
+        return {"test_id": test['id'], "submissions": 0, "scored_items": 0,
+                "cronbach_alpha": None, "mean_score": None, "items": []}
+    selected = answer_matrix([r.get('selected_option') for r in results], len(questions))
+    texts = answer_matrix([r.get('answer_text') for r in results], len(questions))
+    stored_scores = None
+    if all(len(r.get('question_scores') or []) == len(questions) for r in results):
+        stored_scores = np.array([r['question_scores'] for r in results], dtype=float).reshape(n, len(questions))
+
+    items, item_marks, scored_indexes, choices = [], [], [], {}
+    for q, question in enumerate(questions):
+        if question['question_type'] == QuestionType.MCQ:
+            options = question.get('options') or []
+            # Factorize, then map the few distinct values: -1 blank, len(options) not an option
+            codes, uniques = pd.factorize(selected[:, q])
+            position = {option: i for i, option in enumerate(options)}
+            lookup = np.array([position.get(value, len(options)) for value in uniques] + [-1], dtype=np.int64)
+            choices[q] = lookup[codes]
+            correct = np.array([value == question.get('correct_answer') for value in uniques] + [False])
+            items.append(correct[codes] * float(question['marks']))
+        elif question['question_type'] == QuestionType.FILL_BLANK:
+            expected = (question.get('correct_answer') or '').strip().lower()
+            codes, uniques = pd.factorize(texts[:, q])
+            correct = np.array([str(value).strip().lower() == expected for value in uniques] + [expected == ''])
+            items.append(correct[codes] * float(question['marks']))
+        elif stored_scores is not None:
+            items.append(stored_scores[:, q])
+        else:
+            continue
+        scored_indexes.append(q)
+        item_marks.append(float(question['marks']))
+
+    k = len(scored_indexes)
+    marks = np.array(item_marks)
+    scores = np.column_stack(items).astype(float) if k else np.zeros((n, k))
+    totals = scores.sum(axis=1)
+    group = max(1, int(round(n * 0.27)))
+    order = np.argsort(totals, kind='stable')
+    lower, upper = order[:group], order[n - group:]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        difficulty = scores.mean(axis=0) / marks
+        discrimination = (scores[upper].mean(axis=0) - scores[lower].mean(axis=0)) / marks
+        centered = scores - scores.mean(axis=0)
+        rest = totals[:, None] - scores
+        rest_centered = rest - rest.mean(axis=0)
+        item_total = (centered * rest_centered).sum(axis=0) / np.sqrt(
+            (centered ** 2).sum(axis=0) * (rest_centered ** 2).sum(axis=0))
+    total_variance = totals.var(ddof=1) if n > 1 else 0.0
+    alpha = None
+    if k > 1 and total_variance > 0:
+        alpha = float(k / (k - 1) * (1 - scores.var(axis=0, ddof=1).sum() / total_variance))
+
+    def stat(value) -> Optional[float]:
+        return None if value is None or not np.isfinite(value) else round(float(value), 4)
+
+    def option_frequencies(q: int) -> Dict[str, Any]:
+        options = questions[q].get('options') or []
+        bins = len(options) + 2  # blank, options..., other
+
+        def share(subset):
+            counts = np.bincount(choices[q][subset] + 1, minlength=bins)
+            return counts, counts / max(len(subset), 1)
+
+        counts, fractions = share(np.arange(n))
+        _, upper_fractions = share(upper)
+        _, lower_fractions = share(lower)
+        return {
+            "options": [{
+                "option": option,
+                "correct": option == questions[q].get('correct_answer'),
+                "count": int(counts[i + 1]),
+                "fraction": stat(fractions[i + 1]),
+                "upper_fraction": stat(upper_fractions[i + 1]),
+                "lower_fraction": stat(lower_fractions[i + 1]),
+            } for i, option in enumerate(options)],
+            "blank": int(counts[0]),
+            "other": int(counts[-1]),
+        }
+
+    column_of = {q: j for j, q in enumerate(scored_indexes)}
+    report = []
+    for q, question in enumerate(questions):
+        entry = {"question_index": q, "question_type": question['question_type'],
+                 "marks": question['marks'], "scored": q in column_of}
+        if q in column_of:
+            j = column_of[q]
+            entry.update({
+                "difficulty": stat(difficulty[j]),
+                "discrimination": stat(discrimination[j]),
+                "item_total_correlation": stat(item_total[j]),
+            })
+        if q in choices:
+            entry.update(option_frequencies(q))
+        report.append(entry)
+
+    return {
+        "test_id": test['id'],
+        "submissions": n,
+        "scored_items": k,
+        "cronbach_alpha": stat(alpha),
+        "mean_score": stat(totals.mean()),
+        "items": report,
+    }
+
+# test_id -> (fingerprint, report); a new submission changes the fingerprint
+item_analysis_cache = LRUCache(ITEM_ANALYSIS_CACHE_SIZE)
+
+@api_router.get("/analytics/tests/{test_id}/items")
+async def get_item_analysis(test_id: str, current_user: Dict = Depends(get_current_user)):
+    """Per-question statistics for a test - its author or a Super Admin"""
+    if current_user['role'] not in [UserRole.TEACHER, UserRole.SUPER_ADMIN]:
+        raise HTTPException(status_code=403, detail="Only teachers can view item analysis")
+    test = await db.tests.find_one({"id": test_id}, {"_id": 0})
+    if not test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    if current_user['role'] == UserRole.TEACHER and test['created_by'] != current_user['user_id']:
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    results = read_collection("test_results", "analytics")
+    submissions = await results.count_documents({"test_id": test_id})
+    latest = await results.find_one(
+        {"test_id": test_id}, {"_id": 0, "submitted_at": 1}, sort=[("submitted_at", DESCENDING)]
+    )
+    last_regrade = await db.regrade_jobs.find_one(
+        {"test_id": test_id}, {"_id": 0, "updated_at": 1}, sort=[("created_at", DESCENDING)]
+    )
+    # Answer key and re-grades are part of the fingerprint: both change the item scores. Every
+    # new result (a submission, or a paper result replacing another one) moves the latest
+    # submitted_at, even when the count stays the same.
+    fingerprint = (
+        submissions,
+        (latest or {}).get('submitted_at'),
+        hashlib.sha256(json.dumps(test['questions'], sort_keys=True).encode()).hexdigest(),
+        (last_regrade or {}).get('updated_at'),
+    )
+    cached = item_analysis_cache.get(test_id)
+    if cached and cached[0] == fingerprint:
+        incr_metric("item_analysis.cache_hit")
+        return cached[1]
+
+    incr_metric("item_analysis.cache_miss")
+    docs = await results.aggregate([
+        {"$match": {"test_id": test_id}},
+        {"$project": ITEM_ANALYSIS_PROJECTION},
+    ]).to_list(None)
+    archived = {doc['id']: doc for doc in docs if doc.get('archived')}
+    for doc in await hydrate_archived([{"id": i, "archived": d['archived']} for i, d in archived.items()]):
+        archived[doc['id']].update(
+            selected_option=[a.get('selected_option') for a in doc['answers']],
+            answer_text=[a.get('answer_text') for a in doc['answers']],
+        )
+    report = await asyncio.to_thread(item_analysis, test, docs)
+    item_analysis_cache.set(test_id, (fingerprint, report))
+    return report
+
+# ============= PARENT ROUTES =============
+
+def child_summary_pipeline(student_ids: List[str], recent: int) -> List[Dict[str, Any]]:
+    """Per student: result count, marks and the `recent` latest results. $topN keeps only those
+    while grouping (MongoDB 5.2+); it rejects n=0, so recent=0 leaves the results out."""
+    group: Dict[str, Any] = {
+        "_id": "$student_id",
+        "total_tests": {"$sum": 1},
+        "total_marks": {"$sum": "$max_score"},
+        "obtained_marks": {"$sum": "$total_score"},
+    }
+    if recent > 0:
+        group["recent_results"] = {"$topN": {
+            "n": recent,
+            "sortBy": {"submitted_at": -1},
+            "output": {
+                "id": "$id",
+                "test_id": "$test_id",
+                "total_score": "$total_score",
+                "max_score": "$max_score",
+                "submitted_at": "$submitted_at"
+            }
+        }}
+    return [
+        {"$match": {"student_id": {"$in": student_ids}}},
+        {"$group": group},
+    ]
+
+async def child_result_summaries(student_ids: List[str], recent: int) -> List[Dict[str, Any]]:
+    return await read_collection("test_results", "analytics").aggregate(
+        child_summary_pipeline(student_ids, recent)
+    ).to_list(None)
+
+@api_router.get("/parent/dashboard")
+async def get_parent_dashboard(recent: int = 5, current_user: Dict = Depends(get_current_user)):
+    """All linked children with their analytics and recent results, in one round-trip"""
+    if current_user['role'] != UserRole.PARENT:
+        raise HTTPException(status_code=403, detail="Only parents can access the parent dashboard")
+    recent = min(max(recent, 0), 50)
+
+    parent = await db.users.find_one({"id": current_user['user_id']}, {"_id": 0, "email": 1})
+    # Linked by the unique email only: parent_mobile is unverified free text that any
+    # parent account could also claim
+    children = await db.users.find(
+        {"parent_email": parent['email'], "role": UserRole.STUDENT},
+        {"_id": 0, "id": 1, "name": 1, "nickname": 1, "class_name": 1, "section": 1,
+         "school": 1, "school_id": 1, "student_code": 1}
+    ).to_list(100)
+    if not children:
+        return {"children": []}
+
+    # One aggregation over all children's results instead of two requests per child
+    # (one per school when each school has its own database)
+    by_school: Dict[Optional[str], List[str]] = {}
+    for child in children:
+        school_id = child.get('school_id') if SCHOOL_LAYOUT == 'database' else None
+        by_school.setdefault(school_id, []).append(child['id'])
+    summaries = []
+    for school_id, student_ids in by_school.items():
+        if SCHOOL_LAYOUT == 'database':
+            current_school.set(school_id)
+        summaries += await child_result_summaries(student_ids, recent)
+    by_student = {summary['_id']: summary for summary in summaries}
+
+    response = []
+    for child in children:
+        summary = by_student.get(child['id'], {})
+        total_marks = summary.get('total_marks', 0)
+        obtained_marks = summary.get('obtained_marks', 0)
+        response.append({
+            "student": child,
+            "total_tests": summary.get('total_tests', 0),
+            "average_score": round(obtained_marks / total_marks * 100, 2) if total_marks > 0 else 0,
+            "total_marks": total_marks,
+            "obtained_marks": round(obtained_marks, 2),
+            "recent_results": summary.get('recent_results', [])
+        })
+    return {"children": response}
+
 @api_router.get("/")
 async def root():
     return {"message": "Educational Examination Platform API - Production Ready", "version": "2.0"}
 
+@api_router.get("/health")
+async def health():
+    """Liveness probe; also reports how long this worker took to import and become ready"""
+    return {"status": "ok", "startup": STARTUP_TIMINGS}
+
+@api_router.get("/health/ready")
+async def readiness():
+    """Readiness probe: startup hooks finished and MongoDB reachable from this worker"""
+    if client is None or 'ready_ms' not in STARTUP_TIMINGS:
+        raise HTTPException(status_code=503, detail="Worker is still starting")
+    try:
+        await client.admin.command('ping')
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"MongoDB unavailable: {str(e)}")
+    return {
+        "status": "ready",
+        "pid": os.getpid(),
+        "mongo_pool": {
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "min_pool_size": MONGO_MIN_POOL_SIZE,
+            "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            "compressors": MONGO_COMPRESSORS or None,
+        }
+    }
+
 # Include router
 app.include_router(api_router)
 
@@ -766,8 +4581,23 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    # Readable by the frontend: 429 back-off and trace ids for bug reports
+    expose_headers=["Retry-After", "X-Trace-Id", "traceparent"],
 )
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
+    global _process_pool
+    if client is not None:
+        client.close()
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+STARTUP_TIMINGS['import_ms'] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 2)
+
+# Registered last so it runs after every other startup handler
+@app.on_event("startup")
+async def record_ready_time():
+    STARTUP_TIMINGS['ready_ms'] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 2)
+    logger.info(f"Worker ready: import {STARTUP_TIMINGS['import_ms']}ms, ready {STARTUP_TIMINGS['ready_ms']}ms")
@@ -0,0 +1,120 @@
+"""
+Summarize exported traces (TRACE_EXPORT=file), or stand in for an OTLP/HTTP collector.
+
+The report gives per-span-name latency (count, p50, p95, max, errors) across all traces, and
+the span tree of the slowest traces, e.g. to see whether a slow submit_test was OCR, LLM
+grading, the test lookup or the insert.
+
+--serve runs a minimal collector on 127.0.0.1: point TRACE_EXPORT=otlp /
+TRACE_OTLP_ENDPOINT=http://127.0.0.1:4318/v1/traces at it and it appends every export
+to the traces file, in the same format as TRACE_EXPORT=file.
+
+Usage:
+    python trace_report.py traces/traces.jsonl --name "POST /api/tests/{test_id}/submit" --slowest 5
+    python trace_report.py traces/traces.jsonl --serve 4318
+"""
+import argparse
+import json
+import math
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+def load_spans(path: Path) -> list:
+    spans = []
+    for line in path.read_text().splitlines():
+        if not line.strip():
+            continue
+        for resource in json.loads(line).get('resourceSpans', []):
+            for scope in resource.get('scopeSpans', []):
+                spans.extend(scope.get('spans', []))
+    return spans
+
+def duration_ms(span: dict) -> float:
+    return (int(span['endTimeUnixNano']) - int(span['startTimeUnixNano'])) / 1e6
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    # Nearest rank: the ceil(q * n)-th smallest value
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))]
+
+def stage_table(spans: list) -> list:
+    by_name = defaultdict(list)
+    errors = defaultdict(int)
+    for span in spans:
+        by_name[span['name']].append(duration_ms(span))
+        errors[span['name']] += span.get('status', {}).get('code') == 2
+    return sorted((
+        {"name": name, "count": len(values), "p50_ms": round(percentile(values, 0.5), 2),
+         "p95_ms": round(percentile(values, 0.95), 2), "max_ms": round(max(values), 2),
+         "total_ms": round(sum(values), 2), "errors": errors[name]}
+        for name, values in by_name.items()
+    ), key=lambda row: -row['total_ms'])
+
+def print_tree(spans: list):
+    ids = {span['spanId'] for span in spans}
+    children = defaultdict(list)
+    for span in spans:
+        children[span.get('parentSpanId') if span.get('parentSpanId') in ids else None].append(span)
+
+    def walk(parent, depth):
+        for span in sorted(children[parent], key=lambda s: int(s['startTimeUnixNano'])):
+            attributes = {a['key']: next(iter(a['value'].values())) for a in span.get('attributes', [])}
+            detail = ' '.join(f"{k}={v}" for k, v in attributes.items() if k != 'http.target')
+            error = f" ERROR {span['status'].get('message', '')}" if span.get('status', {}).get('code') == 2 else ''
+            print(f"  {'  ' * depth}{span['name']:<{44 - 2 * depth}} {duration_ms(span):9.2f}ms  {detail}{error}")
+            walk(span['spanId'], depth + 1)
+    walk(None, 0)
+
+def report(path: Path, name: str, slowest: int):
+    spans = load_spans(path)
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span['traceId']].append(span)
+    roots = [s for s in spans if s.get('kind') == 2 and (not name or s['name'] == name)]
+    keep = {root['traceId'] for root in roots}
+    print(f"{len(traces)} traces, {len(spans)} spans; {len(roots)} matching root spans\n")
+    print(f"{'span':<44} {'count':>7} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9} {'errors':>7}")
+    for row in stage_table([s for s in spans if s['traceId'] in keep]):
+        print(f"{row['name']:<44} {row['count']:>7} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['max_ms']:>9} {row['errors']:>7}")
+    for root in sorted(roots, key=duration_ms, reverse=True)[:slowest]:
+        print(f"\ntrace {root['traceId']} ({duration_ms(root):.2f}ms)")
+        print_tree(traces[root['traceId']])
+
+def serve(path: Path, port: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    class Collector(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                self.send_response(400)
+                self.end_headers()
+                return
+            with open(path, 'a') as f:
+                f.write(json.dumps(payload, separators=(',', ':')) + '\n')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(b'{}')
+
+    print(f"Collecting OTLP/JSON traces on http://127.0.0.1:{port}/v1/traces into {path}")
+    ThreadingHTTPServer(('127.0.0.1', port), Collector).serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', type=Path, help='traces file (OTLP/JSON, one export per line)')
+    parser.add_argument('--name', default='', help='only traces whose root span has this name')
+    parser.add_argument('--slowest', type=int, default=3, help='span trees of the N slowest traces')
+    parser.add_argument('--serve', type=int, metavar='PORT', help='run a stand-in OTLP/HTTP collector instead')
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.file, args.serve)
+    else:
+        report(args.file, args.name, args.slowest)
+
+if __name__ == '__main__':
+    main()
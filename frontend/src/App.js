@@ -21,6 +21,14 @@ export const api = axios.create({
   baseURL: API,
 });
 
+// WebSocket URL for an /api path; the token goes in the query string (browsers can't set headers)
+export const liveSocketUrl = (path) => {
+  const url = new URL(`${API}${path}`, window.location.href);
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:';
+  url.searchParams.set('token', localStorage.getItem('token') || '');
+  return url.toString();
+};
+
 api.interceptors.request.use((config) => {
   const token = localStorage.getItem('token');
   if (token) {
@@ -29,6 +37,20 @@ api.interceptors.request.use((config) => {
   return config;
 });
 
+// 429 = rate limited or the server is shedding load: wait as told by Retry-After, then retry
+const MAX_RATE_LIMIT_RETRIES = 3;
+api.interceptors.response.use(undefined, async (error) => {
+  const { config, response } = error;
+  if (!config || response?.status !== 429 || (config.rateLimitRetries || 0) >= MAX_RATE_LIMIT_RETRIES) {
+    throw error;
+  }
+  config.rateLimitRetries = (config.rateLimitRetries || 0) + 1;
+  const seconds = Number(response.headers['retry-after']) || 2 ** config.rateLimitRetries;
+  // Jitter so that a classroom of clients doesn't come back in the same second
+  await new Promise((resolve) => setTimeout(resolve, (seconds + Math.random()) * 1000));
+  return api(config);
+});
+
 function ProtectedRoute({ children, role }) {
   const token = localStorage.getItem('token');
   const userRole = localStorage.getItem('userRole');
@@ -9,8 +9,8 @@ import { motion } from 'framer-motion';
 
 export default function ParentDashboard({ user }) {
   const navigate = useNavigate();
-  const [analytics, setAnalytics] = useState(null);
-  const [results, setResults] = useState([]);
+  const [children, setChildren] = useState([]);
+  const [selected, setSelected] = useState(0);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -19,12 +19,9 @@ export default function ParentDashboard({ user }) {
 
   const fetchData = async () => {
     try {
-      const [analyticsRes, resultsRes] = await Promise.all([
-        api.get(`/analytics/student/${user?.id}`),
-        api.get(`/results/student/${user?.id}`)
-      ]);
-      setAnalytics(analyticsRes.data);
-      setResults(resultsRes.data);
+      // Every linked child's analytics and recent results in one request
+      const response = await api.get('/parent/dashboard', { params: { recent: 10 } });
+      setChildren(response.data.children);
     } catch (error) {
       toast.error('Failed to load data');
     } finally {
@@ -46,6 +43,10 @@ export default function ParentDashboard({ user }) {
     );
   }
 
+  const analytics = children[selected];
+  const results = analytics?.recent_results || [];
+  const child = analytics?.student;
+
   return (
     <div className="min-h-screen bg-gradient-to-br from-indigo-50 to-teal-50">
       <nav className="bg-white border-b border-slate-200">
@@ -67,6 +68,25 @@ export default function ParentDashboard({ user }) {
 
       <div className="px-4 md:px-8 py-8">
         <div className="max-w-7xl mx-auto">
+          {children.length === 0 && (
+            <p className="text-center text-slate-500 py-8" data-testid="no-children">
+              No students are linked to this parent account yet
+            </p>
+          )}
+          {children.length > 1 && (
+            <div className="flex flex-wrap gap-2 mb-6" data-testid="child-picker">
+              {children.map((entry, index) => (
+                <Button
+                  key={entry.student.id}
+                  variant={index === selected ? 'default' : 'outline'}
+                  onClick={() => setSelected(index)}
+                  data-testid={`child-${entry.student.id}`}
+                >
+                  {entry.student.nickname || entry.student.name}
+                </Button>
+              ))}
+            </div>
+          )}
           <div className="grid grid-cols-1 md:grid-cols-4 gap-6 mb-8">
             <motion.div
               initial={{ opacity: 0, y: 20 }}
@@ -136,7 +156,7 @@ export default function ParentDashboard({ user }) {
                 <p className="text-center text-slate-500 py-8">No test results yet</p>
               ) : (
                 <div className="space-y-4">
-                  {results.slice(0, 10).map((result) => (
+                  {results.map((result) => (
                     <motion.div
                       key={result.id}
                       initial={{ opacity: 0, x: -20 }}
@@ -145,8 +165,11 @@ export default function ParentDashboard({ user }) {
                       data-testid={`result-item-${result.id}`}
                     >
                       <div>
-                        <p className="font-semibold text-slate-900">Test ID: {result.test_id.slice(0, 8)}</p>
+                        <p className="font-semibold text-slate-900">
+                          {result.test_title || `Test ID: ${result.test_id.slice(0, 8)}`}
+                        </p>
                         <p className="text-sm text-slate-600">
+                          {result.subject_name && `${result.subject_name} • `}
                           {new Date(result.submitted_at).toLocaleDateString()}
                         </p>
                       </div>
@@ -173,19 +196,19 @@ export default function ParentDashboard({ user }) {
               <div className="grid grid-cols-1 md:grid-cols-2 gap-4">
                 <div>
                   <p className="text-sm text-slate-600">Name</p>
-                  <p className="font-semibold text-slate-900">{user?.name}</p>
+                  <p className="font-semibold text-slate-900">{child?.name}</p>
                 </div>
                 <div>
                   <p className="text-sm text-slate-600">Nickname</p>
-                  <p className="font-semibold text-slate-900">{user?.nickname}</p>
+                  <p className="font-semibold text-slate-900">{child?.nickname}</p>
                 </div>
                 <div>
                   <p className="text-sm text-slate-600">Class</p>
-                  <p className="font-semibold text-slate-900">{user?.class_name || 'N/A'}</p>
+                  <p className="font-semibold text-slate-900">{child?.class_name || 'N/A'}</p>
                 </div>
                 <div>
                   <p className="text-sm text-slate-600">Section</p>
-                  <p className="font-semibold text-slate-900">{user?.section || 'N/A'}</p>
+                  <p className="font-semibold text-slate-900">{child?.section || 'N/A'}</p>
                 </div>
               </div>
             </CardContent>
@@ -20,6 +20,10 @@ export default function SuperAdminDashboard({ user }) {
   const [userFilter, setUserFilter] = useState({ role: '', is_active: null });
   const [pagination, setPagination] = useState({ skip: 0, limit: 50 });
   const [totalUsers, setTotalUsers] = useState(0);
+  const [schools, setSchools] = useState([]);
+  const [school, setSchool] = useState('');
+  const [facets, setFacets] = useState(null);
+  const [bankFilter, setBankFilter] = useState({});
 
   useEffect(() => {
     if (user?.role !== 'super_admin') {
@@ -28,15 +32,18 @@ export default function SuperAdminDashboard({ user }) {
       return;
     }
     fetchData();
-  }, [user, pagination, userFilter]);
+  }, [user, pagination, userFilter, school]);
 
   const fetchData = async () => {
+    const schoolParam = school ? `school=${encodeURIComponent(school)}` : '';
     try {
-      const [statsRes, usersRes] = await Promise.all([
-        api.get('/admin/stats'),
-        api.get(`/admin/users?skip=${pagination.skip}&limit=${pagination.limit}${userFilter.role ? `&role=${userFilter.role}` : ''}${userFilter.is_active !== null ? `&is_active=${userFilter.is_active}` : ''}`)
+      const [statsRes, usersRes, schoolsRes] = await Promise.all([
+        api.get(`/admin/stats${schoolParam ? `?${schoolParam}` : ''}`),
+        api.get(`/admin/users?skip=${pagination.skip}&limit=${pagination.limit}${userFilter.role ? `&role=${userFilter.role}` : ''}${userFilter.is_active !== null ? `&is_active=${userFilter.is_active}` : ''}${schoolParam ? `&${schoolParam}` : ''}`),
+        api.get('/admin/schools')
       ]);
       setStats(statsRes.data);
+      setSchools(schoolsRes.data.schools);
       setUsers(usersRes.data.users);
       setTotalUsers(usersRes.data.total);
     } catch (error) {
@@ -110,15 +117,31 @@ export default function SuperAdminDashboard({ user }) {
     }
   };
 
-  const fetchMasterQuestions = async () => {
+  const fetchMasterQuestions = async (filter = bankFilter) => {
+    const params = new URLSearchParams({ ...filter, ...(school ? { school } : {}) });
     try {
-      const response = await api.get('/admin/questions/master-bank?limit=100');
-      setQuestions(response.data.questions);
+      const [questionsRes, facetsRes] = await Promise.all([
+        api.get(`/admin/questions/master-bank?limit=100&${params}`),
+        api.get(`/admin/questions/facets?${params}`)
+      ]);
+      setQuestions(questionsRes.data.questions);
+      setFacets(facetsRes.data);
     } catch (error) {
       toast.error('Failed to load master questions');
     }
   };
 
+  const toggleBankFilter = (facet, value) => {
+    const next = { ...bankFilter };
+    if (next[facet] === value) {
+      delete next[facet];
+    } else {
+      next[facet] = value;
+    }
+    setBankFilter(next);
+    fetchMasterQuestions(next);
+  };
+
   if (loading) {
     return (
       <div className="flex items-center justify-center min-h-screen">
@@ -174,6 +197,17 @@ export default function SuperAdminDashboard({ user }) {
                 {/* User Management Tab */}
                 <TabsContent value="users" className="space-y-4 mt-6">
                   <div className="flex gap-4 mb-4">
+                    <select
+                      className="px-4 py-2 border rounded-lg"
+                      value={school}
+                      onChange={(e) => { setSchool(e.target.value); setPagination({ ...pagination, skip: 0 }); }}
+                      data-testid="school-filter"
+                    >
+                      <option value="">All Schools</option>
+                      {schools.map((s) => (
+                        <option key={s.school_id} value={s.school_id}>{s.school || s.school_id}</option>
+                      ))}
+                    </select>
                     <select 
                       className="px-4 py-2 border rounded-lg"
                       value={userFilter.role}
@@ -262,9 +296,30 @@ export default function SuperAdminDashboard({ user }) {
 
                 {/* Master Question Bank Tab */}
                 <TabsContent value="questions" className="space-y-4 mt-6">
-                  <Button onClick={fetchMasterQuestions} data-testid="load-questions-btn">
+                  <Button onClick={() => fetchMasterQuestions()} data-testid="load-questions-btn">
                     Load Questions
                   </Button>
+
+                  {facets && (
+                    <div className="space-y-2" data-testid="question-facets">
+                      <p className="text-sm text-slate-600"><strong>{facets.total}</strong> questions match</p>
+                      {[['subject', 'Subject'], ['class_name', 'Class'], ['difficulty', 'Difficulty'], ['question_type', 'Type']].map(([facet, label]) => (
+                        <div key={facet} className="flex flex-wrap items-center gap-2">
+                          <span className="text-xs font-semibold text-slate-500 w-20">{label}</span>
+                          {facets.facets[facet].map(({ value, count }) => (
+                            <button
+                              key={String(value)}
+                              type="button"
+                              onClick={() => value !== null && toggleBankFilter(facet, value)}
+                              className={`px-2 py-1 rounded text-xs border ${bankFilter[facet] === value ? 'bg-indigo-600 text-white border-indigo-600' : 'bg-white text-slate-700'}`}
+                            >
+                              {value ?? 'unset'} ({count})
+                            </button>
+                          ))}
+                        </div>
+                      ))}
+                    </div>
+                  )}
                   
                   {questions.length > 0 ? (
                     <div className="space-y-3">
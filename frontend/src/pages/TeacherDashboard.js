@@ -1,17 +1,175 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Button } from '@/components/ui/button';
 import { Card, CardHeader, CardTitle, CardContent } from '@/components/ui/card';
-import { api } from '@/App';
+import { api, liveSocketUrl } from '@/App';
 import { toast } from 'sonner';
-import { Plus, BookOpen, LogOut, Users } from 'lucide-react';
+import { Plus, BookOpen, LogOut, Users, Radio, FileUp } from 'lucide-react';
 import { motion } from 'framer-motion';
 
+// Server closes with 1008 when the token or access is rejected; don't retry those
+const POLICY_VIOLATION = 1008;
+
+function LiveExamPanel({ testId }) {
+  const [live, setLive] = useState(null);
+  const [connected, setConnected] = useState(false);
+  const retryRef = useRef(0);
+
+  useEffect(() => {
+    let socket;
+    let timer;
+    let closed = false;
+
+    const connect = () => {
+      socket = new WebSocket(liveSocketUrl(`/tests/${testId}/live`));
+      socket.onopen = () => {
+        retryRef.current = 0;
+        setConnected(true);
+      };
+      socket.onmessage = (event) => setLive(JSON.parse(event.data));
+      socket.onclose = (event) => {
+        setConnected(false);
+        if (closed || event.code === POLICY_VIOLATION) return;
+        const delay = Math.min(1000 * 2 ** retryRef.current, 30000);
+        retryRef.current += 1;
+        timer = setTimeout(connect, delay);
+      };
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(timer);
+      socket?.close();
+    };
+  }, [testId]);
+
+  if (!live) {
+    return <p className="text-sm text-slate-500 mt-3">Connecting to live updates...</p>;
+  }
+
+  const peak = Math.max(1, ...live.distribution.map(b => b.count));
+
+  return (
+    <div className="mt-4 border-t border-slate-200 pt-4" data-testid={`live-panel-${testId}`}>
+      <div className="flex flex-wrap gap-6 text-sm mb-3">
+        <span><strong>{live.students_submitted}</strong> submitted</span>
+        <span><strong>{live.grading_in_progress}</strong> grading</span>
+        <span>Mean <strong>{live.mean_percent ?? '-'}{live.mean_percent != null && '%'}</strong></span>
+        {['pending', 'running'].includes(live.regrade?.status) && (
+          <span>Re-grading <strong>{live.regrade.percent}%</strong></span>
+        )}
+        <span className={connected ? 'text-teal-600' : 'text-slate-400'}>{connected ? 'Live' : 'Reconnecting...'}</span>
+      </div>
+      <div className="flex items-end gap-1 h-20">
+        {live.distribution.map((bin) => (
+          <div key={bin.from} className="flex-1 flex flex-col items-center justify-end h-full" title={`${bin.from}-${bin.to}%: ${bin.count}`}>
+            <div className="w-full bg-indigo-400 rounded-t" style={{ height: `${(bin.count / peak) * 100}%` }} />
+          </div>
+        ))}
+      </div>
+      <div className="flex justify-between text-xs text-slate-500 mt-1">
+        <span>0%</span>
+        <span>100%</span>
+      </div>
+    </div>
+  );
+}
+
+// Scanned paper sheets: the server streams NDJSON progress events while it OCRs and grades
+function AnswerSheetUpload({ testId }) {
+  const [progress, setProgress] = useState(null);
+  const [outcome, setOutcome] = useState({ results: 0, skipped: [], mapped: null, done: null });
+  const [uploading, setUploading] = useState(false);
+
+  const upload = async (file) => {
+    if (!file) return;
+    setUploading(true);
+    setProgress(null);
+    setOutcome({ results: 0, skipped: [], mapped: null, done: null });
+    const formData = new FormData();
+    formData.append('file', file);
+    try {
+      const response = await fetch(`${api.defaults.baseURL}/tests/${testId}/answer-sheets`, {
+        method: 'POST',
+        headers: { Authorization: `Bearer ${localStorage.getItem('token') || ''}` },
+        body: formData,
+      });
+      if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(error.detail || 'Upload failed');
+      }
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffered = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffered += value;
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        lines.filter(Boolean).map((line) => JSON.parse(line)).forEach((event) => {
+          if (event.event === 'accepted') setProgress({ pages_done: 0, pages_total: event.pages, pages_per_minute: 0 });
+          if (event.event === 'page') setProgress(event);
+          if (event.event === 'mapped') setOutcome((o) => ({ ...o, mapped: event }));
+          if (event.event === 'result') setOutcome((o) => ({ ...o, results: o.results + 1 }));
+          if (event.event === 'skipped') setOutcome((o) => ({ ...o, skipped: [...o.skipped, event.student_code] }));
+          if (event.event === 'done') {
+            setOutcome((o) => ({ ...o, done: event }));
+            toast.success(`Graded ${event.results} answer sheets`);
+          }
+          if (event.event === 'error') toast.error(event.detail);
+        });
+      }
+    } catch (error) {
+      toast.error(error.message);
+    } finally {
+      setUploading(false);
+    }
+  };
+
+  const unmatched = outcome.mapped
+    ? [...outcome.mapped.unknown_codes, ...outcome.mapped.unassigned_pages, ...outcome.mapped.failed_pages]
+    : [];
+
+  return (
+    <div className="mt-4 border-t border-slate-200 pt-4 space-y-2 text-sm" data-testid={`answer-sheets-${testId}`}>
+      <p className="text-slate-600">
+        Upload a PDF, ZIP or TIFF of scanned sheets. Each sheet starts with the student code; mark answers with Q1, Q2, ...
+      </p>
+      <input
+        type="file"
+        accept=".pdf,.zip,.tif,.tiff,image/*"
+        disabled={uploading}
+        onChange={(e) => upload(e.target.files[0])}
+        data-testid={`answer-sheets-input-${testId}`}
+      />
+      {progress && (
+        <p>
+          OCR <strong>{progress.pages_done}/{progress.pages_total}</strong> pages
+          {progress.pages_per_minute > 0 && <> • {progress.pages_per_minute} pages/min</>}
+        </p>
+      )}
+      {(outcome.results > 0 || outcome.done) && <p><strong>{outcome.results}</strong> results stored</p>}
+      {outcome.skipped.length > 0 && (
+        <p className="text-amber-600">Already submitted online: {outcome.skipped.join(', ')}</p>
+      )}
+      {unmatched.length > 0 && <p className="text-rose-600">Not matched: {unmatched.join(', ')}</p>}
+      {outcome.done && (
+        <p className="text-slate-500">
+          {outcome.done.pages} pages in {outcome.done.seconds}s ({outcome.done.pages_per_minute} pages/min)
+        </p>
+      )}
+    </div>
+  );
+}
+
 export default function TeacherDashboard({ user }) {
   const navigate = useNavigate();
   const [tests, setTests] = useState([]);
   const [subjects, setSubjects] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [liveTestId, setLiveTestId] = useState(null);
+  const [paperTestId, setPaperTestId] = useState(null);
 
   useEffect(() => {
     fetchData();
@@ -146,19 +304,43 @@ export default function TeacherDashboard({ user }) {
                       key={test.id}
                       initial={{ opacity: 0, x: -20 }}
                       animate={{ opacity: 1, x: 0 }}
-                      className="flex items-center justify-between p-4 bg-slate-50 rounded-lg"
+                      className="p-4 bg-slate-50 rounded-lg"
                       data-testid={`test-item-${test.id}`}
                     >
-                      <div>
-                        <h3 className="font-heading font-semibold text-slate-900">{test.title}</h3>
-                        <p className="text-sm text-slate-600">
-                          {test.test_type.replace('_', ' ')} • {test.class_name} • {test.questions.length} questions
-                        </p>
-                      </div>
-                      <div className="text-right">
-                        <p className="text-sm font-semibold text-slate-900">{test.total_marks} marks</p>
-                        <p className="text-sm text-slate-600">{test.duration_minutes} min</p>
+                      <div className="flex items-center justify-between">
+                        <div>
+                          <h3 className="font-heading font-semibold text-slate-900">{test.title}</h3>
+                          <p className="text-sm text-slate-600">
+                            {test.test_type.replace('_', ' ')} • {test.class_name} • {test.questions.length} questions
+                          </p>
+                        </div>
+                        <div className="flex items-center gap-4">
+                          <div className="text-right">
+                            <p className="text-sm font-semibold text-slate-900">{test.total_marks} marks</p>
+                            <p className="text-sm text-slate-600">{test.duration_minutes} min</p>
+                          </div>
+                          <Button
+                            variant={liveTestId === test.id ? 'default' : 'outline'}
+                            size="sm"
+                            onClick={() => setLiveTestId(liveTestId === test.id ? null : test.id)}
+                            data-testid={`live-btn-${test.id}`}
+                          >
+                            <Radio className="h-4 w-4 mr-2" />
+                            Live
+                          </Button>
+                          <Button
+                            variant={paperTestId === test.id ? 'default' : 'outline'}
+                            size="sm"
+                            onClick={() => setPaperTestId(paperTestId === test.id ? null : test.id)}
+                            data-testid={`paper-btn-${test.id}`}
+                          >
+                            <FileUp className="h-4 w-4 mr-2" />
+                            Paper
+                          </Button>
+                        </div>
                       </div>
+                      {liveTestId === test.id && <LiveExamPanel testId={test.id} />}
+                      {paperTestId === test.id && <AnswerSheetUpload testId={test.id} />}
                     </motion.div>
                   ))}
                 </div>
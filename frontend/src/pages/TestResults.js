@@ -10,16 +10,21 @@ import { motion } from 'framer-motion';
 export default function TestResults({ user }) {
   const navigate = useNavigate();
   const [results, setResults] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchResults();
   }, [user]);
 
-  const fetchResults = async () => {
+  const fetchResults = async (cursor = null) => {
     try {
-      const response = await api.get(`/results/student/${user?.id}`);
-      setResults(response.data);
+      const response = await api.get(`/results/student/${user?.id}/summary`, {
+        params: { limit: 20, ...(cursor && { cursor }) }
+      });
+      setResults(prev => (cursor ? [...prev, ...response.data.results] : response.data.results));
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       toast.error('Failed to load results');
     } finally {
@@ -27,6 +32,12 @@ export default function TestResults({ user }) {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchResults(nextCursor);
+    setLoadingMore(false);
+  };
+
   if (loading) {
     return (
       <div className="flex items-center justify-center min-h-screen">
@@ -64,6 +75,13 @@ export default function TestResults({ user }) {
                   {results.map((result, idx) => (
                     <ResultCard key={result.id} result={result} index={idx} />
                   ))}
+                  {nextCursor && (
+                    <div className="text-center pt-2">
+                      <Button variant="outline" onClick={loadMore} disabled={loadingMore} data-testid="load-more-btn">
+                        {loadingMore ? 'Loading...' : 'Load more'}
+                      </Button>
+                    </div>
+                  )}
                 </div>
               )}
             </CardContent>
@@ -76,9 +94,24 @@ export default function TestResults({ user }) {
 
 function ResultCard({ result, index }) {
   const [expanded, setExpanded] = useState(false);
+  const [answers, setAnswers] = useState(null);
   const percentage = (result.total_score / result.max_score) * 100;
   const passed = percentage >= 40;
 
+  // The list carries no answers; load them the first time the details are opened
+  const toggleDetails = async () => {
+    if (!expanded && answers === null) {
+      try {
+        const response = await api.get(`/results/${result.id}`);
+        setAnswers(response.data.answers);
+      } catch (error) {
+        toast.error('Failed to load answers');
+        return;
+      }
+    }
+    setExpanded(!expanded);
+  };
+
   return (
     <motion.div
       initial={{ opacity: 0, y: 20 }}
@@ -91,7 +124,7 @@ function ResultCard({ result, index }) {
         <div className="flex-1">
           <div className="flex items-center gap-3 mb-2">
             <h3 className="font-heading font-semibold text-lg text-slate-900">
-              Test ID: {result.test_id.slice(0, 8)}
+              {result.test_title || `Test ID: ${result.test_id.slice(0, 8)}`}
             </h3>
             {passed ? (
               <span className="px-3 py-1 bg-teal-100 text-teal-700 text-xs font-semibold rounded-full flex items-center gap-1">
@@ -105,6 +138,11 @@ function ResultCard({ result, index }) {
               </span>
             )}
           </div>
+          {result.subject_name && (
+            <p className="text-sm text-slate-600">
+              {result.subject_name} • {result.test_type?.replace('_', ' ')}
+            </p>
+          )}
           <p className="text-sm text-slate-600">
             Submitted: {new Date(result.submitted_at).toLocaleString()}
           </p>
@@ -125,7 +163,7 @@ function ResultCard({ result, index }) {
         <Button
           variant="ghost"
           size="sm"
-          onClick={() => setExpanded(!expanded)}
+          onClick={toggleDetails}
           data-testid={`toggle-details-${result.id}`}
           className="text-indigo-600 hover:text-indigo-700"
         >
@@ -142,7 +180,7 @@ function ResultCard({ result, index }) {
         >
           <h4 className="font-heading font-semibold text-slate-900 mb-3">Answer Details</h4>
           <div className="space-y-3">
-            {result.answers.map((answer, idx) => (
+            {answers.map((answer, idx) => (
               <div key={idx} className="bg-slate-50 rounded-lg p-4">
                 <p className="text-sm font-semibold text-slate-900 mb-2">Question {idx + 1}</p>
                 {answer.selected_option && (
@@ -0,0 +1,30 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# server.py refuses to import without these; the tests never talk to a real deployment
+os.environ.setdefault('JWT_SECRET', 'test-only-secret-' + 'x' * 32)
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+import server  # noqa: E402
+
+@pytest.fixture
+def run():
+    """Run a coroutine to completion on a fresh event loop"""
+    return asyncio.run
+
+@pytest.fixture
+def mongo(monkeypatch):
+    """server.db backed by the in-memory Mongo stand-in"""
+    from mongomock.collection import Collection
+    from mongomock_motor import AsyncMongoMockClient
+    from benchmark import find_and_modify_by_id
+    monkeypatch.setattr(Collection, '_find_and_modify', find_and_modify_by_id(Collection._find_and_modify))
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(server, 'client', client)
+    monkeypatch.setattr(server, 'db', client['test'])
+    return server.db
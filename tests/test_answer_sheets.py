@@ -0,0 +1,133 @@
+import zipfile
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+QUESTIONS = [
+    {'question_type': 'mcq', 'options': ['Paris', 'London', 'Rome']},
+    {'question_type': 'short'},
+    {'question_type': 'long'},
+    {'question_type': 'fill_blank'},
+]
+
+def page(text, label='p'):
+    return {'label': label, 'text': text, 'image': None, 'error': None}
+
+@pytest.mark.parametrize("line, code", [
+    ("Student code: STD1A2B3C4D", "STD1A2B3C4D"),
+    ("std 1a2b 3c4d", "STD1A2B3C4D"),
+    ("STD-O0I1-Z2S5", "STD00112255"),  # OCR letters read for digits
+])
+def test_find_student_code(line, code):
+    found, rest = server.find_student_code(f"Name: Asha\n{line}\nQ1 Paris")
+    assert found == code
+    assert rest == "Name: Asha\nQ1 Paris"
+
+def test_find_student_code_needs_a_hex_code():
+    text = "STDXXXXXXXX\nno code here"
+    assert server.find_student_code(text) == (None, text)
+
+def test_group_sheets_splits_on_codes():
+    pages = [page("cover page", 'p0'), page("STD00000001\nQ1 A", 'p1'), page("more answers", 'p2'),
+             page("STD00000002\nQ1 B", 'p3'), page("STD00000001\nlate page", 'p4')]
+    sheets, unassigned = server.group_sheets(pages)
+    assert [p['label'] for p in unassigned] == ['p0']
+    assert {code: [p['label'] for p in ps] for code, ps in sheets.items()} == {
+        'STD00000001': ['p1', 'p2', 'p4'], 'STD00000002': ['p3']}
+    assert pages[1]['text'] == "Q1 A"  # the code line is removed from the answer text
+
+def test_map_sheet_answers_with_markers_across_pages():
+    pages = [page("Q1) B\nQuestion 2: Water boils\n", 'p1'), page("at 100 C\nQ.3 Long answer", 'p2'), page("Q9 ignored")]
+    answers = server.map_sheet_answers(pages, QUESTIONS)
+    assert set(answers) == {0, 1, 2}
+    assert answers[0]['text'] == 'B'
+    assert answers[1]['text'] == "Water boils\nat 100 C"
+    assert answers[1]['page']['label'] == 'p1'
+    # Q9 is out of range, so its text stays with Q3
+    assert answers[2]['text'] == "Long answer\nQ9 ignored"
+
+def test_map_sheet_answers_without_markers_is_one_page_per_written_question():
+    answers = server.map_sheet_answers([page(" first "), page("second"), page("extra")], QUESTIONS)
+    assert {q: a['text'] for q, a in answers.items()} == {1: 'first', 2: 'second'}
+
+@pytest.mark.parametrize("text, selected", [("b", 'London'), ("C)", 'Rome'), ("paris.", 'Paris'), ("D", None), ("Berlin", None)])
+def test_paper_answer_mcq(text, selected):
+    assert server.paper_answer(0, QUESTIONS[0], text, None)['selected_option'] == selected
+
+def test_paper_answer_written():
+    assert server.paper_answer(3, QUESTIONS[3], " photosynthesis \n", None)['answer_text'] == 'photosynthesis'
+    written = server.paper_answer(1, QUESTIONS[1], "Water boils", 'img')
+    assert written['answer_text'] is None and written['ocr_text'] == "Water boils" and written['handwritten_image'] == 'img'
+
+def test_split_scan_file_orders_zip_entries_naturally():
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name in ('page10.jpg', 'page2.jpg', '.DS_Store', '__MACOSX/page2.jpg', 'notes.txt'):
+            archive.writestr(name, b'x')
+    pages = server.split_scan_file('sheets.zip', buffer.getvalue())
+    assert [p['label'] for p in pages] == ['page2.jpg', 'page10.jpg']
+
+def test_split_scan_file_rejects_other_files():
+    with pytest.raises(ValueError):
+        server.split_scan_file('sheets.docx', b'x')
+
+TEST = {'id': 't1', 'title': 'Paper', 'subject_id': 'sci', 'class_name': '10', 'total_marks': 4,
+        'questions': [{**q, 'marks': 1} for q in QUESTIONS]}
+
+async def ingest(mongo, monkeypatch, score):
+    async def graded(test, chunk, semaphore):
+        return [[score] * len(test['questions']) for _ in chunk]
+    monkeypatch.setattr(server, 'regrade_batch', graded)
+    events = []
+    batch = {'id': f'b{score}'}
+    await mongo.answer_sheet_batches.insert_one(dict(batch))
+    await server.run_answer_sheet_batch(batch, TEST, [page("STD00000001\nQ1 B", 'p1')], events.append)
+    return events
+
+async def seed_student(mongo):
+    await mongo.users.insert_one({'id': 's1', 'role': server.UserRole.STUDENT, 'student_code': 'STD00000001'})
+
+def test_reingest_replaces_the_paper_result(run, mongo, monkeypatch):
+    async def scenario():
+        await seed_student(mongo)
+        await ingest(mongo, monkeypatch, 0.5)
+        first = await mongo.test_results.find_one({'student_id': 's1'})
+        await ingest(mongo, monkeypatch, 1.0)
+        return first, await mongo.test_results.find({'student_id': 's1'}).to_list(None), \
+            await mongo.performance_rollups.find({'scope': 'student'}).to_list(None)
+    first, results, rollups = run(scenario())
+    [result] = results
+    assert result['id'] != first['id'] and result['total_score'] == 4.0
+    # the first result's increments were taken back out: one test's worth per bucket
+    assert rollups and all(b['tests'] == 1 and b['obtained'] == 4.0 for b in rollups)
+
+class FailingWrites:
+    """server.db whose test_results.<operation> fails, as if the connection dropped there"""
+    def __init__(self, db, operation):
+        self.db = db
+        self.operation = operation
+
+    def __getattr__(self, name):
+        collection = getattr(self.db, name)
+        if name != 'test_results':
+            return collection
+
+        async def fail(*args, **kwargs):
+            raise RuntimeError("connection lost")
+        methods = {attr: getattr(collection, attr) for attr in ('find', 'find_one', 'insert_many', 'delete_many', 'distinct')}
+        return SimpleNamespace(**{**methods, self.operation: fail})
+
+@pytest.mark.parametrize("operation, kept", [('insert_many', [2.0]), ('delete_many', [2.0, 4.0])])
+def test_reingest_failure_never_loses_the_old_result(run, mongo, monkeypatch, operation, kept):
+    async def scenario():
+        await seed_student(mongo)
+        await ingest(mongo, monkeypatch, 0.5)
+        monkeypatch.setattr(server, 'db', FailingWrites(mongo, operation))
+        events = await ingest(mongo, monkeypatch, 1.0)
+        return events, await mongo.test_results.find({'student_id': 's1'}).to_list(None)
+    events, results = run(scenario())
+    assert events[-1]['event'] == 'error'
+    assert sorted(r['total_score'] for r in results) == kept
@@ -0,0 +1,36 @@
+import base64
+
+import server
+
+def answer(i, **fields):
+    return {'question_index': i, 'answer_text': None, 'selected_option': None, 'match_pairs': None,
+            'handwritten_image': None, 'ocr_text': None, **fields}
+
+PHOTO = base64.b64encode(b'\xff\xd8jpeg bytes').decode('ascii')
+
+def test_encode_drops_nulls_and_shortens_keys():
+    encoded = server.encode_answers([answer(0, selected_option='Paris'), answer(1, answer_text='H2O', match_pairs={'a': 'b'})])
+    assert encoded == [{'i': 0, 'o': 'Paris'}, {'i': 1, 't': 'H2O', 'm': {'a': 'b'}}]
+
+def test_encode_stores_photos_as_bytes():
+    [entry] = server.encode_answers([answer(2, handwritten_image=PHOTO, ocr_text='text')])
+    assert entry == {'i': 2, 'h': b'\xff\xd8jpeg bytes', 'x': 'text'}
+
+def test_encode_keeps_non_canonical_base64_as_sent():
+    for image in ('data:image/jpeg;base64,' + PHOTO, 'not base64!', PHOTO.rstrip('=') + '\n'):
+        [entry] = server.encode_answers([answer(0, handwritten_image=image)])
+        assert entry['h'] == image
+
+def test_round_trip():
+    answers = [answer(0, selected_option='Paris'), answer(1, handwritten_image=PHOTO, ocr_text='x'), answer(2)]
+    assert server.decode_answers(server.encode_answers(answers)) == answers
+
+def test_decode_passes_old_layout_through():
+    old = [answer(0, answer_text='legacy', handwritten_image=PHOTO)]
+    assert server.decode_answers(old) == old
+
+def test_decode_result_in_place():
+    result = {'id': 'r1', 'answers': [{'i': 0, 't': 'a'}]}
+    assert server.decode_result(result) is result
+    assert result['answers'] == [answer(0, answer_text='a')]
+    assert server.decode_result({'id': 'r2'}) == {'id': 'r2'}
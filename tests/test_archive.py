@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import server
+
+UTC = timezone.utc
+
+@pytest.mark.parametrize("moment, expected", [
+    (datetime(2025, 4, 1, tzinfo=UTC), (2025, 1)),
+    (datetime(2025, 9, 30, 23, tzinfo=UTC), (2025, 1)),
+    (datetime(2025, 10, 1, tzinfo=UTC), (2025, 2)),
+    (datetime(2026, 3, 31, tzinfo=UTC), (2025, 2)),
+])
+def test_academic_term(moment, expected):
+    assert server.academic_term(moment) == expected
+
+def test_academic_term_with_a_term_starting_in_the_next_calendar_year(monkeypatch):
+    monkeypatch.setattr(server, 'ACADEMIC_TERM_STARTS', [(6, 1), (9, 1), (1, 5)])
+    assert [d.date().isoformat() for d in server.academic_term_starts(2025)] == ['2025-06-01', '2025-09-01', '2026-01-05']
+    assert server.academic_term(datetime(2026, 2, 1, tzinfo=UTC)) == (2025, 3)
+    assert server.academic_term(datetime(2026, 1, 4, tzinfo=UTC)) == (2025, 2)
+
+@pytest.mark.parametrize("keep, expected", [(1, '2025-10-01'), (2, '2025-04-01'), (3, '2024-10-01'), (0, '2025-10-01')])
+def test_archive_cutoff(keep, expected):
+    assert server.archive_cutoff(datetime(2026, 1, 10, tzinfo=UTC), keep).date().isoformat() == expected
+
+def test_archive_slug():
+    assert server.archive_slug("St. Mary's High/10") == "St._Mary_s_High_10"
+    assert server.archive_slug('') == 'unknown' and server.archive_slug('///') == 'unknown'
+
+def result(i, submitted_at, student_id='s1', test_id='t1'):
+    return {'id': f'r{i}', 'test_id': test_id, 'student_id': student_id, 'school_id': None, 'total_score': 1.0,
+            'max_score': 2, 'submitted_at': submitted_at,
+            'answers': server.encode_answers([{'question_index': 0, 'answer_text': f'answer {i}'}])}
+
+def test_archive_and_hydrate(run, mongo, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'ARCHIVE_DIR', tmp_path)
+    monkeypatch.setattr(server, 'SCHOOL_LAYOUT', 'shared')
+    results = [result(0, '2025-05-01T10:00:00+00:00'), result(1, '2025-11-01T10:00:00+00:00'),
+               result(2, '2025-05-02T10:00:00+00:00', student_id='s2', test_id='t2'),
+               result(3, '2026-05-01T10:00:00+00:00')]
+
+    async def scenario():
+        await mongo.tests.insert_many([{'id': 't1', 'class_name': '10'}, {'id': 't2', 'class_name': None}])
+        await mongo.users.insert_many([{'id': 's1', 'school': 'Green Valley'}, {'id': 's2', 'class_name': '9'}])
+        await mongo.test_results.insert_many([dict(r) for r in results])
+        stats = await server.archive_results(datetime(2026, 4, 1, tzinfo=UTC), batch_size=2)
+        again = await server.archive_results(datetime(2026, 4, 1, tzinfo=UTC))
+        stored = await mongo.test_results.find({}, {'_id': 0}).sort('id', 1).to_list(None)
+        hydrated = await server.hydrate_archived([dict(r) for r in stored])
+        return stats, again, stored, hydrated
+    stats, again, stored, hydrated = run(scenario())
+
+    assert stats['results'] == 3 and again == {}
+    assert [bool(r.get('archived')) for r in stored] == [True, True, True, False]
+    assert all('answers' not in r for r in stored[:3])
+    assert stored[0]['archived']['path'].startswith('school=Green_Valley/class=10/term=2025-T1/')
+    assert stored[1]['archived']['term'] == '2025-T2'
+    assert stored[2]['archived']['path'].startswith('school=unknown/class=9/')  # class from the student
+    assert [r['answers'][0]['answer_text'] for r in hydrated[:3]] == ['answer 0', 'answer 1', 'answer 2']
+    assert hydrated[3]['answers'] == results[3]['answers']  # hot results are left as they are
+
+def test_hydrate_with_a_missing_file_gives_empty_answers(run, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'ARCHIVE_DIR', tmp_path)
+    rows = [{'id': 'r1', 'archived': {'path': 'school=x/part-gone.parquet'}}]
+    assert run(server.hydrate_archived(rows))[0]['answers'] == []
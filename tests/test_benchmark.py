@@ -0,0 +1,55 @@
+import asyncio
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+
+import benchmark
+
+@pytest.mark.parametrize("pct, expected", [(0, 1), (50, 5), (95, 10), (99, 10), (100, 10)])
+def test_percentile_is_nearest_rank(pct, expected):
+    assert benchmark.percentile(list(range(1, 11)), pct) == expected
+
+def test_percentile_of_nothing():
+    assert benchmark.percentile([], 50) == 0.0
+
+def test_summarize():
+    summary = benchmark.summarize([30.0, 10.0, 20.0], errors=1, wall_seconds=0.5)
+    assert summary == {"requests": 3, "errors": 1, "wall_seconds": 0.5, "throughput_rps": 6.0, "mean_ms": 20.0,
+                       "p50_ms": 20.0, "p95_ms": 30.0, "p99_ms": 30.0, "max_ms": 30.0}
+    assert benchmark.summarize([], 0, 0)['throughput_rps'] == 0.0
+
+def test_run_scenario_counts_errors_and_rate_limits(run):
+    def call(status):
+        async def request():
+            if status is None:
+                raise ConnectionError("refused")
+            await asyncio.sleep(0)
+            return SimpleNamespace(status_code=status)
+        return request
+
+    result = run(benchmark.run_scenario("mixed", [call(200), call(201), call(429), call(500), call(None)], 2))
+    assert result['requests'] == 5
+    assert result['errors'] == 3
+    assert result['rate_limited'] == 1
+
+def test_sample_images_differ_per_variant():
+    assert benchmark.sample_image_base64(0) != benchmark.sample_image_base64(1)
+    assert benchmark.sample_image_base64(3) == benchmark.sample_image_base64(3)
+
+def test_sample_questions_csv_matches_the_bulk_upload_columns():
+    import pandas as pd
+
+    df = pd.read_csv(BytesIO(benchmark.sample_questions_csv(3)))
+    assert len(df) == 3
+    assert {'question_text', 'question_type', 'correct_answer', 'marks'} <= set(df.columns)
+    assert df.iloc[2]['options'] == "2,3,4,5"
+
+def test_compare_reports_relative_change(capsys):
+    scenario = {'throughput_rps': 100.0, 'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 0.0}
+    benchmark.compare({'meta': {'commit': 'aaa'}, 'scenarios': {'dashboard': scenario}},
+                      {'meta': {'commit': 'bbb'}, 'scenarios': {'dashboard': {**scenario, 'p50_ms': 15.0}, 'new': scenario}})
+    out = capsys.readouterr().out
+    assert "vs aaa -> bbb" in out
+    assert "p50_ms 10.0 -> 15.0 (+50.0%)" in out
+    assert "new" not in out
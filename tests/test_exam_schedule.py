@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+def scheduled(minutes_from_now, duration=30, **fields):
+    start = datetime.now(timezone.utc) + timedelta(minutes=minutes_from_now)
+    return {'id': 't1', 'scheduled_at': start.isoformat(), 'duration_minutes': duration, **fields}
+
+@pytest.mark.parametrize("value, expected", [
+    ('2025-05-14T09:00:00Z', datetime(2025, 5, 14, 9, tzinfo=timezone.utc)),
+    ('2025-05-14T09:00:00', datetime(2025, 5, 14, 9, tzinfo=timezone.utc)),
+    ('2025-05-14T14:30:00+05:30', datetime(2025, 5, 14, 9, tzinfo=timezone.utc)),
+])
+def test_parse_schedule(value, expected):
+    parsed = server.parse_schedule(value)
+    assert parsed == expected and parsed.tzinfo == timezone.utc
+
+def test_exam_window(monkeypatch):
+    monkeypatch.setattr(server, 'EXAM_GRACE_MINUTES', 5)
+    start, deadline = server.exam_window({'scheduled_at': '2025-05-14T09:00:00Z', 'duration_minutes': 45})
+    assert deadline - start == timedelta(minutes=50)
+    assert server.exam_window({'duration_minutes': 45}) is None
+    assert server.exam_window({'scheduled_at': 'next tuesday', 'duration_minutes': 45}) is None
+
+def test_check_exam_window(monkeypatch):
+    monkeypatch.setattr(server, 'EXAM_WINDOW_ENFORCED', True)
+    monkeypatch.setattr(server, 'EXAM_GRACE_MINUTES', 5)
+    with pytest.raises(HTTPException, match="not started"):
+        server.check_exam_window(scheduled(10), submitting=False)
+    server.check_exam_window(scheduled(-20), submitting=True)          # running
+    server.check_exam_window(scheduled(-33), submitting=True)          # in the grace period
+    server.check_exam_window(scheduled(-60), submitting=False)         # can still be viewed
+    with pytest.raises(HTTPException, match="closed"):
+        server.check_exam_window(scheduled(-60), submitting=True)
+    server.check_exam_window({'id': 'unscheduled'}, submitting=True)
+    monkeypatch.setattr(server, 'EXAM_WINDOW_ENFORCED', False)
+    server.check_exam_window(scheduled(10), submitting=True)
+
+def test_prewarmed_test_is_served_until_its_window_closes(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'prewarmed_tests', {})
+
+    async def pool():
+        return 1
+    monkeypatch.setattr(server, 'prewarm_process_pool', pool)
+    running = scheduled(-5, class_name='10', school_id='s', questions=[
+        {'question_type': 'short', 'correct_answer': 'Water boils at 100 C', 'marks': 2}])
+    later = {**scheduled(60, class_name='10', questions=[]), 'id': 't2'}
+    finished = {**scheduled(-120, class_name='10', questions=[]), 'id': 't3'}
+
+    async def scenario():
+        await mongo.tests.insert_many([dict(running), dict(later), dict(finished)])
+        await mongo.users.insert_one({'id': 'u1', 'role': server.UserRole.STUDENT, 'class_name': '10', 'school_id': 's'})
+        await server.prewarm_upcoming_tests()
+        warmed = set(server.prewarmed_tests)
+        await mongo.tests.delete_one({'id': 't1'})
+        served = await server.get_test_doc('t1')
+        server.prewarmed_tests['t1']['expires_at'] = datetime.now(timezone.utc) - timedelta(seconds=1)
+        return warmed, served, await server.get_test_doc('t1')
+    warmed, served, expired = run(scenario())
+    assert warmed == {'t1'}
+    assert served['id'] == 't1'
+    assert expired is None
@@ -0,0 +1,80 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import server
+
+def test_weak_etag_is_stable_per_body():
+    tag = server.weak_etag(b'{"a":1}')
+    assert tag.startswith('W/"') and tag == server.weak_etag(b'{"a":1}')
+    assert tag != server.weak_etag(b'{"a":2}')
+
+@pytest.mark.parametrize("header, matches", [
+    ('W/"abc"', True), ('"abc"', True), ('"x", W/"abc"', True), ('*', True), ('"abcd"', False), ('', False),
+])
+def test_etag_matches(header, matches):
+    assert server.etag_matches(header, 'W/"abc"') is matches
+
+def test_pick_encoding(monkeypatch):
+    monkeypatch.setattr(server, 'brotli_module', lambda: object())
+    assert server.pick_encoding('gzip, deflate, br') == 'br'
+    assert server.pick_encoding('gzip, br;q=0') == 'gzip'
+    assert server.pick_encoding('identity') is None
+    monkeypatch.setattr(server, 'brotli_module', lambda: None)
+    assert server.pick_encoding('br, GZIP') == 'gzip'
+
+BIG = {"rows": ["x" * 40] * 100}
+
+def client():
+    app = FastAPI()
+    app.middleware("http")(server.conditional_get_middleware)
+    app.get("/big")(lambda: BIG)
+    app.get("/small")(lambda: {"ok": True})
+    app.post("/big")(lambda: BIG)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+def test_middleware_etag_304_and_compression(run, monkeypatch):
+    monkeypatch.setattr(server, 'HTTP_ETAGS_ENABLED', True)
+    monkeypatch.setattr(server, 'brotli_module', lambda: None)
+
+    async def scenario():
+        async with client() as http:
+            first = await http.get("/big", headers={"Accept-Encoding": "gzip"})
+            again = await http.get("/big", headers={"If-None-Match": first.headers['etag']})
+            small = await http.get("/small", headers={"Accept-Encoding": "gzip"})
+            posted = await http.post("/big", headers={"Accept-Encoding": "gzip"})
+            return first, again, small, posted
+    first, again, small, posted = run(scenario())
+
+    assert first.headers['content-encoding'] == 'gzip'
+    assert first.json() == BIG  # httpx decodes the gzip body
+    assert first.headers['vary'] == 'Accept-Encoding'
+    assert first.headers['cache-control'] == 'private, no-cache'
+    assert again.status_code == 304 and again.content == b'' and again.headers['etag'] == first.headers['etag']
+    assert 'content-encoding' not in small.headers and 'etag' in small.headers  # under COMPRESS_MIN_BYTES
+    assert 'etag' not in posted.headers and 'content-encoding' not in posted.headers
+
+def test_middleware_without_etags(run, monkeypatch):
+    monkeypatch.setattr(server, 'HTTP_ETAGS_ENABLED', False)
+
+    async def scenario():
+        async with client() as http:
+            return await http.get("/big", headers={"Accept-Encoding": "identity"})
+    response = run(scenario())
+    assert 'etag' not in response.headers and response.json() == BIG
+
+def test_versioned_cache_invalidates_across_workers(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'REFERENCE_CACHE_CHECK_SECONDS', 0)
+    worker_a, worker_b = server.VersionedCache("subjects"), server.VersionedCache("subjects")
+    loads = []
+
+    async def load():
+        loads.append(1)
+        return len(loads)
+
+    async def scenario():
+        values = [await worker_a.get('k', load), await worker_b.get('k', load), await worker_a.get('k', load)]
+        await worker_b.invalidate()
+        values.append(await worker_a.get('k', load))
+        return values
+    assert run(scenario()) == [1, 2, 1, 3]
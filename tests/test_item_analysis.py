@@ -0,0 +1,95 @@
+import statistics
+
+import numpy as np
+import pytest
+
+import server
+
+TEST = {'id': 't1', 'questions': [
+    {'question_type': 'mcq', 'options': ['A', 'B', 'C'], 'correct_answer': 'B', 'marks': 1},
+    {'question_type': 'fill_blank', 'correct_answer': 'Paris', 'marks': 2},
+    {'question_type': 'short', 'correct_answer': 'x', 'marks': 3},
+]}
+
+# (selected option, fill-blank text, stored short-answer score) per student
+ANSWERS = [('B', 'paris', 3.0), ('B', 'Paris ', 2.0), ('A', 'Rome', 1.0), ('B', None, 0.0),
+           (None, 'paris', 3.0), ('C', 'Lyon', 0.0), ('Z', 'paris', 2.0)]
+
+def results():
+    return [{'selected_option': [option, None, None], 'answer_text': [None, text, None],
+             'question_scores': [0.0, 0.0, short]} for option, text, short in ANSWERS]
+
+def expected_scores():
+    return np.array([[float(o == 'B'), 2.0 * ((t or '').strip().lower() == 'paris'), s] for o, t, s in ANSWERS])
+
+def test_answer_matrix_pads_ragged_rows():
+    matrix = server.answer_matrix([['a', 'b'], None, ['c'], ['d', 'e', 'f']], 2)
+    assert matrix.tolist() == [['a', 'b'], [None, None], ['c', None], ['d', 'e']]
+    assert server.answer_matrix([[1, 2], [3, 4]], 2).tolist() == [[1, 2], [3, 4]]
+
+def test_item_statistics_match_their_definitions():
+    report = server.item_analysis(TEST, results())
+    scores = expected_scores()
+    totals = scores.sum(axis=1)
+    n, marks = len(ANSWERS), np.array([1.0, 2.0, 3.0])
+    assert report['submissions'] == n and report['scored_items'] == 3
+    assert report['mean_score'] == pytest.approx(totals.mean(), abs=1e-4)
+
+    order = np.argsort(totals, kind='stable')
+    group = round(n * 0.27)
+    for q, item in enumerate(report['items']):
+        column = scores[:, q]
+        assert item['difficulty'] == pytest.approx(column.mean() / marks[q], abs=1e-4)
+        upper, lower = column[order[n - group:]].mean(), column[order[:group]].mean()
+        assert item['discrimination'] == pytest.approx((upper - lower) / marks[q], abs=1e-4)
+        rest = totals - column
+        assert item['item_total_correlation'] == pytest.approx(np.corrcoef(column, rest)[0, 1], abs=1e-4)
+
+    item_variances = sum(statistics.variance(scores[:, q]) for q in range(3))
+    alpha = 3 / 2 * (1 - item_variances / statistics.variance(totals))
+    assert report['cronbach_alpha'] == pytest.approx(alpha, abs=1e-4)
+
+def test_mcq_option_frequencies():
+    mcq = server.item_analysis(TEST, results())['items'][0]
+    assert [(o['option'], o['correct'], o['count']) for o in mcq['options']] == [('A', False, 1), ('B', True, 3), ('C', False, 1)]
+    assert (mcq['blank'], mcq['other']) == (1, 1)
+    assert mcq['options'][1]['fraction'] == pytest.approx(3 / 7, abs=1e-4)
+
+def test_items_without_stored_scores_are_not_scored():
+    rows = results()
+    rows[0]['question_scores'] = None
+    report = server.item_analysis(TEST, rows)
+    assert report['scored_items'] == 2
+    assert report['items'][2] == {'question_index': 2, 'question_type': 'short', 'marks': 3, 'scored': False}
+
+def test_degenerate_inputs():
+    assert server.item_analysis(TEST, [])['items'] == []
+    single = server.item_analysis(TEST, results()[:1])
+    assert single['cronbach_alpha'] is None
+    assert single['items'][0]['item_total_correlation'] is None  # no variance, not NaN
+
+def test_report_is_recomputed_when_a_result_is_replaced(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'item_analysis_cache', server.LRUCache(4))
+    monkeypatch.setattr(server, 'METRICS', server.Counter())
+    admin = {'user_id': 'admin', 'role': server.UserRole.SUPER_ADMIN}
+
+    def result(id, option, submitted_at):
+        return {'id': id, 'test_id': 't1', 'student_id': id, 'submitted_at': submitted_at,
+                'question_scores': [0.0, 0.0, 1.0], 'answers': server.encode_answers([
+                    {'question_index': 0, 'selected_option': option}, {'question_index': 1, 'answer_text': 'paris'},
+                    {'question_index': 2, 'answer_text': 'x'}])}
+
+    async def scenario():
+        await mongo.tests.insert_one({**TEST, 'created_by': 'teacher'})
+        await mongo.test_results.insert_many([result('r1', 'B', '2025-05-01T10:00:00'),
+                                              result('r2', 'A', '2025-05-01T10:05:00')])
+        first = await server.get_item_analysis('t1', current_user=admin)
+        again = await server.get_item_analysis('t1', current_user=admin)
+        # a re-ingested paper sheet: same number of results, different answers
+        await mongo.test_results.insert_one(result('r3', 'B', '2025-05-02T09:00:00'))
+        await mongo.test_results.delete_one({'id': 'r2'})
+        return first, again, await server.get_item_analysis('t1', current_user=admin)
+    first, again, replaced = run(scenario())
+    assert again is first
+    assert (server.METRICS['item_analysis.cache_hit'], server.METRICS['item_analysis.cache_miss']) == (1, 2)
+    assert first['items'][0]['difficulty'] == 0.5 and replaced['items'][0]['difficulty'] == 1.0
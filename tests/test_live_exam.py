@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+import server
+
+TEST = {'id': 't1', 'total_marks': 10}
+
+class Viewer:
+    def __init__(self, hang=False):
+        self.messages = []
+        self.hang = hang
+
+    async def send_text(self, message):
+        if self.hang:
+            await asyncio.sleep(3600)
+        self.messages.append(json.loads(message))
+
+def test_snapshot_distribution(monkeypatch):
+    monkeypatch.setattr(server, 'LIVE_DISTRIBUTION_BINS', 4)
+    channel = server.LiveExamChannel(TEST)
+    channel.results = {'r1': ('s1', 10, 10), 'r2': ('s2', 2, None), 'r3': ('s2', 6, 10), 'r4': ('s3', 12, 10)}
+    snapshot = channel.snapshot()
+    assert (snapshot['submitted'], snapshot['students_submitted']) == (4, 3)
+    assert [b['count'] for b in snapshot['distribution']] == [1, 0, 1, 2]  # 100% goes in the last bin
+    assert snapshot['distribution'][1] == {'from': 25.0, 'to': 50.0, 'count': 0}
+    assert snapshot['mean_percent'] == round((100 + 20 + 60 + 100) / 4, 2)
+    assert server.LiveExamChannel(TEST).snapshot()['mean_percent'] is None
+
+def test_hub_coalesces_updates_and_drops_slow_viewers(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'LIVE_COALESCE_MS', 30)
+    monkeypatch.setattr(server, 'LIVE_SEND_TIMEOUT_SECONDS', 0.05)
+    hub = server.LiveExamHub()
+    fast, slow = Viewer(), Viewer(hang=True)
+
+    async def scenario():
+        await mongo.test_results.insert_one({'id': 'r0', 'test_id': 't1', 'student_id': 's0', 'total_score': 5, 'max_score': 10})
+        await hub.subscribe(TEST, fast)
+        await hub.subscribe(TEST, slow)
+        for i in range(1, 4):
+            hub.grading_started('t1')
+            hub.grading_finished('t1', {'id': f'r{i}', 'student_id': f's{i}', 'total_score': 10, 'max_score': 10})
+        await asyncio.sleep(0.3)
+        channel = hub.channels['t1']
+        sockets = set(channel.sockets)
+        hub.unsubscribe('t1', fast)
+        return channel, sockets
+
+    channel, sockets = run(scenario())
+    # The initial snapshot (from Mongo), then one coalesced update for the three submissions
+    assert [m['submitted'] for m in fast.messages] == [1, 4]
+    assert fast.messages[-1]['grading_in_progress'] == 0
+    assert sockets == {fast}
+    assert 't1' not in hub.channels and channel.flusher.cancelled()
+
+def test_unchanged_snapshots_are_not_resent(run, mongo):
+    channel = server.LiveExamChannel(TEST)
+    viewer = Viewer()
+    channel.sockets.add(viewer)
+
+    async def scenario():
+        await channel.broadcast()
+        await channel.broadcast()
+        channel.results['r1'] = ('s1', 3, 10)
+        await channel.broadcast()
+    run(scenario())
+    assert [m['submitted'] for m in viewer.messages] == [0, 1]
+
+def test_events_for_unwatched_tests_are_ignored():
+    hub = server.LiveExamHub()
+    hub.grading_started('nobody-watching')
+    hub.grading_finished('nobody-watching', None)
+    hub.invalidate('nobody-watching')
+    assert hub.channels == {}
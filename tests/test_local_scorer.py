@@ -0,0 +1,82 @@
+import pytest
+
+import server
+
+QUESTION = {
+    'marks': 3,
+    'correct_answer': 'Increasing temperature increases the rate of evaporation',
+}
+
+def scores(*answers, question=QUESTION):
+    return server.local_scores(question, list(answers))
+
+def test_exact_and_empty_answers_are_scored_locally():
+    assert scores('increasing temperature increases the rate of evaporation.', '', '  ') == [3.0, 0.0, 0.0]
+
+def test_paraphrase_keeping_order_gets_full_marks():
+    assert scores('Increasing the temperature increases rate of evaporation') == [3.0]
+
+def test_unrelated_answer_gets_zero():
+    assert scores('Plants make food by photosynthesis') == [0.0]
+
+def test_negated_answer_goes_to_llm():
+    assert scores(
+        'Increasing temperature does not increase the rate of evaporation',
+        "Increasing temperature doesn't increase the rate of evaporation",
+        'Increasing temperature never increases the rate of evaporation',
+    ) == [None, None, None]
+
+def test_reversed_cause_and_effect_goes_to_llm():
+    assert scores('Increasing the rate of evaporation increases temperature') == [None]
+
+def test_keyword_salad_goes_to_llm():
+    assert scores('evaporation rate temperature increases increasing') == [None]
+
+def test_bare_keyword_is_never_full_marks():
+    question = {'marks': 2, 'correct_answer': 'Energy'}
+    assert scores('energy', question=question) == [2.0]
+    assert scores('kinetic energy', question=question) != [2.0]
+    assert scores('energy', question=QUESTION) != [3.0]
+
+def test_short_reference_needs_exact_match():
+    question = {'marks': 1, 'correct_answer': 'Newton laws'}
+    assert scores('laws Newton', 'Newton laws', question=question) == [None, 1.0]
+
+def test_decision_does_not_depend_on_the_other_answers_in_the_batch():
+    # submit_test grades one answer at a time; a re-grade scores the whole batch at once
+    answer = 'Increasing temperature increases the rate of evaporation of water'
+    batch = [answer] + ['water'] * 20
+    assert scores(answer) == scores(*batch)[:1] == [None]
+    _, alone = server.local_similarity(QUESTION['correct_answer'], [answer])
+    _, together = server.local_similarity(QUESTION['correct_answer'], batch)
+    assert alone[0] == pytest.approx(together[0])
+
+def test_negation_and_modal_words_are_terms():
+    assert server.answer_terms("It can't be stored") == ['can', 'not', 'stored']
+    assert server.negation_parity(server.answer_terms('no it is not')) == 0
+    assert server.negation_parity(server.answer_terms('it will not')) == 1
+
+def test_order_overlap():
+    assert server.order_overlap(['a', 'b', 'c'], ['a', 'b', 'c']) == 1.0
+    assert server.order_overlap(['a', 'b', 'c'], ['c', 'b', 'a']) == 0.0
+    assert server.order_overlap(['a'], ['a']) == 0.0
+
+def test_grade_subjective_sends_only_undecided_answers_to_the_llm(run, monkeypatch):
+    graded = []
+
+    async def evaluate_answer(question_text, correct_answer, answer, marks):
+        graded.append(answer)
+        return 1.5
+
+    monkeypatch.setattr(server, 'evaluate_answer', evaluate_answer)
+    monkeypatch.setattr(server, 'LOCAL_SCORING_ENABLED', True)
+    question = {**QUESTION, 'question_text': 'What does heat do to evaporation?'}
+    answers = ['Increasing temperature increases the rate of evaporation', '',
+               'Increasing temperature does not increase the rate of evaporation']
+    assert run(server.grade_subjective(question, answers)) == [3.0, 0.0, 1.5]
+    assert graded == [answers[2]]
+
+    monkeypatch.setattr(server, 'LOCAL_SCORING_ENABLED', False)
+    graded.clear()
+    assert run(server.grade_subjective(question, answers)) == [1.5, 1.5, 1.5]
+    assert graded == answers
@@ -0,0 +1,39 @@
+import os
+
+import server
+
+def test_create_mongo_client_uses_the_pool_settings(monkeypatch):
+    monkeypatch.setattr(server, 'mongo_url', 'mongodb://localhost:27017')
+    monkeypatch.setattr(server, 'MONGO_MAX_POOL_SIZE', 25)
+    monkeypatch.setattr(server, 'MONGO_MIN_POOL_SIZE', 2)
+    monkeypatch.setattr(server, 'MONGO_WAIT_QUEUE_TIMEOUT_MS', 1500)
+    monkeypatch.setattr(server, 'MONGO_SERVER_SELECTION_TIMEOUT_MS', 700)
+    monkeypatch.setattr(server, 'MONGO_COMPRESSORS', 'zlib')
+    monkeypatch.setattr(server, 'MONGO_MONITORING', False)
+    client = server.create_mongo_client()
+    try:
+        options = client.delegate.options
+        assert options.pool_options.max_pool_size == 25
+        assert options.pool_options.min_pool_size == 2
+        assert options.pool_options.wait_queue_timeout == 1.5
+        assert options.server_selection_timeout == 0.7
+        assert options.pool_options.metadata['application']['name'] == f"exam-api-{os.getpid()}"
+        assert 'zlib' in options._options['compressors']
+    finally:
+        client.close()
+
+def test_connect_to_mongo_keeps_an_existing_client(run, mongo):
+    existing = server.client
+    run(server.connect_to_mongo())
+    assert server.client is existing and server.db is mongo
+
+def test_connect_to_mongo_creates_the_worker_client(run, monkeypatch):
+    monkeypatch.setattr(server, 'client', None)
+    monkeypatch.setattr(server, 'db', None)
+    monkeypatch.setattr(server, 'SCHOOL_LAYOUT', 'shared')
+    run(server.connect_to_mongo())
+    try:
+        assert server.db.name == server.DB_NAME
+        assert server.db.client is server.client
+    finally:
+        server.client.close()
@@ -0,0 +1,71 @@
+import asyncio
+import base64
+
+import server
+
+def test_ocr_cache_key_depends_on_bytes_and_settings(monkeypatch):
+    key = server.ocr_cache_key(b'photo')
+    assert key == server.ocr_cache_key(b'photo')
+    assert key != server.ocr_cache_key(b'photo2')
+    monkeypatch.setattr(server, 'OCR_CACHE_SETTINGS', server.OCR_CACHE_SETTINGS + ':other')
+    assert server.ocr_cache_key(b'photo') != key
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = server.LRUCache(2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and len(cache) == 2
+
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(server, 'ocr_memory_cache', server.LRUCache(8))
+    monkeypatch.setattr(server, 'METRICS', server.Counter())
+
+def test_cache_layers(run, mongo, monkeypatch):
+    fresh_cache(monkeypatch)
+
+    async def scenario():
+        assert await server.get_cached_ocr('k') is None
+        await server.store_cached_ocr('k', 'text')
+        assert await server.get_cached_ocr('k') == 'text'
+        # Another worker: empty memory cache, shared Mongo entry
+        monkeypatch.setattr(server, 'ocr_memory_cache', server.LRUCache(8))
+        assert await server.get_cached_ocr('k') == 'text'
+        assert await server.get_cached_ocr('k') == 'text'
+        return await mongo.ocr_cache.find_one({'_id': 'k'})
+    stored = run(scenario())
+    assert stored['text'] == 'text' and stored['created_at']
+    assert {k: server.METRICS[k] for k in ('ocr_cache.miss', 'ocr_cache.memory_hit', 'ocr_cache.mongo_hit')} == {
+        'ocr_cache.miss': 1, 'ocr_cache.memory_hit': 2, 'ocr_cache.mongo_hit': 1}
+
+def test_mongo_failures_fall_back_to_ocr(run, monkeypatch):
+    fresh_cache(monkeypatch)
+
+    class Broken:
+        def __getattr__(self, name):
+            raise RuntimeError("mongo down")
+    monkeypatch.setattr(server, 'db', Broken())
+
+    async def scenario():
+        assert await server.get_cached_ocr('k') is None
+        await server.store_cached_ocr('k', 'text')  # only logged
+        return await server.get_cached_ocr('k')
+    assert run(scenario()) == 'text'
+
+def test_extract_text_runs_ocr_once_per_photo(run, mongo, monkeypatch):
+    fresh_cache(monkeypatch)
+    calls = []
+
+    async def run_in_executor(pool, fn, *args):
+        calls.append(args)
+        return 'ocr text'
+
+    monkeypatch.setattr(server, 'get_process_pool', lambda: None)
+
+    async def scenario():
+        monkeypatch.setattr(asyncio.get_running_loop(), 'run_in_executor', run_in_executor)
+        photo = base64.b64encode(b'jpeg bytes').decode()
+        return [await server.extract_text_from_image(photo), await server.extract_text_from_image(photo)]
+    assert run(scenario()) == ['ocr text', 'ocr text']
+    assert calls == [(b'jpeg bytes',)]
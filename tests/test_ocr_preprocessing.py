@@ -0,0 +1,58 @@
+import sys
+from io import BytesIO
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import server
+
+def test_box_sums_match_brute_force():
+    values = np.random.default_rng(1).integers(0, 255, size=(9, 13))
+    sums, area = server.box_sums(values, 2)
+    for y in range(values.shape[0]):
+        for x in range(values.shape[1]):
+            window = values[max(y - 2, 0):y + 3, max(x - 2, 0):x + 3]
+            assert sums[y, x] == window.sum()
+            assert area[y, x] == window.size
+
+def page(angle=0.0, size=(800, 1100)):
+    """White page with dark text-like bars, on a dark desk"""
+    sheet = Image.new('L', size, 245)
+    draw = ImageDraw.Draw(sheet)
+    for y in range(150, 900, 60):
+        draw.rectangle([120, y, 680, y + 14], fill=20)
+    desk = Image.new('L', (size[0] + 200, size[1] + 200), 40)
+    desk.paste(sheet.rotate(angle, fillcolor=245, resample=Image.Resampling.BICUBIC), (100, 100))
+    return desk
+
+def test_binarize_adaptive_keeps_text_and_drops_the_desk():
+    gray = np.asarray(page())
+    ink = server.binarize_adaptive(gray)
+    assert ink[100 + 155, 100 + 400]            # inside a text bar
+    assert not ink[100 + 120, 100 + 400]        # blank paper
+    assert not ink[:80].any() and not ink[:, :80].any()  # desk around the page
+
+@pytest.mark.parametrize("angle", [-4.0, 0.0, 3.0])
+def test_estimate_skew_finds_the_rotation(angle):
+    ink = server.binarize_adaptive(np.asarray(page(angle)))
+    assert abs(server.estimate_skew(ink) + angle) <= 1.0
+
+def test_preprocess_crops_to_black_text_on_white(monkeypatch):
+    monkeypatch.setattr(server, 'OCR_TARGET_DPI', 100)  # keep the test image small
+    image = server.preprocess_for_ocr(page(3.0).convert('RGB'))
+    pixels = np.asarray(image)
+    assert image.mode == 'L'
+    assert set(np.unique(pixels)) <= {0, 255}
+    assert (pixels == 0).mean() > 0.05          # mostly text once the borders are gone
+    assert image.height < page().height
+
+def test_run_ocr_passes_the_configured_modes(monkeypatch):
+    calls = []
+    monkeypatch.setitem(sys.modules, 'pytesseract', SimpleNamespace(
+        image_to_string=lambda image, lang, config: calls.append((image.size, lang, config)) or "  text \n"))
+    buffered = BytesIO()
+    Image.new('RGB', (40, 20), 'white').save(buffered, format='PNG')
+    assert server.run_ocr(buffered.getvalue(), preprocess=False) == 'text'
+    assert calls == [((40, 20), server.OCR_LANG, f"--oem {server.OCR_OEM} --psm {server.OCR_PSM}")]
@@ -0,0 +1,45 @@
+import server
+
+def test_child_summary_keeps_only_recent_results_while_grouping():
+    pipeline = server.child_summary_pipeline(['s1', 's2'], 5)
+    assert pipeline[0] == {"$match": {"student_id": {"$in": ['s1', 's2']}}}
+    group = pipeline[1]["$group"]
+    assert group["recent_results"]["$topN"]["n"] == 5
+    assert group["recent_results"]["$topN"]["sortBy"] == {"submitted_at": -1}
+    # No stage buffers every result: no $push, and no $sort/$slice around the group
+    stages = [next(iter(stage)) for stage in pipeline]
+    assert stages == ["$match", "$group"]
+    assert "$push" not in str(pipeline)
+
+def test_child_summary_without_recent_results():
+    group = server.child_summary_pipeline(['s1'], 0)[1]["$group"]
+    assert "recent_results" not in group
+    assert set(group) == {"_id", "total_tests", "total_marks", "obtained_marks"}
+
+def test_children_are_linked_by_parent_email_only(run, mongo):
+    parent = {'user_id': 'p1', 'role': server.UserRole.PARENT}
+    impostor = {'user_id': 'p2', 'role': server.UserRole.PARENT}
+
+    async def scenario():
+        await mongo.users.insert_many([
+            {'id': 'p1', 'role': server.UserRole.PARENT, 'email': 'asha.parent@example.com', 'mobile': '5550100'},
+            # another family's parent signed up with the same mobile number
+            {'id': 'p2', 'role': server.UserRole.PARENT, 'email': 'other@example.com', 'mobile': '5550100'},
+            {'id': 's1', 'role': server.UserRole.STUDENT, 'name': 'Asha',
+             'parent_email': 'asha.parent@example.com', 'parent_mobile': '5550100'},
+            {'id': 's2', 'role': server.UserRole.STUDENT, 'name': 'Ravi', 'parent_mobile': '5550100'},
+            {'id': 't1', 'role': server.UserRole.TEACHER, 'parent_email': 'asha.parent@example.com'},
+        ])
+        await mongo.test_results.insert_many([
+            {'id': 'r1', 'student_id': 's1', 'test_id': 'x', 'total_score': 6.0, 'max_score': 10},
+            {'id': 'r2', 'student_id': 's1', 'test_id': 'y', 'total_score': 9.0, 'max_score': 10},
+            {'id': 'r3', 'student_id': 's2', 'test_id': 'x', 'total_score': 1.0, 'max_score': 10},
+        ])
+        # recent=0: the in-memory stand-in has no $topN
+        return (await server.get_parent_dashboard(recent=0, current_user=parent),
+                await server.get_parent_dashboard(recent=0, current_user=impostor))
+    own, other = run(scenario())
+    [child] = own['children']
+    assert child['student']['id'] == 's1'
+    assert (child['total_tests'], child['average_score'], child['recent_results']) == (2, 75.0, [])
+    assert other == {'children': []}
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import jwt
+from fastapi import FastAPI
+
+import server
+
+def busy_loop(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_stack_sampler_collapses_the_sampled_thread_stacks():
+    sampler = server.StackSampler(threading.get_ident(), interval_ms=1).start()
+    busy_loop(0.1)
+    sampler.stop()
+    folded = sampler.folded()
+    assert folded.endswith("\n")
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0
+    # Root first, the sampled frame last
+    assert stack.split(";")[-1].startswith("busy_loop (test_profiling.py:")
+
+async def profiled_work():
+    for _ in range(4):
+        busy_loop(0.03)
+        await asyncio.sleep(0)
+
+async def other_work():
+    for _ in range(4):
+        busy_loop(0.03)
+        await asyncio.sleep(0)
+
+def test_profile_report_holds_only_the_profiled_requests_tasks(run, tmp_path, monkeypatch):
+    async def is_super_admin_request(request):
+        return True
+    monkeypatch.setattr(server, 'is_super_admin_request', is_super_admin_request)
+    monkeypatch.setattr(server, 'PROFILE_DIR', tmp_path)
+    app = FastAPI()
+    app.middleware("http")(server.profiling_middleware)
+
+    @app.get("/mine")
+    async def mine():
+        await asyncio.gather(profiled_work())  # in a task of its own
+        return {}
+
+    @app.get("/other")
+    async def other():
+        await other_work()
+        return {}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(http.get("/mine", headers={"X-Profile": "1"}), http.get("/other"))
+    mine, other = run(scenario())
+    assert 'x-profile-report' not in other.headers
+    folded = (tmp_path / mine.headers['x-profile-report']).read_text()
+    assert "profiled_work (test_profiling.py:" in folded
+    assert "other_work" not in folded
+
+def test_write_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'PROFILE_DIR', tmp_path / 'profiles')
+    name = server.write_profile('GET', '/api/tests/abc', 123.9, 'main;f 3\n')
+    assert name.endswith('.folded') and '_GET_api_tests_abc_123ms_' in name
+    assert (tmp_path / 'profiles' / name).read_text() == 'main;f 3\n'
+    assert '_GET_root_' in server.write_profile('GET', '/', 1, '')
+
+def test_flush_slow_profiles_writes_the_slowest_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, 'PROFILE_DIR', tmp_path)
+    monkeypatch.setattr(server, '_slow_profiles', [
+        (10.0, 1, ('GET', '/fast'), 'a 1\n'), (500.0, 2, ('POST', '/slow'), 'b 1\n')])
+    written = server.flush_slow_profiles()
+    assert ['_POST_slow_500ms_' in written[0], '_GET_fast_10ms_' in written[1]] == [True, True]
+    assert server._slow_profiles == []
+
+class FakeRequest:
+    def __init__(self, token=None):
+        self.headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+def token(user_id, role):
+    return jwt.encode({'user_id': user_id, 'role': role}, server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+
+def test_is_super_admin_request(run, mongo):
+    async def scenario():
+        await mongo.users.insert_many([{'id': 'admin'}, {'id': 'off', 'is_active': False}])
+        return [
+            await server.is_super_admin_request(FakeRequest()),
+            await server.is_super_admin_request(FakeRequest('garbage')),
+            await server.is_super_admin_request(FakeRequest(token('admin', server.UserRole.TEACHER))),
+            await server.is_super_admin_request(FakeRequest(token('off', server.UserRole.SUPER_ADMIN))),
+            await server.is_super_admin_request(FakeRequest(token('admin', server.UserRole.SUPER_ADMIN))),
+        ]
+    assert run(scenario()) == [False, False, False, False, True]
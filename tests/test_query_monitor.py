@@ -0,0 +1,124 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import server
+
+def test_query_shape_drops_values_and_sorts_keys():
+    shape = server.query_shape({'school_id': {'$in': ['a', 'b']}, 'role': 'student',
+                                '$or': [{'class_name': '10'}, {'class_name': '11'}]})
+    assert shape == {'$or': [{'class_name': 1}, {'class_name': 1}], 'role': 1, 'school_id': {'$in': 1}}
+    assert list(shape) == ['$or', 'role', 'school_id']
+    assert server.query_shape('x') == 1
+    assert server.query_shape([1, 2]) == 1
+
+def test_command_shape_is_the_same_for_different_values():
+    first = server.command_shape('find', {'find': 'users', 'filter': {'email': 'a@x.com'}, 'sort': {'name': 1}})
+    second = server.command_shape('find', {'find': 'users', 'filter': {'email': 'b@y.com'}, 'sort': {'name': 1}})
+    assert first == second
+    assert json.loads(first) == {'filter': {'email': 1}, 'sort': {'name': 1}}
+
+def test_command_shape_per_command():
+    assert json.loads(server.command_shape('count', {'count': 'tests', 'query': {'class_name': '10'}})) == \
+        {'filter': {'class_name': 1}}
+    assert json.loads(server.command_shape('distinct', {'distinct': 'users', 'key': 'school_id', 'query': {}})) == \
+        {'key': 'school_id', 'filter': {}}
+    assert json.loads(server.command_shape('aggregate', {'aggregate': 'test_results', 'pipeline': [
+        {'$match': {'student_id': 's1'}}, {'$sort': {'submitted_at': -1}},
+        {'$lookup': {'from': 'tests', 'localField': 'test_id', 'foreignField': 'id', 'as': 'test'}},
+        {'$limit': 5},
+    ]})) == {'pipeline': [{'$match': {'student_id': 1}}, {'$sort': {'submitted_at': -1}}, {'$lookup': 'tests'}, '$limit']}
+    assert json.loads(server.command_shape('update', {'update': 'users', 'updates': [
+        {'q': {'id': 'u1'}, 'u': {'$set': {'name': 'x'}}}, {'q': {'email': 'e'}, 'u': {}}]})) == {'filter': {'id': 1}}
+    assert json.loads(server.command_shape('delete', {'delete': 'users', 'deletes': []})) == {'filter': {}}
+
+def test_explain_command_drops_session_fields_and_writes():
+    command = {'find': 'users', 'filter': {'id': 'u1'}, 'lsid': {'id': 'x'}, '$db': 'exam', '$clusterTime': {}}
+    assert server.explain_command('find', command) == {'find': 'users', 'filter': {'id': 'u1'}}
+    assert server.explain_command('aggregate', {'aggregate': 'x', 'pipeline': [{'$match': {}}, {'$out': 'y'}]}) is None
+    explained = server.explain_command('delete', {'delete': 'users', 'deletes': [{'q': {'a': 1}}, {'q': {'b': 1}}]})
+    assert explained['deletes'] == [{'q': {'a': 1}}]
+
+def test_summarize_explain_reads_the_winning_plan_only():
+    explain = {
+        'queryPlanner': {
+            'winningPlan': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'student_id_1'}},
+            'rejectedPlans': [{'stage': 'COLLSCAN'}],
+        },
+        'executionStats': {
+            'nReturned': 4, 'totalDocsExamined': 4, 'totalKeysExamined': 5,
+            'executionStages': {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'student_id_1'}},
+            'allPlansExecution': [{'stage': 'COLLSCAN'}],
+        },
+    }
+    assert server.summarize_explain(explain) == {
+        'stages': ['FETCH', 'IXSCAN'], 'indexes': ['student_id_1'], 'collscan': False,
+        'docs_examined': 4, 'keys_examined': 5, 'returned': 4,
+    }
+
+def test_summarize_explain_flags_collection_scans():
+    explain = {'stages': [
+        {'$cursor': {'queryPlanner': {'winningPlan': {'stage': 'COLLSCAN'}},
+                     'executionStats': {'nReturned': 2, 'totalDocsExamined': 1000}}},
+        {'$lookup': {'from': 'tests'}, 'collectionScans': 3, 'indexesUsed': ['id_1']},
+    ]}
+    summary = server.summarize_explain(explain)
+    assert summary['collscan'] is True
+    assert summary['indexes'] == ['id_1']
+    assert summary['docs_examined'] == 1000 and summary['returned'] == 2
+
+def event(request_id, command, duration_ms=0.0):
+    name = next(iter(command))
+    return SimpleNamespace(connection_id=('localhost', 27017), request_id=request_id, command_name=name,
+                           command=command, database_name='exam', duration_micros=int(duration_ms * 1000))
+
+def test_monitor_times_commands_and_tracks_slow_shapes(monkeypatch):
+    monkeypatch.setattr(server, 'MONGO_SLOW_QUERY_MS', 50)
+    monitor = server.QueryMonitor()
+    for request_id, (email, duration) in enumerate([('a', 10), ('b', 80), ('c', 120)]):
+        command = {'find': 'users', 'filter': {'email': email}}
+        monitor.started(event(request_id, command))
+        monitor.succeeded(event(request_id, command, duration))
+    monitor.started(event(9, {'hello': 1}))  # server command: not tracked
+    monitor.succeeded(event(9, {'hello': 1}, 500))
+    monitor.started(event(10, {'insert': 'users', 'documents': []}))
+    monitor.failed(event(10, {'insert': 'users'}, 60))
+
+    report = monitor.report(limit=10, sort_by='total_ms')
+    assert report['operations']['users.find'] == {
+        'count': 3, 'failed': 0, 'slow': 2, 'total_ms': 210.0, 'max_ms': 120.0, 'avg_ms': 70.0}
+    assert report['operations']['users.insert']['failed'] == 1
+    assert list(report['operations']) == ['users.find', 'users.insert']
+    assert not monitor.pending
+    # inserts aren't shaped, and both slow finds share one shape
+    [shape] = report['slow_shapes']
+    assert (shape['collection'], shape['op'], shape['count']) == ('users', 'find', 2)
+    assert json.loads(shape['shape']) == {'filter': {'email': 1}}
+    monitor.reset()
+    assert monitor.report(limit=10, sort_by='total_ms') == {'operations': {}, 'slow_shapes': []}
+
+def test_monitor_forgets_the_cheapest_shape_when_full(monkeypatch):
+    monkeypatch.setattr(server, 'MONGO_SLOW_QUERY_MS', 0)
+    monkeypatch.setattr(server, 'MONGO_SLOW_SHAPES', 2)
+    monitor = server.QueryMonitor()
+    for field, duration in [('a', 30), ('b', 10), ('c', 20)]:
+        monitor.record_slow('exam', 'users', 'find', {'find': 'users', 'filter': {field: 1}}, duration)
+    fields = sorted(field for s in monitor.slow_shapes.values() for field in json.loads(s['shape'])['filter'])
+    assert fields == ['a', 'c']
+
+def test_monitor_samples_explains_once_per_interval(run, monkeypatch):
+    monkeypatch.setattr(server, 'MONGO_EXPLAIN_SAMPLE_RATE', 1.0)
+    monkeypatch.setattr(server, 'MONGO_EXPLAIN_INTERVAL_SECONDS', 3600)
+
+    async def scenario():
+        monitor = server.QueryMonitor()
+        monitor.loop = asyncio.get_running_loop()
+        monitor.explain_queue = asyncio.Queue()
+        for _ in range(3):
+            monitor.record_slow('exam', 'users', 'find', {'find': 'users', 'filter': {'id': 'u'}, 'lsid': {}}, 500)
+        monitor.record_slow('exam', 'tests', 'aggregate', {'aggregate': 'tests', 'pipeline': [{'$out': 'x'}]}, 500)
+        await asyncio.sleep(0)
+        return [monitor.explain_queue.get_nowait() for _ in range(monitor.explain_queue.qsize())]
+    [(key, database, command)] = run(scenario())
+    assert key[:2] == ('users', 'find') and database == 'exam'
+    assert command == {'find': 'users', 'filter': {'id': 'u'}}
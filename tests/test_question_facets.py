@@ -0,0 +1,69 @@
+from io import BytesIO
+
+from fastapi import UploadFile
+
+import server
+
+def cell(count, subject='Maths', class_name='10', difficulty='easy', question_type='mcq', scope=None):
+    return {'scope': scope, 'subject': subject, 'class_name': class_name,
+            'difficulty': difficulty, 'question_type': question_type, 'count': count}
+
+CELLS = [
+    cell(5),
+    cell(3, difficulty='hard'),
+    cell(2, subject='Physics'),
+    cell(4, subject='Physics', question_type='short'),
+]
+
+def test_question_cell():
+    question = {'id': 'q1', 'school_id': 's1', 'subject': 'Maths', 'class_name': '10',
+                'difficulty': 'easy', 'question_type': 'mcq', 'marks': 1}
+    assert server.question_cell(question) == {
+        'scope': 's1', 'subject': 'Maths', 'class_name': '10', 'difficulty': 'easy', 'question_type': 'mcq'}
+    assert server.question_cell({})['scope'] is None
+
+def test_summarize_facets_unfiltered():
+    summary = server.summarize_facets(CELLS, {}, include_cells=False)
+    assert summary['total'] == 14
+    assert summary['facets']['subject'] == [{'value': 'Maths', 'count': 8}, {'value': 'Physics', 'count': 6}]
+    assert 'cells' not in summary
+
+def test_summarize_facets_keeps_alternatives_of_the_filtered_facet():
+    summary = server.summarize_facets(CELLS, {'subject': 'Physics', 'difficulty': None}, include_cells=True)
+    assert summary['total'] == 6
+    assert summary['filters'] == {'subject': 'Physics'}
+    # The subject picker still lists Maths; the other facets only count Physics
+    assert {f['value'] for f in summary['facets']['subject']} == {'Maths', 'Physics'}
+    assert summary['facets']['question_type'] == [{'value': 'short', 'count': 4}, {'value': 'mcq', 'count': 2}]
+    assert sum(c['count'] for c in summary['cells']) == 6
+
+def upload(csv_text: str):
+    return server.bulk_upload_questions(
+        file=UploadFile(BytesIO(csv_text.encode()), filename='questions.csv'),
+        subject='Maths', class_name='10', school=None)
+
+CSV = "question_text,question_type,correct_answer,marks,difficulty\n2+2?,short,4,1,easy\n3+3?,short,6,1,hard\n"
+
+def test_bulk_upload_counts_facets(run, mongo):
+    async def scenario():
+        await upload(CSV)
+        cells = await server.question_facet_cells(None)
+        return sum(c['count'] for c in cells)
+    assert run(scenario()) == 2
+
+def test_failed_facet_update_does_not_fail_the_upload(run, mongo, monkeypatch):
+    async def broken(questions):
+        raise RuntimeError("facets unavailable")
+
+    async def scenario():
+        await server.question_facet_cells(None)  # counted (empty) before the upload
+        monkeypatch.setattr(server, 'adjust_question_facets', broken)
+        response = await upload(CSV)
+        stored = await mongo.master_questions.count_documents({})
+        cells = await server.question_facet_cells(None)
+        return response, stored, sum(c['count'] for c in cells)
+
+    response, stored, counted = run(scenario())
+    assert response['count'] == 2
+    assert stored == 2
+    assert counted == 2  # recounted from master_questions on the next read
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+
+def request(headers=None, client=('10.0.0.1', 1234), body=b''):
+    scope = {
+        'type': 'http', 'method': 'POST', 'path': '/', 'query_string': b'', 'client': client,
+        'headers': [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    return Request(scope, receive)
+
+def test_parse_rate_limit():
+    assert server.parse_rate_limit('auth', '10/60') == (10.0, 10 / 60)
+    assert server.parse_rate_limit('auth', ' OFF ') is None
+    for bad in ('10', '0/60', '10/0', 'x/y'):
+        with pytest.raises(RuntimeError):
+            server.parse_rate_limit('auth', bad)
+
+def test_token_bucket_burst_then_refill():
+    buckets = server.TokenBuckets(10)
+    assert [buckets.take('k', 2, 1.0, 0.0) for _ in range(3)] == [0.0, 0.0, 1.0]
+    assert buckets.take('k', 2, 1.0, 0.5) == pytest.approx(0.5)
+    assert buckets.take('k', 2, 1.0, 1.0) == 0.0
+    # Refill is capped at the burst size
+    assert [buckets.take('k', 2, 1.0, 100.0) for _ in range(3)] == [0.0, 0.0, 1.0]
+
+def test_token_buckets_are_per_key_and_lru_bounded():
+    buckets = server.TokenBuckets(2)
+    assert buckets.take('a', 1, 1.0, 0.0) == 0.0
+    assert buckets.take('b', 1, 1.0, 0.0) == 0.0
+    assert buckets.take('a', 1, 1.0, 0.0) == 1.0
+    buckets.take('c', 1, 1.0, 0.0)  # evicts 'b', the least recently used
+    assert buckets.take('b', 1, 1.0, 0.0) == 0.0
+    assert len(buckets.buckets) == 2
+
+def test_client_identity():
+    token = server.create_token('u1', server.UserRole.STUDENT)
+    assert server.client_identity(request({'Authorization': f'Bearer {token}'})) == 'user:u1'
+    assert server.client_identity(request({'Authorization': 'Bearer junk'})) == 'ip:10.0.0.1'
+    assert server.client_identity(request({'X-Forwarded-For': '1.2.3.4'})) == 'ip:10.0.0.1'
+
+def test_client_identity_trusts_forwarded_only_when_configured(monkeypatch):
+    monkeypatch.setattr(server, 'RATE_LIMIT_TRUST_FORWARDED', True)
+    assert server.client_identity(request({'X-Forwarded-For': '1.2.3.4, 10.0.0.9'})) == 'ip:1.2.3.4'
+
+def test_login_identity_keys_by_email_and_ip(run):
+    key = run(server.login_identity(request(body=b'{"email": " Student@X.com ", "password": "p"}')))
+    assert key == 'student@x.com|ip:10.0.0.1'
+    assert run(server.login_identity(request(body=b'not json'))) == '|ip:10.0.0.1'
+
+def test_students_behind_one_ip_are_not_throttled_by_each_other(run, monkeypatch):
+    monkeypatch.setattr(server, 'token_buckets', server.TokenBuckets(1000))
+    monkeypatch.setitem(server.RATE_LIMIT_BUCKETS, 'auth', (2.0, 2 / 60))
+    check = server.rate_limit('auth', identity=server.login_identity)
+
+    async def logins():
+        for i in range(50):
+            await check(request(body=f'{{"email": "s{i}@x.com"}}'.encode()))
+        await check(request(body=b'{"email": "s0@x.com"}'))
+        with pytest.raises(HTTPException) as rejected:
+            await check(request(body=b'{"email": "s0@x.com"}'))
+        return rejected.value
+    rejected = run(logins())
+    assert rejected.status_code == 429
+    assert int(rejected.headers['Retry-After']) >= 1
+
+def test_disabled_class_never_rejects(run, monkeypatch):
+    monkeypatch.setitem(server.RATE_LIMIT_BUCKETS, 'ocr', None)
+    check = server.rate_limit('ocr')
+
+    async def calls():
+        await asyncio.gather(*(check(request()) for _ in range(100)))
+    run(calls())
+
+def test_admission_queues_then_sheds(run):
+    async def scenario():
+        limit = server.AdmissionLimit('x', 1, 1, 0.2)
+
+        async def job(seconds):
+            try:
+                async with limit:
+                    await asyncio.sleep(seconds)
+                return 'ok'
+            except HTTPException as e:
+                return e.status_code
+        # one runs, one waits, the third finds the queue full
+        first = await asyncio.gather(job(0.05), job(0.01), job(0.01))
+        # the waiter times out behind a long job
+        second = await asyncio.gather(job(0.5), job(0.01))
+        return first, second, limit.state()
+    first, second, state = run(scenario())
+    assert first == ['ok', 'ok', 429]
+    assert second == ['ok', 429]
+    assert state == {'limit': 1, 'in_flight': 0, 'waiting': 0, 'max_waiting': 1, 'batch_waiting': 0}
+
+def test_batch_units_yield_to_requests_and_are_never_shed(run):
+    async def scenario():
+        limit = server.AdmissionLimit('x', 1, 1, 0.05)
+        order = []
+
+        async def unit(name, slot):
+            async with slot:
+                order.append(name)
+                await asyncio.sleep(0.02)
+
+        async with limit:  # a request holds the only slot
+            batch = [asyncio.create_task(unit(f'page{i}', limit.batch())) for i in range(3)]
+            await asyncio.sleep(0)
+            waiting = limit.state()
+            request = asyncio.create_task(unit('submission', limit.priority()))
+            await asyncio.sleep(0)
+        # longer than the 0.05s request timeout: batch units wait instead of getting 429
+        await asyncio.gather(request, *batch)
+        return waiting, order, limit.state()
+    waiting, order, state = run(scenario())
+    assert waiting['batch_waiting'] == 3 and waiting['waiting'] == 0
+    assert order == ['submission', 'page0', 'page1', 'page2']
+    assert state == {'limit': 1, 'in_flight': 0, 'waiting': 0, 'max_waiting': 1, 'batch_waiting': 0}
+
+def test_hash_passwords_parallel_takes_a_hashing_slot_per_chunk(run, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    monkeypatch.setitem(server.admission, 'hashing', server.AdmissionLimit('hashing', 2, 10, 1))
+    monkeypatch.setattr(server, 'METRICS', server.Counter())
+    monkeypatch.setattr(server, 'hash_password', lambda p: f'hashed:{p}')
+    with ThreadPoolExecutor(4) as pool:
+        monkeypatch.setattr(server, 'get_process_pool', lambda: pool)
+        hashed = run(server.hash_passwords_parallel([str(i) for i in range(20)], chunk_size=3))
+    assert hashed == [f'hashed:{i}' for i in range(20)]
+    assert server.METRICS['admission.batch.hashing'] == 7
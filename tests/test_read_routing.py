@@ -0,0 +1,40 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+import server
+
+def test_read_preference_for(monkeypatch):
+    monkeypatch.setitem(server.READ_PREFERENCES, 'analytics', 'secondaryPreferred')
+    monkeypatch.setitem(server.READ_PREFERENCES, 'admin', 'primary')
+    preference = server.read_preference_for('analytics')
+    assert isinstance(preference, SecondaryPreferred)
+    assert preference.max_staleness == server.READ_MAX_STALENESS_SECONDS
+    assert server.read_preference_for('admin') == Primary()
+    assert server.read_preference_for('unknown-policy') == Primary()
+
+def routed_db(monkeypatch):
+    # A client that never connects: handles and read preferences are built locally
+    client = AsyncIOMotorClient('mongodb://localhost:27017', connect=False)
+    monkeypatch.setattr(server, 'db', client['test'])
+
+def test_read_collection_uses_the_configured_policy(monkeypatch):
+    routed_db(monkeypatch)
+    for policy in server.READ_PREFERENCES:
+        assert server.read_collection('test_results', policy).read_preference == server.read_preference_for(policy)
+    assert server.read_collection('test_results', 'analytics').read_preference.mongos_mode == \
+        server.read_preference_for('analytics').mongos_mode
+
+def test_reads_are_counted_per_query_not_per_handle(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'METRICS', server.Counter())
+    metric = f"reads.admin.{server.READ_PREFERENCES['admin']}"
+
+    async def scenario():
+        await mongo.users.insert_many([{'id': str(i)} for i in range(3)])
+        users = server.read_collection('users', 'admin')
+        assert server.METRICS[metric] == 0
+        await users.count_documents({})
+        await users.find({}).to_list(None)
+        await users.find_one({'id': '1'})
+        users.name  # not a read
+        return server.METRICS[metric]
+    assert run(scenario()) == 3
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import server
+
+TEST = {
+    'id': 't1', 'class_name': '10', 'subject_id': 'sci', 'total_marks': 5, 'created_by': 'teacher',
+    'questions': [
+        {'question_type': 'mcq', 'question_text': '2+2', 'options': ['3', '4'], 'correct_answer': '4', 'marks': 1},
+        {'question_type': 'fill_blank', 'question_text': 'Capital of France', 'correct_answer': 'Paris', 'marks': 1},
+        {'question_type': 'short', 'question_text': 'Define photosynthesis', 'marks': 3,
+         'correct_answer': 'Plants convert light energy into chemical energy'},
+    ],
+}
+
+def answers(option, blank, text=None):
+    return [{'question_index': 0, 'selected_option': option}, {'question_index': 1, 'answer_text': blank},
+            {'question_index': 2, 'answer_text': text}]
+
+async def llm(question_text, correct_answer, answer, marks):
+    return 1.0
+
+def test_regrade_batch_scores_objective_and_groups_subjective(run, monkeypatch):
+    monkeypatch.setattr(server, 'evaluate_answer', llm)
+    results = [
+        {'answers': answers('4', ' paris ', 'Plants convert light energy into chemical energy')},
+        {'answers': answers('3', 'Rome', 'Plants eat sunlight somehow')},
+        {'answers': answers('4', None)[:1]},  # unanswered questions score 0
+    ]
+    scores = run(server.regrade_batch(TEST, results, asyncio.Semaphore(2)))
+    assert scores == [[1.0, 1.0, 3.0], [0.0, 0.0, 1.0], [1.0, 0.0, 0.0]]
+
+def test_regrade_progress():
+    started = (datetime.now(timezone.utc) - timedelta(seconds=10)).isoformat()
+    job = {'id': 'j', 'status': 'running', 'total': 100, 'processed': 60, 'run_started_at': started,
+           'run_start_processed': 40}
+    progress = server.regrade_progress(job)
+    assert progress['percent'] == 60.0
+    assert 15 <= progress['eta_seconds'] <= 25  # 20 results took ~10s, 40 left
+    assert server.regrade_progress({**job, 'status': 'failed'})['eta_seconds'] is None
+    assert server.regrade_progress({'id': 'j', 'status': 'completed', 'total': 0, 'processed': 0})['percent'] == 100.0
+
+def test_claim_regrade_job_respects_live_leases(run, mongo):
+    past = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    future = server.regrade_lease_expiry()
+
+    async def scenario():
+        await mongo.regrade_jobs.insert_many([
+            {'id': 'held', 'status': 'running', 'lease_owner': 'other', 'lease_expires_at': future},
+            {'id': 'done', 'status': 'completed', 'lease_expires_at': None},
+            {'id': 'orphan', 'status': 'running', 'lease_owner': 'dead', 'lease_expires_at': past},
+        ])
+        claimed = [await server.claim_regrade_job('held'), await server.claim_regrade_job('done'),
+                   await server.claim_regrade_job()]
+        return claimed, await server.claim_regrade_job()
+    (held, done, orphan), nothing_left = run(scenario())
+    assert held is None and done is None and nothing_left is None
+    # the document after the update, as MongoDB returns it for ReturnDocument.AFTER
+    assert orphan == {'id': 'orphan', 'status': 'running', 'lease_owner': server.worker_id(),
+                      'lease_expires_at': orphan['lease_expires_at']}
+    assert orphan['lease_expires_at'] > past
+
+def test_run_regrade_job_resumes_from_its_checkpoint(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'evaluate_answer', llm)
+    monkeypatch.setattr(server, 'REGRADE_BATCH_SIZE', 2)
+    results = [{'id': f'r{i}', 'test_id': 't1', 'student_id': f's{i}', 'school_id': None, 'total_score': 0.0,
+                'max_score': 5, 'submitted_at': '2025-05-14T09:00:00+00:00',
+                'answers': server.encode_answers(answers('4', 'Paris'))} for i in range(5)]
+
+    async def scenario():
+        await mongo.tests.insert_one(dict(TEST))
+        await mongo.test_results.insert_many(results)
+        # A previous run stopped after r1
+        await mongo.regrade_jobs.insert_one({
+            'id': 'j', 'test_id': 't1', 'school_id': None, 'status': 'pending', 'total': 5, 'processed': 2,
+            'changed': 0, 'last_result_id': 'r1', 'created_by': 'teacher', 'lease_owner': None, 'lease_expires_at': None})
+        await server.run_regrade_job(await server.claim_regrade_job('j'))
+        return (await mongo.regrade_jobs.find_one({'id': 'j'}, {'_id': 0}),
+                {r['id']: r.get('total_score') async for r in mongo.test_results.find({})})
+    job, totals = run(scenario())
+    assert job['status'] == 'completed' and job['lease_expires_at'] is None
+    assert (job['processed'], job['changed'], job['last_result_id']) == (5, 3, 'r4')
+    assert totals == {'r0': 0.0, 'r1': 0.0, 'r2': 2.0, 'r3': 2.0, 'r4': 2.0}
+
+def test_run_regrade_job_fails_without_its_test(run, mongo):
+    async def scenario():
+        await mongo.regrade_jobs.insert_one({'id': 'j', 'test_id': 'gone', 'status': 'running', 'processed': 0})
+        await server.run_regrade_job({'id': 'j', 'test_id': 'gone', 'processed': 0})
+        return await mongo.regrade_jobs.find_one({'id': 'j'})
+    job = run(scenario())
+    assert job['status'] == 'failed' and job['error'] == 'Test not found'
@@ -0,0 +1,26 @@
+import pytest
+from fastapi import HTTPException
+
+import server
+
+def test_cursor_round_trip():
+    values = ['2025-05-14T09:00:00+00:00', 'r/1+?']
+    cursor = server.encode_cursor(values)
+    assert '/' not in cursor and '+' not in cursor  # safe in a query string
+    assert server.decode_cursor(cursor, 2) == values
+
+@pytest.mark.parametrize("cursor", [
+    'not base64 at all!', server.encode_cursor(['only one']), server.encode_cursor({'a': 1})[:-2],
+    'e30=',  # {}
+    'é',
+])
+def test_bad_cursors_are_400(cursor):
+    with pytest.raises(HTTPException) as raised:
+        server.decode_cursor(cursor, 2)
+    assert raised.value.status_code == 400
+
+def test_students_only_see_their_own_results(run):
+    with pytest.raises(HTTPException) as raised:
+        run(server.get_student_result_summaries(
+            's2', current_user={'user_id': 's1', 'role': server.UserRole.STUDENT, 'school_id': None}))
+    assert raised.value.status_code == 403
@@ -0,0 +1,126 @@
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+
+import bcrypt
+from fastapi import UploadFile
+
+import server
+from benchmark import mongomock_index_models
+
+def test_hash_passwords():
+    hashed = server.hash_passwords(['one', 'two'])
+    assert len(hashed) == 2
+    assert server.verify_password('one', hashed[0]) and server.verify_password('two', hashed[1])
+    assert not server.verify_password('two', hashed[0])
+
+def test_hash_passwords_parallel_keeps_order(run, monkeypatch):
+    monkeypatch.setattr(server, 'hash_password', lambda p: f'hashed:{p}')
+    with ThreadPoolExecutor(2) as pool:
+        monkeypatch.setattr(server, 'get_process_pool', lambda: pool)
+        passwords = [str(i) for i in range(7)]
+        assert run(server.hash_passwords_parallel(passwords, chunk_size=3)) == [f'hashed:{p}' for p in passwords]
+
+def test_generate_unique_student_codes_skips_taken_codes(run, mongo, monkeypatch):
+    candidates = iter(['STD00000001', 'STD00000001', 'STD00000002', 'STD00000003', 'STD00000004'])
+    monkeypatch.setattr(server, 'generate_student_code', lambda: next(candidates))
+
+    async def scenario():
+        await mongo.users.insert_one({'id': 'u', 'student_code': 'STD00000002'})
+        return await server.generate_unique_student_codes(3)
+    assert sorted(run(scenario())) == ['STD00000001', 'STD00000003', 'STD00000004']
+
+ROSTER = """Name,Email,DOB,Class_Name,Parent_Email,Password
+Asha,asha@example.com,2010-01-02,10,parent@example.com,Secret@123
+Ravi,ravi@example.com,2010-03-04,,,
+Bad,not-an-email,2010-01-01,10,,
+Dup,asha@example.com,2010-01-01,10,,
+Old,taken@example.com,2010-01-01,10,,
+No Dob,nodob@example.com,,10,,
+"""
+
+def test_bulk_import_students_report(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'CREATE_INDEXES_ON_STARTUP', True)
+    monkeypatch.setattr(server, 'SCHOOL_LAYOUT', 'shared')
+    monkeypatch.setattr(server, 'hash_password', lambda p: bcrypt.hashpw(p.encode(), bcrypt.gensalt(4)).decode())
+    with ThreadPoolExecutor(2) as pool:
+        monkeypatch.setattr(server, 'get_process_pool', lambda: pool)
+
+        async def scenario():
+            await server.create_indexes()  # the unique email index reports duplicates
+            await mongo.users.insert_one({'id': 'old', 'email': 'taken@example.com'})
+            return await server.bulk_import_students(
+                file=UploadFile(BytesIO(ROSTER.encode()), filename='roster.csv'), class_name='9', school="St. Mary's")
+        response = run(scenario())
+
+    rows = list(csv.DictReader(StringIO(response.body.decode())))
+    assert [(r['row'], r['status']) for r in rows] == [
+        ('2', 'created'), ('3', 'created'), ('4', 'invalid'), ('5', 'duplicate'), ('6', 'duplicate'), ('7', 'invalid')]
+    assert (response.headers['X-Created'], response.headers['X-Duplicates'], response.headers['X-Invalid']) == ('2', '2', '2')
+    assert rows[0]['initial_password'] == 'Secret@123' and rows[1]['initial_password']
+    assert rows[3]['student_code'] == '' and rows[3]['initial_password'] == ''
+
+    asha = run(mongo.users.find_one({'email': 'asha@example.com'}))
+    assert asha['role'] == server.UserRole.STUDENT and asha['class_name'] == '10'
+    assert asha['school_id'] == 'st-mary-s' and asha['parent_email'] == 'parent@example.com'
+    assert asha['student_code'] == rows[0]['student_code']
+    assert server.verify_password('Secret@123', asha['password'])
+    ravi = run(mongo.users.find_one({'email': 'ravi@example.com'}))
+    assert ravi['class_name'] == '9'  # from the form field
+    assert server.verify_password(rows[1]['initial_password'], ravi['password'])
+
+def taken_first(monkeypatch, taken: str):
+    """generate_unique_student_codes whose first answer ends with a code another writer took after its check"""
+    real = server.generate_unique_student_codes
+    calls = []
+
+    async def codes(count):
+        calls.append(count)
+        fresh = await real(count)
+        return [*fresh[:-1], taken] if len(calls) == 1 else fresh
+    monkeypatch.setattr(server, 'generate_unique_student_codes', codes)
+    return calls
+
+def test_bulk_import_retries_rows_whose_student_code_was_taken(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'SCHOOL_LAYOUT', 'shared')
+    monkeypatch.setattr(server, 'INDEX_MODELS', mongomock_index_models())
+    monkeypatch.setattr(server, 'hash_password', lambda p: f'hashed:{p}')
+    calls = taken_first(monkeypatch, 'STDRACE001')
+    with ThreadPoolExecutor(2) as pool:
+        monkeypatch.setattr(server, 'get_process_pool', lambda: pool)
+
+        async def scenario():
+            await server.create_indexes()
+            await mongo.users.insert_many([{'id': 'other', 'email': 'other@example.com', 'student_code': 'STDRACE001'},
+                                           {'id': 'admin', 'email': 'admin@example.com'},
+                                           {'id': 'teacher', 'email': 'teacher@example.com'}])
+            return await server.bulk_import_students(
+                file=UploadFile(BytesIO(ROSTER.encode()), filename='roster.csv'), class_name='9', school=None)
+        response = run(scenario())
+
+    rows = list(csv.DictReader(StringIO(response.body.decode())))
+    assert [r['status'] for r in rows] == ['created', 'created', 'invalid', 'duplicate', 'created', 'invalid']
+    assert calls == [4, 1]  # the whole import, then the one row that collided (Old)
+    stored = {u['email']: u.get('student_code') for u in run(mongo.users.find({}).to_list(None))}
+    assert stored['other@example.com'] == 'STDRACE001'
+    for row in rows:
+        if row['status'] == 'created':
+            assert stored[row['email']] == row['student_code'] != 'STDRACE001'
+    assert len({stored[r['email']] for r in rows if r['status'] == 'created'}) == 3
+
+def test_signup_retries_a_taken_student_code(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'SCHOOL_LAYOUT', 'shared')
+    monkeypatch.setattr(server, 'INDEX_MODELS', mongomock_index_models())
+    monkeypatch.setattr(server, 'hash_password', lambda p: f'hashed:{p}')
+    calls = taken_first(monkeypatch, 'STDRACE001')
+    signup = server.UserSignup(name='Asha', nickname='Asha', email='asha@example.com', mobile='1', password='pw',
+                               role=server.UserRole.STUDENT, dob='2010-01-01', class_name='10')
+
+    async def scenario():
+        await server.create_indexes()
+        await mongo.users.insert_one({'id': 'other', 'email': 'other@example.com', 'student_code': 'STDRACE001'})
+        return await server.signup(signup)
+    user = run(scenario())
+    assert len(calls) == 2
+    assert user.student_code and user.student_code != 'STDRACE001'
+    assert run(mongo.users.find_one({'email': 'asha@example.com'}))['student_code'] == user.student_code
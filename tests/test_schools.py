@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+def test_school_key():
+    assert server.school_key("St. Mary's High") == 'st-mary-s-high'
+    assert server.school_key('  ST MARY S high ') == 'st-mary-s-high'
+    assert server.school_key(None) is None and server.school_key('!!!') is None
+    long_key = server.school_key('The Very Long Named International Residential Public School of Excellence')
+    assert len(long_key) == 40 and long_key.startswith('the-very-long-named-internation-')
+    assert long_key != server.school_key('The Very Long Named International Residential Public School of Science')
+
+def test_school_scope():
+    assert server.school_scope('a') == {'school_id': {'$in': ['a', None]}}
+    assert server.school_scope('a', include_shared=False) == {'school_id': 'a'}
+    assert server.school_scope(None) == {}
+
+def test_visible_to():
+    teacher = {'role': server.UserRole.TEACHER, 'school_id': 'a'}
+    assert server.visible_to({'school_id': 'a'}, teacher)
+    assert server.visible_to({'school_id': None}, teacher)
+    assert not server.visible_to({'school_id': 'b'}, teacher)
+    assert server.visible_to({'school_id': 'b'}, {'role': server.UserRole.SUPER_ADMIN, 'school_id': 'a'})
+    assert server.visible_to({'school_id': 'b'}, {'role': server.UserRole.TEACHER, 'school_id': None})
+
+def test_school_routed_database(run, monkeypatch):
+    routed = server.SchoolRoutedDatabase(AsyncMongoMockClient(), 'exams')
+    token = server.current_school.set('green')
+    try:
+        assert routed.tests.database.name == 'exams_green'
+        assert routed['test_results'].database.name == 'exams_green'
+        assert routed.users.database.name == 'exams'
+        assert routed.get_collection('master_questions').database.name == 'exams'
+    finally:
+        server.current_school.reset(token)
+    assert routed.tests.database.name == 'exams'  # no school: the platform database
+
+def test_across_schools(run, mongo, monkeypatch):
+    async def scenario():
+        await mongo.users.insert_many([{'id': 'u1', 'school_id': 'b'}, {'id': 'u2', 'school_id': 'a'},
+                                       {'id': 'u3', 'school_id': None}, {'id': 'u4', 'school_id': 'a'}])
+
+        async def current():
+            return server.current_school.get()
+        monkeypatch.setattr(server, 'SCHOOL_LAYOUT', 'shared')
+        shared = await server.across_schools(current)
+        monkeypatch.setattr(server, 'SCHOOL_LAYOUT', 'database')
+        return shared, await server.across_schools(current), server.current_school.get()
+    shared, per_school, after = run(scenario())
+    assert shared == [None]
+    assert per_school == [None, 'a', 'b']
+    assert after is None
+
+def test_results_of_another_school_are_not_found(run, mongo):
+    async def scenario():
+        await mongo.test_results.insert_one({'id': 'r1', 'test_id': 't1', 'student_id': 's1', 'school_id': 'b',
+                                             'answers': [], 'total_score': 1.0, 'max_score': 2,
+                                             'submitted_at': '2025-05-01', 'evaluated': True})
+        own = await server.get_result('r1', current_user={'user_id': 'x', 'role': server.UserRole.TEACHER, 'school_id': 'b'})
+        with pytest.raises(HTTPException) as raised:
+            await server.get_result('r1', current_user={'user_id': 'y', 'role': server.UserRole.TEACHER, 'school_id': 'a'})
+        return own, raised.value.status_code
+    own, status = run(scenario())
+    assert own.id == 'r1' and status == 404
+
+def test_resolve_school(run, mongo):
+    async def scenario():
+        await mongo.users.insert_one({'id': 'u1', 'school': "St. Mary's High", 'school_id': 'st-mary-s-high'})
+        resolved = [await server.resolve_school(name) for name in ("St. Mary's High", 'st-mary-s-high', '', None)]
+        with pytest.raises(HTTPException) as raised:
+            await server.resolve_school('St. Marys High')  # a typo must not become a new database
+        return resolved, raised.value.status_code
+    resolved, status = run(scenario())
+    assert resolved == ['st-mary-s-high', 'st-mary-s-high', None, None]
+    assert status == 400
+
+def test_super_admin_x_school_is_normalized_and_checked(run, mongo):
+    token = server.jwt.encode({'user_id': 'admin', 'role': server.UserRole.SUPER_ADMIN},
+                              server.JWT_SECRET, algorithm=server.JWT_ALGORITHM)
+    credentials = SimpleNamespace(credentials=token)
+
+    async def scenario():
+        await mongo.users.insert_many([{'id': 'admin', 'role': server.UserRole.SUPER_ADMIN},
+                                       {'id': 'u1', 'school_id': 'st-mary-s-high'}])
+        user = await server.get_current_user(SimpleNamespace(headers={'X-School': "St. Mary's High"}), credentials)
+        routed = server.current_school.get()
+        with pytest.raises(HTTPException) as raised:
+            await server.get_current_user(SimpleNamespace(headers={'X-School': 'nowhere'}), credentials)
+        return user['school_id'], routed, raised.value.status_code
+    assert run(scenario()) == ('st-mary-s-high', 'st-mary-s-high', 400)
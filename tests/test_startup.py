@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import server
+
+BACKEND = Path(__file__).resolve().parent.parent / 'backend'
+
+def test_import_does_not_load_heavy_dependencies():
+    # A fresh interpreter: this test session may already have imported them
+    code = ("import sys, server; "
+            "print(sorted(m for m in ('pandas', 'PIL', 'pytesseract', 'emergentintegrations', 'numpy') if m in sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], cwd=BACKEND, env={**os.environ, 'PYTHONPATH': str(BACKEND)},
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == '[]'
+
+def test_import_time_is_recorded():
+    assert server.STARTUP_TIMINGS['import_ms'] > 0
+
+def test_index_definitions_are_unique_per_collection():
+    for collection, models in server.INDEX_MODELS.items():
+        names = [model.document['name'] for model in models]
+        assert len(names) == len(set(names)), collection
+    assert server.SCHOOL_OWNED_COLLECTIONS <= set(server.INDEX_MODELS)
+
+def test_create_indexes(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'CREATE_INDEXES_ON_STARTUP', True)
+    monkeypatch.setattr(server, 'SCHOOL_LAYOUT', 'shared')
+    run(server.create_indexes())
+
+    async def index_names(collection):
+        return set((await mongo[collection].index_information()).keys())
+    for collection, models in server.INDEX_MODELS.items():
+        assert {model.document['name'] for model in models} <= run(index_names(collection))
+    assert 'index_creation_ms' in server.STARTUP_TIMINGS
+
+def test_create_indexes_can_be_left_to_a_migrator(run, mongo, monkeypatch):
+    monkeypatch.setattr(server, 'CREATE_INDEXES_ON_STARTUP', False)
+    run(server.create_indexes())
+    assert run(mongo.users.index_information()) == {}
@@ -0,0 +1,194 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import server
+import trace_report
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+@pytest.mark.parametrize("header, expected", [
+    (f'00-{TRACE_ID}-{PARENT_ID}-01', (TRACE_ID, PARENT_ID, True)),
+    (f' 00-{TRACE_ID.upper()}-{PARENT_ID}-00 ', (TRACE_ID, PARENT_ID, False)),
+    (f'00-{TRACE_ID}-{PARENT_ID}-03', (TRACE_ID, PARENT_ID, True)),
+    (f'00-{"0" * 32}-{PARENT_ID}-01', None),
+    (f'00-{TRACE_ID}-{"0" * 16}-01', None),
+    (f'01-{TRACE_ID}-{PARENT_ID}-01', None),
+    (f'00-{TRACE_ID[:-1]}-{PARENT_ID}-01', None),
+    ('', None),
+    (None, None),
+])
+def test_parse_traceparent(header, expected):
+    assert server.parse_traceparent(header) == expected
+
+def test_span_is_a_no_op_outside_a_trace():
+    with server.span("job.step", n=1):
+        pass
+    assert server.current_span_id.get() is None
+
+def test_spans_nest_and_record_errors():
+    trace = server.Trace(TRACE_ID, sampled=True)
+    trace_token = server.current_trace.set(trace)
+    root_token = server.current_span_id.set(PARENT_ID)
+    try:
+        with server.span("outer", test_id='t1'):
+            with server.span("inner"):
+                pass
+            with pytest.raises(ValueError):
+                with server.span("failing"):
+                    raise ValueError("bad answer")
+        assert server.current_span_id.get() == PARENT_ID
+    finally:
+        server.current_span_id.reset(root_token)
+        server.current_trace.reset(trace_token)
+
+    inner, failing, outer = trace.spans
+    assert [s['name'] for s in trace.spans] == ['inner', 'failing', 'outer']
+    assert outer['parent_span_id'] == PARENT_ID and outer['attributes'] == {'test_id': 't1'}
+    assert inner['parent_span_id'] == failing['parent_span_id'] == outer['span_id']
+    assert failing['error'] == 'ValueError: bad answer' and 'error' not in outer
+    assert outer['start_ns'] <= inner['start_ns'] <= inner['end_ns'] <= outer['end_ns']
+
+def test_otlp_value():
+    assert server.otlp_value(True) == {"boolValue": True}
+    assert server.otlp_value(3) == {"intValue": "3"}
+    assert server.otlp_value(0.5) == {"doubleValue": 0.5}
+    assert server.otlp_value(None) == {"stringValue": "None"}
+
+def record(name='stage', parent=PARENT_ID, **extra):
+    return {"name": name, "span_id": 'a' * 16, "parent_span_id": parent, "start_ns": 1_000_000,
+            "end_ns": 3_500_000, "attributes": {"n": 2}, **extra}
+
+def test_otlp_span():
+    child = server.otlp_span(TRACE_ID, record())
+    assert child == {
+        "traceId": TRACE_ID, "spanId": 'a' * 16, "parentSpanId": PARENT_ID, "name": 'stage', "kind": 1,
+        "startTimeUnixNano": "1000000", "endTimeUnixNano": "3500000",
+        "attributes": [{"key": "n", "value": {"intValue": "2"}}], "status": {"code": 1},
+    }
+    root = server.otlp_span(TRACE_ID, record(parent=None, error='boom'))
+    assert root['kind'] == 2 and 'parentSpanId' not in root
+    assert root['status'] == {"code": 2, "message": 'boom'}
+    assert server.otlp_span(TRACE_ID, record(remote_parent=True))['kind'] == 2
+
+def test_exporter_drops_traces_past_the_pending_limit(monkeypatch):
+    monkeypatch.setattr(server, 'METRICS', server.Counter())
+    monkeypatch.setattr(server, 'TRACE_MAX_PENDING', 3)
+    exporter = server.TraceExporter()
+    trace = server.Trace(TRACE_ID, sampled=True)
+    trace.spans = [record(), record()]
+    exporter.add(trace)
+    exporter.add(trace)
+    assert len(exporter.pending) == 2
+    assert server.METRICS['tracing.exported_traces'] == 1 and server.METRICS['tracing.dropped_spans'] == 2
+
+def test_exporter_writes_batches_to_the_file(run, monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'METRICS', server.Counter())
+    monkeypatch.setattr(server, 'TRACE_EXPORT', 'file')
+    monkeypatch.setattr(server, 'TRACE_EXPORT_BATCH', 2)
+    monkeypatch.setattr(server, 'TRACE_FILE', tmp_path / 'traces' / 'traces.jsonl')
+    exporter = server.TraceExporter()
+    trace = server.Trace(TRACE_ID, sampled=True)
+    trace.spans = [record('a'), record('b'), record('c', parent=None)]
+    exporter.add(trace)
+    run(exporter.flush())
+
+    assert not exporter.pending and server.METRICS['tracing.exported_spans'] == 3
+    lines = server.TRACE_FILE.read_text().splitlines()
+    assert len(lines) == 2
+    resource = json.loads(lines[0])['resourceSpans'][0]
+    assert {"key": "service.name", "value": {"stringValue": server.TRACE_SERVICE_NAME}} in resource['resource']['attributes']
+    # the report reads back what was written
+    assert [s['name'] for s in trace_report.load_spans(server.TRACE_FILE)] == ['a', 'b', 'c']
+
+def test_exporter_counts_failed_exports(run, monkeypatch):
+    monkeypatch.setattr(server, 'METRICS', server.Counter())
+    monkeypatch.setattr(server, 'TRACE_EXPORT', 'otlp')
+    monkeypatch.setattr(server, 'TRACE_OTLP_ENDPOINT', 'http://127.0.0.1:9/v1/traces')
+    exporter = server.TraceExporter()
+    trace = server.Trace(TRACE_ID, sampled=True)
+    trace.spans = [record()]
+    exporter.add(trace)
+    run(exporter.flush())
+    assert not exporter.pending
+    assert server.METRICS['tracing.export_errors'] == 1 and server.METRICS['tracing.exported_spans'] == 0
+
+def traced_app():
+    app = FastAPI()
+    app.middleware("http")(server.tracing_middleware)
+
+    @app.get("/tests/{test_id}")
+    async def get_test(test_id: str):
+        with server.span("test.fetch", test_id=test_id):
+            await asyncio.sleep(0)
+        return {"id": test_id}
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+def test_middleware_continues_an_incoming_trace(run, monkeypatch):
+    exporter = server.TraceExporter()
+    monkeypatch.setattr(server, 'trace_exporter', exporter)
+    monkeypatch.setattr(server, 'TRACE_EXPORT', 'file')
+    monkeypatch.setattr(server, 'TRACE_SLOW_MS', 60_000)
+
+    async def scenario():
+        async with traced_app() as http:
+            return await http.get("/tests/t1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+    response = run(scenario())
+
+    assert response.headers['x-trace-id'] == TRACE_ID
+    _, trace_id, root_id, flags = response.headers['traceparent'].split('-')
+    assert (trace_id, flags) == (TRACE_ID, '01') and root_id != PARENT_ID
+    fetch, root = exporter.pending
+    assert root['name'] == 'GET /tests/{test_id}' and root['kind'] == 2
+    assert root['parentSpanId'] == PARENT_ID and root['spanId'] == root_id
+    assert {"key": "http.status_code", "value": {"intValue": "200"}} in root['attributes']
+    assert fetch['name'] == 'test.fetch' and fetch['parentSpanId'] == root_id and fetch['traceId'] == TRACE_ID
+
+def test_middleware_exports_unsampled_traces_only_when_slow(run, monkeypatch):
+    exporter = server.TraceExporter()
+    monkeypatch.setattr(server, 'trace_exporter', exporter)
+    monkeypatch.setattr(server, 'TRACE_EXPORT', 'file')
+    monkeypatch.setattr(server, 'TRACE_SAMPLE_RATE', 0)
+
+    async def scenario():
+        async with traced_app() as http:
+            return await http.get("/tests/t1")
+    monkeypatch.setattr(server, 'TRACE_SLOW_MS', 60_000)
+    fast = run(scenario())
+    assert fast.headers['traceparent'].endswith('-00') and fast.headers['x-trace-id'] != TRACE_ID
+    assert exporter.pending == []
+
+    monkeypatch.setattr(server, 'TRACE_SLOW_MS', 0)
+    run(scenario())
+    assert [s['name'] for s in exporter.pending] == ['test.fetch', 'GET /tests/{test_id}']
+
+def test_middleware_only_sets_headers_when_tracing_is_off(run, monkeypatch):
+    exporter = server.TraceExporter()
+    monkeypatch.setattr(server, 'trace_exporter', exporter)
+    monkeypatch.setattr(server, 'TRACE_EXPORT', 'off')
+    monkeypatch.setattr(server, 'TRACE_SLOW_MS', 0)
+
+    async def scenario():
+        async with traced_app() as http:
+            return await http.get("/tests/t1")
+    response = run(scenario())
+    assert response.json() == {"id": "t1"} and len(response.headers['x-trace-id']) == 32
+    assert exporter.pending == []
+
+@pytest.mark.parametrize("q, expected", [(0, 1), (0.5, 2), (0.95, 4), (1, 4)])
+def test_report_percentile_is_nearest_rank(q, expected):
+    assert trace_report.percentile([4, 1, 3, 2], q) == expected
+
+def test_stage_table():
+    spans = [
+        {'name': 'grade', 'startTimeUnixNano': '0', 'endTimeUnixNano': str(ms * 1_000_000), 'status': {'code': code}}
+        for ms, code in [(10, 1), (20, 1), (30, 2), (40, 1)]
+    ] + [{'name': 'fetch', 'startTimeUnixNano': '0', 'endTimeUnixNano': '5000000'}]
+    grade, fetch = trace_report.stage_table(spans)
+    assert grade == {"name": 'grade', "count": 4, "p50_ms": 20.0, "p95_ms": 40.0, "max_ms": 40.0,
+                     "total_ms": 100.0, "errors": 1}
+    assert (fetch['name'], fetch['count'], fetch['errors']) == ('fetch', 1, 0)
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+UTC = timezone.utc
+TEST = {'id': 't1', 'class_name': '10', 'subject_id': 'maths'}
+
+def result(student_id='s1', submitted_at='2025-05-14T09:00:00+00:00', total=15.0, max_score=20, school_id='sch'):
+    return {'id': f'r-{student_id}-{submitted_at}', 'test_id': TEST['id'], 'student_id': student_id,
+            'school_id': school_id, 'total_score': total, 'max_score': max_score, 'submitted_at': submitted_at}
+
+@pytest.mark.parametrize("moment, period, expected", [
+    (datetime(2025, 5, 14, 9, tzinfo=UTC), 'week', ('2025-05-12', '2025-W20')),   # Wednesday -> Monday
+    (datetime(2025, 5, 12, 0, tzinfo=UTC), 'week', ('2025-05-12', '2025-W20')),   # Monday itself
+    (datetime(2024, 12, 31, tzinfo=UTC), 'week', ('2024-12-30', '2025-W01')),     # ISO year of the Monday
+    (datetime(2025, 5, 31, 23, tzinfo=UTC), 'month', ('2025-05-01', '2025-05')),
+    (datetime(2025, 5, 14, tzinfo=UTC), 'term', ('2025-04-01', '2025-T1')),
+    (datetime(2026, 1, 10, tzinfo=UTC), 'term', ('2025-10-01', '2025-T2')),
+    (datetime(2026, 3, 31, tzinfo=UTC), 'term', ('2025-10-01', '2025-T2')),
+])
+def test_trend_bucket(moment, period, expected):
+    assert server.trend_bucket(moment, period) == expected
+
+def test_trend_bucket_uses_utc():
+    # Monday 01:00 in UTC+5 is still Sunday in UTC
+    moment = datetime(2025, 5, 12, 1, tzinfo=timezone(timedelta(hours=5)))
+    assert server.trend_bucket(moment, 'week') == ('2025-05-05', '2025-W19')
+
+def test_result_percent():
+    assert server.result_percent(15, 20) == 75.0
+    assert server.result_percent(25, 20) == 100.0
+    assert server.result_percent(-1, 20) == 0.0
+    assert server.result_percent(5, 0) == 0.0
+
+def test_rollup_increments_one_student_and_one_class_bucket_per_period():
+    rows = server.rollup_increments(result(), TEST, 1, 15.0, 20, 75.0)
+    assert len(rows) == 2 * len(server.TREND_PERIODS)
+    keys = [key for key, _, _ in rows]
+    assert len(set(keys)) == len(keys)
+    assert 'student:sch:s1:week:2025-05-12' in keys
+    assert 'class:sch:10:maths:month:2025-05-01' in keys
+    by_key = {key: (fields, inc) for key, fields, inc in rows}
+    fields, inc = by_key['class:sch:10:maths:month:2025-05-01']
+    assert fields == {'scope': 'class', 'school_id': 'sch', 'class_name': '10', 'subject_id': 'maths',
+                      'period': 'month', 'bucket_start': '2025-05-01', 'label': '2025-05'}
+    assert inc == {'tests': 1, 'obtained': 15.0, 'max_marks': 20, 'percent_sum': 75.0}
+
+def test_rollup_key_without_school():
+    keys = [key for key, _, _ in server.rollup_increments(result(school_id=None), TEST, 1, 15.0, 20, 75.0)]
+    assert 'student:-:s1:week:2025-05-12' in keys
+
+def test_result_increments_sign_removes_the_result():
+    added = server.result_increments(result(), TEST)
+    removed = server.result_increments(result(), TEST, sign=-1)
+    for (key, _, inc), (removed_key, _, removed_inc) in zip(added, removed):
+        assert key == removed_key
+        assert {field: inc[field] + removed_inc[field] for field in inc} == dict.fromkeys(inc, 0)
+
+def test_trend_points_sorted_and_skips_empty_buckets():
+    buckets = [
+        {'bucket_start': '2025-05-12', 'label': 'b', 'tests': 2, 'obtained': 30.0, 'max_marks': 40, 'percent_sum': 150.0},
+        {'bucket_start': '2025-05-05', 'label': 'a', 'tests': 1, 'obtained': 5.0, 'max_marks': 10, 'percent_sum': 50.0},
+        {'bucket_start': '2025-05-19', 'label': 'c', 'tests': 0, 'obtained': 0.0, 'max_marks': 0, 'percent_sum': 0.0},
+    ]
+    points = server.trend_points(buckets)
+    assert [p['label'] for p in points] == ['a', 'b']
+    assert points[1] == {'bucket_start': '2025-05-12', 'label': 'b', 'tests': 2, 'percent': 75.0,
+                         'average_percent': 75.0, 'obtained_marks': 30.0, 'total_marks': 40}
+
+def test_rebuild_matches_incremental_updates(run, mongo):
+    results = [
+        result('s1', '2025-05-12T08:00:00+00:00', 10.0),
+        result('s1', '2025-05-14T08:00:00+00:00', 20.0),
+        result('s2', '2025-06-02T08:00:00+00:00', 5.0),
+        result('s2', '2025-10-02T08:00:00+00:00', 12.0),
+    ]
+
+    async def buckets():
+        return {b['id']: {f: b[f] for f in ('tests', 'obtained', 'max_marks', 'percent_sum')}
+                async for b in mongo.performance_rollups.find({}, {'_id': 0})}
+
+    async def scenario():
+        await mongo.tests.insert_one(dict(TEST))
+        await mongo.test_results.insert_many([dict(r) for r in results])
+        for r in results:
+            await server.update_trend_rollups(server.result_increments(r, TEST))
+        incremental = await buckets()
+        # A result removed outside the API: the rebuild drops its buckets
+        await mongo.test_results.delete_one({'student_id': 's2', 'submitted_at': results[3]['submitted_at']})
+        report = await server.rebuild_trend_rollups('sch')
+        return incremental, report, await buckets()
+
+    incremental, report, rebuilt = run(scenario())
+    assert incremental['student:sch:s1:week:2025-05-12'] == {'tests': 2, 'obtained': 30.0, 'max_marks': 40, 'percent_sum': 150.0}
+    assert report['results'] == 3
+    assert report['removed'] == 2 * len(server.TREND_PERIODS)
+    deleted = {key for key, _, _ in server.result_increments(results[3], TEST)}
+    assert rebuilt == {key: value for key, value in incremental.items() if key not in deleted}